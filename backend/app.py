@@ -5,7 +5,7 @@ from flask_jwt_extended import JWTManager
 from flask_migrate import Migrate
 from flask_mail import Mail
 from flask_socketio import SocketIO
-from config import Config
+from config import config
 import os
 from dotenv import load_dotenv
 
@@ -20,16 +20,22 @@ mail = Mail()
 socketio = SocketIO()
 cors = CORS()
 
-def create_app(config_class=Config):
+def create_app(config_class=None):
     app = Flask(__name__)
-    app.config.from_object(config_class)
+    # Without a class, FLASK_ENV picks development, production or testing settings
+    app.config.from_object(config_class or config.get(os.environ.get('FLASK_ENV') or 'default', config['default']))
+    
+    # Pool sizing, statement timeouts and SQLite pragmas suited to the database's dialect
+    from services.engine_profiles import engine_options, init_engine_profiles
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
     
     # Initialize extensions with app
     db.init_app(app)
+    init_engine_profiles(app)
     jwt.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    socketio.init_app(app, cors_allowed_origins="*", message_queue=app.config.get('SOCKETIO_MESSAGE_QUEUE'))
     
     # JWT token blacklist callback
     @jwt.token_in_blocklist_loader
@@ -49,34 +55,114 @@ def create_app(config_class=Config):
         from models.user import User
         from models.expense import Expense
         from models.budget import Budget
+        from models.budget_snapshot import BudgetPeriodSnapshot
+        from models.monthly_report import MonthlyReportSnapshot
         from models.notification import Notification
     
+    # Prometheus metrics: route latency, requests in flight, pool waits
+    from services.metrics import init_metrics
+    init_metrics(app)
+    
+    # Count queries, rows and database time per request to surface N+1 patterns
+    from services.query_stats import init_query_stats
+    init_query_stats(app)
+    
+    # Background tasks run off the request path
+    from services.tasks import init_tasks
+    import services.budget_alerts
+    import services.budget_index
+    import services.budget_spend
+    import services.ledger
+    import services.monthly_reports
+    import services.notification_counts
+    import services.spend_index
+    init_tasks(app)
+    
+    # Coalesce bursts of notifications into per-user digests
+    from services.notification_digest import init_notification_digest
+    init_notification_digest(app)
+    
+    # Track which users are connected so offline pushes can be queued
+    from services.presence import init_presence
+    init_presence(app)
+    
+    # Thread pool for computing dashboard panels side by side
+    from services.dashboard import init_dashboard
+    init_dashboard(app)
+    
+    # Thread pool for read-only /api/batch items
+    from services.batch import init_batch
+    init_batch(app)
+    
     # Register blueprints
     from routes.auth_simple import auth_bp
     from routes.expenses import expenses_bp
     from routes.analytics import analytics_bp
     from routes.insights import insights_bp
     from routes.notifications import notifications_bp
+    from routes.dashboard import dashboard_bp
+    from routes.batch import batch_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/auth')
     app.register_blueprint(expenses_bp, url_prefix='/api/expenses')
     app.register_blueprint(analytics_bp, url_prefix='/api/analytics')
     app.register_blueprint(insights_bp, url_prefix='/api/insights')
     app.register_blueprint(notifications_bp, url_prefix='/api/notifications')
+    app.register_blueprint(dashboard_bp, url_prefix='/api/dashboard')
+    app.register_blueprint(batch_bp, url_prefix='/api/batch')
     
     # Add health check endpoint
     @app.route('/api/health')
     def health_check():
-        return {'status': 'healthy', 'message': 'Personal Finance API is running'}, 200
+        return {
+            'status': 'healthy',
+            'message': 'Personal Finance API is running',
+            'online_users': app.extensions['presence'].online_count()
+        }, 200
+    
+    # Prometheus scrape endpoint, summed over gunicorn workers in multiprocess mode
+    @app.route('/api/metrics')
+    def metrics():
+        from services.metrics import is_authorized, render_metrics
+        if not is_authorized(app):
+            return {'message': 'Invalid metrics token', 'error': 'unauthorized'}, 401
+        body, content_type = render_metrics()
+        return body, 200, {'Content-Type': content_type}
     
     @app.route('/')
     def index():
         return {'message': 'Personal Finance API', 'version': '1.0.0'}, 200
     
+    # Bring databases created before integer cents, expense currencies, stored
+    # counters and the budget-period unique index up to date
+    @app.cli.command('migrate-money')
+    def migrate_money_command():
+        from services.money_migration import add_missing_columns, add_missing_unique_indexes, migrate_money_to_cents
+        converted = migrate_money_to_cents(db.engine)
+        added = add_missing_columns(db.engine)
+        indexes, blocked = add_missing_unique_indexes(db.engine)
+        print(f"Converted to cents: {', '.join(converted)}" if converted else 'Money columns already in cents')
+        print(f"Added columns: {', '.join(added)}" if added else 'No columns to add')
+        print(f"Added unique indexes: {', '.join(indexes)}" if indexes else 'No unique indexes to add')
+        for index, duplicates in blocked.items():
+            print(f"Not adding {index}: {duplicates} groups of duplicate rows must be merged first")
+        
+        # New counter columns start at 0; fill them from the rows they count
+        if 'users.unread_notification_count' in added:
+            from services.notification_counts import repair_unread_counts
+            print(f"Backfilled unread counts for {len(repair_unread_counts())} users")
+        if 'budgets.spent_cents' in added:
+            from services.budget_spend import reconcile_budget_spend
+            print(f"Backfilled spent totals for {len(reconcile_budget_spend())} budgets")
+    
     # Create database tables
     with app.app_context():
         db.create_all()
     
+    # Start periodic maintenance jobs
+    from services.scheduler import init_scheduler
+    init_scheduler(app)
+    
     return app
 
 if __name__ == '__main__':
@@ -0,0 +1,281 @@
+# Drive every API blueprint at a fixed concurrency; record p50/p95/p99 and throughput as a JSON baseline
+# Usage: python -m benchmarks.bench_api [--database URL] [--users 20] [--expenses 2000] [--concurrency 8]
+#        [--requests 200] [--output baseline.json] [--compare previous.json]
+# PostgreSQL: --database postgresql://localhost/bench (needs psycopg2); --url drives a running server instead
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter
+from datetime import date, datetime
+import numpy as np
+from benchmarks.ledger_generator import PASSWORD, bench_app, generate, reconcile_counters
+
+EMAIL_PREFIX = 'bench-user'
+
+def _new_expense(rng, user):
+    return {
+        'amount': round(rng.uniform(2, 80), 2),
+        'category': rng.choice(['food', 'transport', 'shopping', 'entertainment']),
+        'description': 'Benchmark expense',
+        'date': date.today().isoformat(),
+        'payment_method': 'debit_card'
+    }
+
+def _batch(rng, user):
+    return {'parallel': True, 'requests': [
+        {'method': 'GET', 'path': '/api/expenses/summary'},
+        {'method': 'GET', 'path': '/api/analytics/category-insights'},
+        {'method': 'GET', 'path': '/api/notifications/unread-count'}
+    ]}
+
+# (name, method, path, body factory); {expense_id} is one of the user's expenses
+SCENARIOS = [
+    ('auth.login', 'POST', '/api/auth/login', lambda rng, user: {'email': user['email'], 'password': PASSWORD}),
+    ('auth.me', 'GET', '/api/auth/me', None),
+    ('expenses.list', 'GET', '/api/expenses/?limit=20', None),
+    ('expenses.get', 'GET', '/api/expenses/{expense_id}', None),
+    ('expenses.summary', 'GET', '/api/expenses/summary', None),
+    ('expenses.categories', 'GET', '/api/expenses/categories', None),
+    ('expenses.create', 'POST', '/api/expenses/', _new_expense),
+    ('analytics.spending_trends', 'GET', '/api/analytics/spending-trends', None),
+    ('analytics.category_insights', 'GET', '/api/analytics/category-insights', None),
+    ('analytics.monthly_reports', 'GET', '/api/analytics/monthly-reports', None),
+    ('analytics.year_over_year', 'GET', '/api/analytics/year-over-year', None),
+    ('analytics.budget_vs_actual', 'GET', '/api/analytics/budget-vs-actual', None),
+    ('analytics.budget_performance', 'GET', '/api/analytics/budget-performance', None),
+    ('analytics.pivot', 'GET', '/api/analytics/pivot?dimensions=category,month', None),
+    ('insights.spending_patterns', 'GET', '/api/insights/spending-patterns', None),
+    ('insights.budget_recommendations', 'GET', '/api/insights/budget-recommendations', None),
+    ('insights.advanced_predictions', 'GET', '/api/insights/forecasting/advanced-predictions', None),
+    ('notifications.list', 'GET', '/api/notifications/', None),
+    ('notifications.unread_count', 'GET', '/api/notifications/unread-count', None),
+    ('notifications.spending_warnings', 'GET', '/api/notifications/spending-warnings', None),
+    ('notifications.settings', 'GET', '/api/notifications/settings', None),
+    ('dashboard', 'GET', '/api/dashboard/', None),
+    ('batch', 'POST', '/api/batch/', _batch)
+]
+
+class InProcessClient:
+    """Requests through the WSGI app, without a network hop"""
+    
+    def __init__(self, app):
+        self.client = app.test_client()
+    
+    def send(self, method, path, body, headers):
+        response = self.client.open(path, method=method, json=body, headers=headers)
+        status = response.status_code
+        response.close()
+        return status
+
+class HttpClient:
+    """Requests to a running server"""
+    
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+    
+    def send(self, method, path, body, headers):
+        data = json.dumps(body).encode() if body is not None else None
+        request = urllib.request.Request(self.base_url + path, data=data, method=method, headers=dict(headers))
+        if data is not None:
+            request.add_header('Content-Type', 'application/json')
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+def prepare_users(app, args):
+    """Generate the data set unless it is already there; returns users with tokens and an expense id each"""
+    from sqlalchemy import func, select
+    from flask_jwt_extended import create_access_token
+    from app import db
+    from models.user import User
+    from models.expense import Expense
+    
+    with app.app_context():
+        users = User.__table__
+        expenses = Expense.__table__
+        existing = db.session.execute(
+            select(func.count()).select_from(users).where(users.c.email.like(f'{EMAIL_PREFIX}-%'))
+        ).scalar()
+        
+        if existing < args.users:
+            if existing:
+                sys.exit(f"{existing} benchmark users exist but {args.users} were asked for; use a fresh database")
+            started = time.perf_counter()
+            counts = generate(
+                db.engine, args.users, args.expenses, args.budgets, args.notifications, args.years, args.seed,
+                email_prefix=EMAIL_PREFIX
+            )
+            reconcile_counters()
+            print(f"generated {sum(counts.values())} rows in {time.perf_counter() - started:.1f} s: {counts}")
+        
+        rows = db.session.execute(
+            select(users.c.id, users.c.email, func.min(expenses.c.id))
+            .join(expenses, expenses.c.user_id == users.c.id)
+            .where(users.c.email.like(f'{EMAIL_PREFIX}-%'))
+            .group_by(users.c.id, users.c.email)
+            .order_by(users.c.id)
+            .limit(args.users)
+        ).all()
+        
+        return [{
+            'id': user_id,
+            'email': email,
+            'expense_id': expense_id,
+            'headers': {'Authorization': f'Bearer {create_access_token(identity=user_id)}'}
+        } for user_id, email, expense_id in rows]
+
+def run_scenario(make_client, scenario, users, concurrency, requests, warmup, seed):
+    """Send `requests` requests split over `concurrency` threads, each as a random user"""
+    name, method, path, body = scenario
+    latencies = []
+    statuses = Counter()
+    lock = threading.Lock()
+    
+    def call(client, rng):
+        user = rng.choice(users)
+        payload = body(rng, user) if body else None
+        started = time.perf_counter()
+        status = client.send(method, path.format(expense_id=user['expense_id']), payload, user['headers'])
+        return status, time.perf_counter() - started
+    
+    def worker(number, count):
+        client = make_client()
+        rng = random.Random(f'{seed}:{name}:{number}')
+        samples = [call(client, rng) for _ in range(count)]
+        with lock:
+            for status, elapsed in samples:
+                statuses[status] += 1
+                latencies.append(elapsed)
+    
+    # Warm per-user caches and code paths, unrecorded
+    warm_client, warm_rng = make_client(), random.Random(f'{seed}:{name}:warmup')
+    for _ in range(warmup):
+        call(warm_client, warm_rng)
+    
+    shares = [requests // concurrency + (1 if number < requests % concurrency else 0) for number in range(concurrency)]
+    threads = [threading.Thread(target=worker, args=(number, count)) for number, count in enumerate(shares) if count]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    
+    p50, p95, p99 = np.percentile(np.array(latencies) * 1000, [50, 95, 99])
+    return {
+        'requests': len(latencies),
+        'errors': sum(count for status, count in statuses.items() if status >= 400),
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'p50_ms': round(float(p50), 2),
+        'p95_ms': round(float(p95), 2),
+        'p99_ms': round(float(p99), 2),
+        'mean_ms': round(float(np.mean(latencies) * 1000), 2),
+        'throughput_rps': round(len(latencies) / wall, 1)
+    }
+
+def _commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(previous, current, threshold):
+    """Print p50/p95/p99 changes per endpoint; returns the endpoints whose p95 grew past the threshold"""
+    regressions = []
+    print(f"\n{'endpoint':<36} {'p50 ms':>17} {'p95 ms':>17} {'p99 ms':>17} {'rps':>15}")
+    for name, result in current['endpoints'].items():
+        before = previous['endpoints'].get(name)
+        if before is None:
+            print(f"{name:<36} (new)")
+            continue
+        
+        columns = [f"{before[key]:>7.1f}->{result[key]:<7.1f}" for key in ('p50_ms', 'p95_ms', 'p99_ms')]
+        change = result['p95_ms'] / before['p95_ms'] - 1 if before['p95_ms'] else 0
+        flag = '  REGRESSION' if change > threshold else ''
+        if flag:
+            regressions.append(name)
+        print(f"{name:<36} {columns[0]:>17} {columns[1]:>17} {columns[2]:>17} "
+              f"{before['throughput_rps']:>6.0f}->{result['throughput_rps']:<6.0f} p95 {change:+.0%}{flag}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='End-to-end API benchmark')
+    parser.add_argument('--database', help='SQLAlchemy URL (default: a fresh SQLite file)')
+    parser.add_argument('--url', help='drive a running server at this base URL instead of the in-process app')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--expenses', type=int, default=2000, help='expenses per user when generating')
+    parser.add_argument('--budgets', type=int, default=10, help='budgets per user when generating')
+    parser.add_argument('--notifications', type=int, default=50, help='notifications per user when generating')
+    parser.add_argument('--years', type=float, default=2)
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=200, help='requests per endpoint')
+    parser.add_argument('--warmup', type=int, default=10, help='unrecorded requests per endpoint first')
+    parser.add_argument('--only', help='comma-separated endpoint name prefixes, e.g. analytics,expenses.summary')
+    parser.add_argument('--output', help='write results to this JSON file')
+    parser.add_argument('--compare', help='baseline JSON to compare against; exits 1 on a p95 regression')
+    parser.add_argument('--threshold', type=float, default=0.10, help='p95 growth counted as a regression')
+    args = parser.parse_args()
+    
+    database = args.database or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench_api.db')
+    app = bench_app(database)
+    users = prepare_users(app, args)
+    
+    if args.url:
+        make_client = lambda: HttpClient(args.url)
+    else:
+        make_client = lambda: InProcessClient(app)
+    
+    prefixes = [prefix.strip() for prefix in args.only.split(',')] if args.only else None
+    scenarios = [scenario for scenario in SCENARIOS if not prefixes or scenario[0].startswith(tuple(prefixes))]
+    
+    results = {
+        'meta': {
+            'commit': _commit(),
+            'recorded_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'database': database.split(':', 1)[0],
+            'target': args.url or 'in-process',
+            'python': platform.python_version(),
+            'users': len(users),
+            'expenses_per_user': args.expenses,
+            'seed': args.seed,
+            'concurrency': args.concurrency,
+            'requests': args.requests
+        },
+        'endpoints': {}
+    }
+    
+    print(f"{'endpoint':<36} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'rps':>8} {'errors':>7}")
+    for scenario in scenarios:
+        result = run_scenario(make_client, scenario, users, args.concurrency, args.requests, args.warmup, args.seed)
+        results['endpoints'][scenario[0]] = result
+        print(f"{scenario[0]:<36} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {result['p99_ms']:>8.1f} "
+              f"{result['throughput_rps']:>8.1f} {result['errors']:>7}", flush=True)
+    
+    if args.output:
+        with open(args.output, 'w') as handle:
+            json.dump(results, handle, indent=2)
+        print(f"\nwrote {args.output}")
+    
+    if args.compare:
+        with open(args.compare) as handle:
+            previous = json.load(handle)
+        regressions = compare(previous, results, args.threshold)
+        if regressions:
+            print(f"\np95 regressed more than {args.threshold:.0%}: {', '.join(regressions)}")
+            sys.exit(1)
+
+if __name__ == '__main__':
+    main()
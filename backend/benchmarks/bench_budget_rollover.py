@@ -0,0 +1,94 @@
+# Time the recurring-budget rollover job over a large budgets table
+# Usage: python -m benchmarks.bench_budget_rollover [--budgets 1000000]
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+from config import TestingConfig
+
+def main():
+    parser = argparse.ArgumentParser(description='Recurring budget rollover benchmark')
+    parser.add_argument('--budgets', type=int, default=1000000, help='recurring budgets to roll over')
+    parser.add_argument('--database-url', help='database to run against (default: temporary SQLite file)')
+    args = parser.parse_args()
+    
+    from app import create_app, db
+    from models.budget import Budget
+    from models.user import User
+    from services.budget_rollover import rollover_recurring_budgets
+    
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = args.database_url or 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    
+    app = create_app(BenchConfig)
+    
+    # Every user gets one budget per category and recurring period
+    combos = [
+        (category, period)
+        for category in Budget.VALID_CATEGORIES
+        for period in ('weekly', 'monthly', 'yearly')
+    ]
+    user_count = -(-args.budgets // len(combos))
+    
+    # Periods that ended before today
+    today = date.today()
+    last_month_end = today.replace(day=1) - timedelta(days=1)
+    ended = {
+        'weekly': (today - timedelta(days=today.weekday() + 7), today - timedelta(days=today.weekday() + 1)),
+        'monthly': (last_month_end.replace(day=1), last_month_end),
+        'yearly': (date(today.year - 1, 1, 1), date(today.year - 1, 12, 31))
+    }
+    
+    with app.app_context():
+        started = time.perf_counter()
+        now = datetime.utcnow()
+        
+        db.session.execute(User.__table__.insert(), [
+            {
+                'id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password_hash': 'x',
+                'first_name': 'Bench',
+                'last_name': 'User',
+                'currency': 'USD',
+                'created_at': now
+            }
+            for user_id in range(1, user_count + 1)
+        ])
+        
+        rows = []
+        for i in range(args.budgets):
+            category, period = combos[i % len(combos)]
+            start_date, end_date = ended[period]
+            rows.append({
+                'user_id': i // len(combos) + 1,
+                'category': category,
+                'amount_cents': (100 + i % 400) * 100,
+                'period': period,
+                'start_date': start_date,
+                'end_date': end_date,
+                'is_active': True,
+                'alert_threshold': 80,
+                'spent_cents': 0,
+                'created_at': now,
+                'updated_at': now
+            })
+            if len(rows) == 50000:
+                db.session.execute(Budget.__table__.insert(), rows)
+                rows = []
+        if rows:
+            db.session.execute(Budget.__table__.insert(), rows)
+        db.session.commit()
+        print(f"seeded {args.budgets} budgets for {user_count} users in {time.perf_counter() - started:.1f}s")
+        
+        started = time.perf_counter()
+        created = rollover_recurring_budgets()
+        print(f"rollover: created {created} budgets in {time.perf_counter() - started:.2f}s")
+        
+        started = time.perf_counter()
+        created = rollover_recurring_budgets()
+        print(f"re-run:   created {created} budgets in {time.perf_counter() - started:.2f}s")
+
+if __name__ == '__main__':
+    main()
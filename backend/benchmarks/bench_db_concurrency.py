@@ -0,0 +1,136 @@
+# Measure concurrent reads and writes on SQLite: stock pragmas vs the WAL engine profile
+# Usage: python -m benchmarks.bench_db_concurrency [--users 20] [--expenses 5000] [--readers 8] [--writers 2] [--seconds 10]
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+import numpy as np
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+from benchmarks.ledger_generator import bench_app, generate
+
+# SQLite's own defaults (rollback journal, fsync on every commit, 2 MB cache)
+# with pysqlite's 5 s lock timeout: what the app ran with before engine profiles
+PROFILES = {
+    'stock': {
+        'SQLITE_JOURNAL_MODE': 'DELETE',
+        'SQLITE_SYNCHRONOUS': 'FULL',
+        'SQLITE_BUSY_TIMEOUT_MS': 5000,
+        'SQLITE_CACHE_SIZE_MB': 2,
+        'SQLITE_MMAP_SIZE_MB': 0
+    },
+    'profile': {}
+}
+
+SUMMARY = text(
+    'SELECT category, SUM(amount_cents), COUNT(*) FROM expenses '
+    'WHERE user_id = :user_id AND date >= :since GROUP BY category'
+)
+INSERT = text(
+    "INSERT INTO expenses (user_id, amount_cents, category, description, date, payment_method, created_at, updated_at) "
+    "VALUES (:user_id, :cents, 'food', 'Benchmark expense', :day, 'debit_card', :now, :now)"
+)
+SPEND = text(
+    "UPDATE budgets SET spent_cents = spent_cents + :cents "
+    "WHERE user_id = :user_id AND category IN ('total', 'food') AND start_date <= :day AND end_date >= :day"
+)
+
+def run(engine, user_ids, readers, writers, seconds, seed):
+    """Readers run summaries and writers record expenses until time is up; returns latencies and lock errors"""
+    reads, writes = [], []
+    errors = {'read': 0, 'write': 0}
+    lock = threading.Lock()
+    since = date.today() - timedelta(days=90)
+    deadline = time.perf_counter() + seconds
+    
+    def reader(number):
+        rng = random.Random(f'{seed}:read:{number}')
+        samples, failed = [], 0
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            try:
+                with engine.connect() as connection:
+                    connection.execute(SUMMARY, {'user_id': rng.choice(user_ids), 'since': since}).all()
+                samples.append(time.perf_counter() - started)
+            except OperationalError:
+                failed += 1
+        with lock:
+            reads.extend(samples)
+            errors['read'] += failed
+    
+    def writer(number):
+        rng = random.Random(f'{seed}:write:{number}')
+        samples, failed = [], 0
+        while time.perf_counter() < deadline:
+            params = {
+                'user_id': rng.choice(user_ids), 'cents': rng.randint(200, 8000),
+                'day': date.today(), 'now': datetime.utcnow()
+            }
+            started = time.perf_counter()
+            try:
+                with engine.begin() as connection:
+                    connection.execute(INSERT, params)
+                    connection.execute(SPEND, params)
+                samples.append(time.perf_counter() - started)
+            except OperationalError:
+                failed += 1
+        with lock:
+            writes.extend(samples)
+            errors['write'] += failed
+    
+    threads = [threading.Thread(target=reader, args=(number,)) for number in range(readers)]
+    threads += [threading.Thread(target=writer, args=(number,)) for number in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return reads, writes, errors
+
+def summarize(samples, seconds):
+    if not samples:
+        return {'ops': 0, 'per_second': 0.0, 'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0}
+    p50, p95, p99 = np.percentile(np.array(samples) * 1000, [50, 95, 99])
+    return {'ops': len(samples), 'per_second': len(samples) / seconds, 'p50_ms': p50, 'p95_ms': p95, 'p99_ms': p99}
+
+def main():
+    parser = argparse.ArgumentParser(description='SQLite read/write concurrency benchmark')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--expenses', type=int, default=5000, help='expenses per user')
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--writers', type=int, default=2)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+    
+    results = {}
+    for name, settings in PROFILES.items():
+        database = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        app = bench_app(database, **settings)
+        with app.app_context():
+            from app import db
+            generate(db.engine, args.users, args.expenses, budgets=10, notifications=0, years=1, seed=args.seed)
+            with db.engine.connect() as connection:
+                user_ids = [row[0] for row in connection.execute(text('SELECT id FROM users'))]
+                mode = connection.exec_driver_sql('PRAGMA journal_mode').scalar()
+            
+            reads, writes, errors = run(db.engine, user_ids, args.readers, args.writers, args.seconds, args.seed)
+            db.engine.dispose()
+        
+        results[name] = (summarize(reads, args.seconds), summarize(writes, args.seconds), errors)
+        print(f"{name} (journal_mode={mode}): {args.readers} readers, {args.writers} writers, {args.seconds:.0f} s")
+        for kind, stats in (('reads', results[name][0]), ('writes', results[name][1])):
+            print(f"  {kind:<7} {stats['per_second']:>8.1f}/s  p50 {stats['p50_ms']:>7.2f} ms  "
+                  f"p95 {stats['p95_ms']:>7.2f} ms  p99 {stats['p99_ms']:>7.2f} ms")
+        print(f"  lock errors: {errors['read']} reads, {errors['write']} writes")
+    
+    stock, profile = results['stock'], results['profile']
+    for index, kind in enumerate(('reads', 'writes')):
+        if stock[index]['per_second']:
+            print(f"{kind}: {profile[index]['per_second'] / stock[index]['per_second']:.1f}x throughput, "
+                  f"p99 {stock[index]['p99_ms']:.1f} -> {profile[index]['p99_ms']:.1f} ms")
+
+if __name__ == '__main__':
+    main()
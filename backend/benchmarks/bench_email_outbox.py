@@ -0,0 +1,89 @@
+# Measure notification email throughput against a local SMTP sink
+# Usage: python -m benchmarks.bench_email_outbox [--messages 2000] [--latency-ms 5]
+import argparse
+import os
+import tempfile
+import time
+from datetime import datetime
+from config import TestingConfig
+from benchmarks.smtp_sink import SMTPSink
+
+def run(concurrency, message_count, latency):
+    from app import create_app, db
+    from models.notification import Notification
+    from models.user import User
+    from services.email_outbox import run_email_outbox
+    
+    sink = SMTPSink(latency=latency).start()
+    
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        MAIL_SERVER = '127.0.0.1'
+        MAIL_PORT = sink.port
+        MAIL_USE_TLS = False
+        MAIL_USERNAME = None
+        MAIL_PASSWORD = None
+        MAIL_SUPPRESS_SEND = False
+        MAIL_DEBUG = False
+        ENABLE_EMAIL_NOTIFICATIONS = True
+        EMAIL_OUTBOX_CONCURRENCY = concurrency
+        EMAIL_OUTBOX_BATCH_SIZE = 500
+    
+    app = create_app(BenchConfig)
+    
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(User.__table__.insert(), [
+            {
+                'id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password_hash': 'x',
+                'first_name': 'Bench',
+                'last_name': 'User',
+                'currency': 'USD',
+                'email_notifications': True,
+                'unread_notification_count': 0,
+                'created_at': now
+            }
+            for user_id in range(1, 101)
+        ])
+        db.session.execute(Notification.__table__.insert(), [
+            {
+                'user_id': i % 100 + 1,
+                'type': 'budget_alert',
+                'title': f'Budget Alert #{i}',
+                'message': 'You have used 85.0% of your monthly budget.',
+                'data': {},
+                'is_read': False,
+                'is_sent': False,
+                'priority': 'medium',
+                'created_at': now
+            }
+            for i in range(message_count)
+        ])
+        db.session.commit()
+        
+        started = time.perf_counter()
+        sent = run_email_outbox()
+        elapsed = time.perf_counter() - started
+        
+        unsent = Notification.query.filter_by(is_sent=False).count()
+        app.extensions['smtp_pool'].close()
+    
+    sink.stop()
+    assert sent == message_count == sink.received and unsent == 0, (sent, sink.received, unsent)
+    return elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description='Email outbox throughput benchmark')
+    parser.add_argument('--messages', type=int, default=2000)
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='simulated SMTP time per message')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 4, 8])
+    args = parser.parse_args()
+    
+    for concurrency in args.concurrency:
+        elapsed = run(concurrency, args.messages, args.latency_ms / 1000)
+        print(f"concurrency={concurrency:<3} {args.messages / elapsed:8.1f} messages/s  ({elapsed:.2f}s)")
+
+if __name__ == '__main__':
+    main()
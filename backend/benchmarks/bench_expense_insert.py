@@ -0,0 +1,83 @@
+# Measure POST /api/expenses latency with budget checks inline vs queued
+# Usage: python -m benchmarks.bench_expense_insert [--seed 5000] [--requests 200]
+import argparse
+import os
+import tempfile
+import time
+from datetime import date, timedelta
+from config import TestingConfig
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run(eager, seed_count, request_count):
+    from app import create_app, db
+    from flask_jwt_extended import create_access_token
+    
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        TASKS_ALWAYS_EAGER = eager
+        TASK_WORKERS = 1
+    
+    app = create_app(BenchConfig)
+    
+    with app.app_context():
+        from models.user import User
+        from models.expense import Expense
+        from models.budget import Budget
+        
+        user = User('bench@example.com', 'Bench-passw0rd', 'Bench', 'User')
+        db.session.add(user)
+        db.session.commit()
+        
+        # Existing expenses in the budget period
+        start = date.today().replace(day=1)
+        db.session.bulk_save_objects([
+            Expense(user.id, 5 + i % 50, 'food', f'seed {i}', start + timedelta(days=i % 28))
+            for i in range(seed_count)
+        ])
+        db.session.commit()
+        
+        # Budgets that every inserted expense falls into
+        db.session.add(Budget(user.id, 'food', 10 ** 6, period='monthly'))
+        db.session.add(Budget(user.id, 'total', 10 ** 6, period='monthly'))
+        db.session.commit()
+        
+        headers = {'Authorization': f'Bearer {create_access_token(identity=user.id)}'}
+    
+    client = app.test_client()
+    payload = {
+        'amount': '12.50',
+        'category': 'food',
+        'description': 'Benchmark lunch',
+        'date': date.today().isoformat()
+    }
+    
+    samples = []
+    for _ in range(request_count):
+        started = time.perf_counter()
+        response = client.post('/api/expenses/', json=payload, headers=headers)
+        samples.append((time.perf_counter() - started) * 1000)
+        assert response.status_code == 201, response.get_json()
+        
+        # Drain the single task worker outside the timed section so each
+        # request sees an idle server, as it would between user actions
+        if not eager:
+            app.extensions['tasks']['executor'].submit(lambda: None).result()
+    
+    return samples
+
+def main():
+    parser = argparse.ArgumentParser(description='Expense insert latency benchmark')
+    parser.add_argument('--seed', type=int, default=5000, help='expenses already in the budget period')
+    parser.add_argument('--requests', type=int, default=200, help='expenses to insert per mode')
+    args = parser.parse_args()
+    
+    for label, eager in (('inline (before)', True), ('queued (after)', False)):
+        samples = run(eager, args.seed, args.requests)
+        print(f"{label:16} p50={percentile(samples, 50):7.2f}ms  p99={percentile(samples, 99):7.2f}ms")
+
+if __name__ == '__main__':
+    main()
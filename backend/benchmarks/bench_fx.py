@@ -0,0 +1,78 @@
+# Measure converting mixed-currency expenses with the numpy FX table vs a per-row lookup
+# Usage: python -m benchmarks.bench_fx [--rows 1000000] [--years 5] [--repeat 5]
+import argparse
+import time
+from datetime import date, timedelta
+import numpy as np
+from services.fx import FxTable
+
+CURRENCIES = ['USD', 'EUR', 'GBP', 'JPY', 'CAD', 'AUD', 'CHF', 'INR']
+
+def synthetic_rates(years, seed=7):
+    """Random-walk weekday rates per currency against USD (not real market data)"""
+    rng = np.random.default_rng(seed)
+    start = date.today() - timedelta(days=int(years * 365))
+    rows = []
+    for currency, level in zip(CURRENCIES[1:], [0.9, 0.8, 140.0, 1.3, 1.5, 0.9, 80.0]):
+        rate = level
+        for offset in range(int(years * 365)):
+            day = start + timedelta(days=offset)
+            rate *= float(np.exp(rng.normal(0, 0.004)))
+            if day.weekday() < 5:
+                rows.append((day, currency, rate))
+    return start, rows
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='FX conversion benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--years', type=float, default=5)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    start, rate_rows = synthetic_rates(args.years)
+    started = time.perf_counter()
+    table = FxTable.from_rows('USD', rate_rows)
+    build_time = time.perf_counter() - started
+    
+    rng = np.random.default_rng(11)
+    cents = rng.integers(100, 100000, args.rows)
+    days = start.toordinal() + rng.integers(0, int(args.years * 365), args.rows)
+    codes = rng.integers(0, len(CURRENCIES), args.rows)
+    
+    # The per-row approach: a dict of (currency, day) -> rate, walking back to the last published day
+    lookup = {(currency, day.toordinal()): rate for day, currency, rate in rate_rows}
+    def rate_on(currency, day):
+        if currency == 'USD':
+            return 1.0
+        while (currency, day) not in lookup and day > start.toordinal():
+            day -= 1
+        return lookup.get((currency, day), 1.0)
+    
+    sample = min(args.rows, 100000)
+    cents_list, days_list, codes_list = cents[:sample].tolist(), days[:sample].tolist(), codes[:sample].tolist()
+    def per_row():
+        return [
+            round(value * rate_on('EUR', day) / rate_on(CURRENCIES[code], day))
+            for value, day, code in zip(cents_list, days_list, codes_list)
+        ]
+    
+    vectorized_time = best_of(lambda: table.convert_cents(cents, days, codes, CURRENCIES, 'EUR'), args.repeat)
+    per_row_time = best_of(per_row, 1) * args.rows / sample
+    
+    converted = table.convert_cents(cents[:sample], days[:sample], codes[:sample], CURRENCIES, 'EUR')
+    mismatches = int(np.count_nonzero(np.abs(converted - np.array(per_row())) > 1))
+    
+    print(f"rates: {len(rate_rows)} rows, {len(CURRENCIES)} currencies, table built in {build_time * 1000:.1f} ms ({table.rates.nbytes / 1024:.0f} KB)")
+    print(f"convert {args.rows} rows: numpy {vectorized_time * 1000:.1f} ms, per-row lookup ~{per_row_time * 1000:.0f} ms "
+          f"({per_row_time / vectorized_time:.0f}x); rows differing by more than a cent: {mismatches}")
+
+if __name__ == '__main__':
+    main()
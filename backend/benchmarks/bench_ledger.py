@@ -0,0 +1,97 @@
+# Measure memory per expense and summary time: ORM objects vs the compact ledger
+# Usage: python -m benchmarks.bench_ledger [--expenses 50000] [--repeat 5]
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from datetime import date, timedelta
+from config import TestingConfig
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def measure(func):
+    """(result, bytes still allocated by the result) for func()"""
+    gc.collect()
+    tracemalloc.start()
+    result = func()
+    gc.collect()
+    allocated = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, allocated
+
+def orm_summary(expenses):
+    """The per-object loop /api/expenses/summary used before the ledger"""
+    total = sum(float(expense.amount) for expense in expenses)
+    categories = {}
+    methods = {}
+    for expense in expenses:
+        categories[expense.category] = categories.get(expense.category, 0) + float(expense.amount)
+        methods[expense.payment_method] = methods.get(expense.payment_method, 0) + float(expense.amount)
+    return total, categories, methods
+
+def ledger_summary(view):
+    return view.total_cents(), view.group_totals('category'), view.group_totals('payment_method')
+
+def main():
+    parser = argparse.ArgumentParser(description='Compact ledger benchmark')
+    parser.add_argument('--expenses', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    
+    from app import create_app, db
+    
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+    
+    app = create_app(BenchConfig)
+    
+    with app.app_context():
+        from models.user import User
+        from models.expense import Expense
+        from services.ledger import UserLedger
+        
+        user = User('bench@example.com', 'Bench-passw0rd', 'Bench', 'User')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        
+        rng = random.Random(7)
+        start = date.today() - timedelta(days=3 * 365)
+        db.session.bulk_save_objects([
+            Expense(
+                user_id, round(rng.uniform(1, 200), 2), rng.choice(Expense.VALID_CATEGORIES), f'expense {i}',
+                start + timedelta(days=rng.randrange(3 * 365)),
+                payment_method=rng.choice(Expense.VALID_PAYMENT_METHODS),
+                tags=rng.choice([None, 'work', 'travel,work', 'family']),
+                location=rng.choice([None, 'Home', 'Office', 'Downtown'])
+            )
+            for i in range(args.expenses)
+        ])
+        db.session.commit()
+        db.session.expunge_all()
+        
+        expenses, orm_bytes = measure(lambda: Expense.query.filter_by(user_id=user_id).all())
+        orm_time = best_of(lambda: orm_summary(expenses), args.repeat)
+        del expenses
+        db.session.expunge_all()
+        
+        ledger, ledger_bytes = measure(lambda: UserLedger.load(user_id))
+        ledger_time = best_of(lambda: ledger_summary(ledger.view()), args.repeat)
+        
+        count = args.expenses
+        print(f"expenses: {count}")
+        print(f"ORM objects  {orm_bytes / count:8.1f} bytes/expense  summary {orm_time * 1000:8.2f} ms")
+        print(f"ledger       {ledger_bytes / count:8.1f} bytes/expense  summary {ledger_time * 1000:8.2f} ms  (columns {ledger.nbytes / count:.1f} bytes/expense)")
+        print(f"memory {orm_bytes / ledger_bytes:.1f}x smaller, summary {orm_time / ledger_time:.1f}x faster")
+
+if __name__ == '__main__':
+    main()
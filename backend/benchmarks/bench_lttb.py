@@ -0,0 +1,96 @@
+# Measure LTTB downsampling of 10-year daily spending series
+# Usage: python -m benchmarks.bench_lttb [--years 10] [--max-points 500 1000]
+import argparse
+import json
+import time
+from datetime import date, timedelta
+import numpy as np
+from services.downsample import lttb
+
+def lttb_reference(x, y, max_points):
+    """Point-by-point LTTB, the textbook loop the numpy version replaces"""
+    n = len(y)
+    if max_points >= n:
+        return list(range(n))
+    every = (n - 2) / (max_points - 2)
+    selected = [0]
+    a = 0
+    
+    for i in range(max_points - 2):
+        start = int(i * every) + 1
+        end = int((i + 1) * every) + 1
+        next_start, next_end = end, min(int((i + 2) * every) + 1, n)
+        if i == max_points - 3:
+            next_start, next_end = n - 1, n
+        
+        avg_x = sum(x[next_start:next_end]) / (next_end - next_start)
+        avg_y = sum(y[next_start:next_end]) / (next_end - next_start)
+        
+        best_area = -1
+        best = start
+        for j in range(start, end):
+            area = abs((x[a] - avg_x) * (y[j] - y[a]) - (x[a] - x[j]) * (avg_y - y[a]))
+            if area > best_area:
+                best_area = area
+                best = j
+        selected.append(best)
+        a = best
+    
+    selected.append(n - 1)
+    return selected
+
+def daily_series(years, seed=7):
+    """Synthetic daily totals: weekly rhythm, seasonality, noise and rare large spikes"""
+    rng = np.random.default_rng(seed)
+    days = int(years * 365.25)
+    t = np.arange(days)
+    totals = 40 + 15 * np.sin(2 * np.pi * t / 7) + 20 * np.sin(2 * np.pi * t / 365.25) + rng.gamma(2, 10, days)
+    spikes = rng.choice(days, size=max(1, days // 200), replace=False)
+    totals[spikes] += rng.uniform(500, 3000, len(spikes))
+    return t.astype(np.float64), np.round(totals, 2)
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='LTTB downsampling benchmark')
+    parser.add_argument('--years', type=float, default=10)
+    parser.add_argument('--max-points', type=int, nargs='+', default=[250, 500, 1000])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+    
+    x, y = daily_series(args.years)
+    start = date.today() - timedelta(days=len(y) - 1)
+    points = [{'date': (start + timedelta(days=int(day))).isoformat(), 'total': float(total)} for day, total in zip(x, y)]
+    full_bytes = len(json.dumps(points))
+    spikes = np.argsort(y)[-10:]
+    
+    print(f"series: {len(y)} daily points, {full_bytes / 1024:.0f} KB as JSON")
+    for max_points in args.max_points:
+        # Nothing to downsample: lttb returns every point
+        if max_points >= len(y):
+            print(f"max_points={max_points:<5} skipped, series has only {len(y)} points")
+            continue
+        
+        x_list, y_list = x.tolist(), y.tolist()
+        numpy_time = best_of(lambda: lttb(x, y, max_points, keep_peak=False), args.repeat)
+        reference_time = best_of(lambda: lttb_reference(x_list, y_list, max_points), max(1, args.repeat // 4))
+        
+        keep = lttb(x, y, max_points)
+        assert lttb(x, y, max_points, keep_peak=False).tolist() == lttb_reference(x_list, y_list, max_points)
+        kept_bytes = len(json.dumps([points[i] for i in keep]))
+        kept_spikes = len(set(spikes.tolist()) & set(keep.tolist()))
+        
+        print(
+            f"max_points={max_points:<5} numpy {numpy_time * 1000:6.2f} ms  python {reference_time * 1000:7.2f} ms  "
+            f"({reference_time / numpy_time:4.1f}x)  payload {kept_bytes / 1024:5.1f} KB  "
+            f"top-10 spikes kept {kept_spikes}/10  max kept {int(np.argmax(y)) in keep}"
+        )
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+# Measure accuracy and speed of summing money as floats/Decimals vs integer cents
+# Usage: python -m benchmarks.bench_money_sums [--rows 1000000] [--repeat 3]
+import argparse
+import random
+import sqlite3
+import time
+from decimal import Decimal
+import numpy as np
+
+def best_of(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return result, min(timings)
+
+def main():
+    parser = argparse.ArgumentParser(description='Money summation benchmark')
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    rng = random.Random(7)
+    cents = [rng.randint(1, 2000000) for _ in range(args.rows)]
+    decimals = [Decimal(value).scaleb(-2) for value in cents]
+    floats = [float(value) for value in decimals]
+    cents_array = np.asarray(cents, dtype=np.int64)
+    exact = sum(cents)
+    
+    # Old SQLite storage: Numeric(10, 2) is stored as REAL
+    connection = sqlite3.connect(':memory:')
+    connection.execute('CREATE TABLE expenses (amount NUMERIC(10, 2), amount_cents BIGINT)')
+    connection.executemany('INSERT INTO expenses VALUES (?, ?)', zip(floats, cents))
+    
+    def scalar(query):
+        return connection.execute(query).fetchone()[0]
+    
+    cases = [
+        ('python float(amount) loop (before)', lambda: sum(float(value) for value in decimals), 'amount'),
+        ('python Decimal loop', lambda: sum(decimals), 'amount'),
+        ('python int cents', lambda: sum(cents), 'cents'),
+        ('numpy int64 cents', lambda: int(cents_array.sum()), 'cents'),
+        ('SQL SUM(amount) (before)', lambda: scalar('SELECT SUM(amount) FROM expenses'), 'amount'),
+        ('SQL SUM(amount_cents)', lambda: scalar('SELECT SUM(amount_cents) FROM expenses'), 'cents'),
+    ]
+    
+    print(f"rows: {args.rows}, exact total {Decimal(exact).scaleb(-2)}")
+    for name, func, unit in cases:
+        total, elapsed = best_of(func, args.repeat)
+        total_cents = int(total) if unit == 'cents' else Decimal(str(total)) * 100
+        error = total_cents - exact
+        print(f"{name:<36} {elapsed * 1000:9.2f} ms  error {float(error):+.4f} cents")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,149 @@
+# Park many idle /api/notifications/stream and /poll clients on a running server and measure memory, DB load and fan-out
+# Usage: python -m benchmarks.bench_notification_streams [--streams 2000] [--polls 2000] [--idle-seconds 5]
+import argparse
+import logging
+import os
+import resource
+import selectors
+import socket
+import tempfile
+import threading
+import time
+from datetime import datetime
+from sqlalchemy import event
+from werkzeug.serving import make_server
+from config import TestingConfig
+
+def rss_mb():
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+def open_client(port, path, token):
+    """Send one GET and leave the connection open for the response"""
+    client = socket.create_connection(('127.0.0.1', port))
+    client.sendall(
+        f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAuthorization: Bearer {token}\r\n\r\n'.encode()
+    )
+    client.setblocking(False)
+    return client
+
+def wait_until(condition, timeout):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            raise RuntimeError('timed out waiting for clients to park')
+        time.sleep(0.05)
+
+def main():
+    parser = argparse.ArgumentParser(description='Idle notification stream capacity benchmark')
+    parser.add_argument('--streams', type=int, default=2000, help='SSE clients on /stream')
+    parser.add_argument('--polls', type=int, default=2000, help='long-poll clients on /poll')
+    parser.add_argument('--idle-seconds', type=float, default=5.0)
+    args = parser.parse_args()
+    
+    # Two descriptors per client: its socket and the server's end
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    needed = 2 * (args.streams + args.polls) + 256
+    if soft < needed:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (min(needed, hard), hard))
+    
+    from app import create_app, db
+    from flask_jwt_extended import create_access_token
+    from models.user import User
+    from routes.notifications import emit_notification_update
+    from services.notification_waiters import waiters
+    
+    class BenchConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = 'sqlite:///' + os.path.join(tempfile.mkdtemp(), 'bench.db')
+        NOTIFICATION_POLL_MAX_TIMEOUT = int(args.idle_seconds) + 60
+        NOTIFICATION_STREAM_MAX_SECONDS = int(args.idle_seconds) + 60
+    
+    app = create_app(BenchConfig)
+    user_ids = list(range(1, args.streams + args.polls + 1))
+    
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.execute(User.__table__.insert(), [
+            {
+                'id': user_id,
+                'email': f'user{user_id}@example.com',
+                'password_hash': 'x',
+                'first_name': 'Bench',
+                'last_name': 'User',
+                'currency': 'USD',
+                'unread_notification_count': 0,
+                'created_at': now
+            }
+            for user_id in user_ids
+        ])
+        db.session.commit()
+        tokens = {user_id: create_access_token(identity=user_id) for user_id in user_ids}
+    
+    # Each parked request holds one thread of the threaded WSGI server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    threading.stack_size(256 * 1024)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    server.request_queue_size = 1024
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_port
+    
+    baseline = rss_mb()
+    selector = selectors.DefaultSelector()
+    timeout = int(args.idle_seconds) + 60
+    for user_id in user_ids:
+        if user_id <= args.streams:
+            path = '/api/notifications/stream'
+        else:
+            path = f'/api/notifications/poll?timeout={timeout}'
+        selector.register(open_client(port, path, tokens[user_id]), selectors.EVENT_READ, user_id)
+        # Stay within the server's listen backlog
+        if user_id % 200 == 0:
+            wait_until(lambda: waiters.subscriber_count() == user_id, 60)
+    wait_until(lambda: waiters.subscriber_count() == len(user_ids), 60)
+    
+    queries = [0]
+    with app.app_context():
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(*args):
+            queries[0] += 1
+    
+    time.sleep(args.idle_seconds)
+    parked_rss = rss_mb()
+    idle_queries = queries[0]
+    
+    # Published the way routes do; each client counts once its event arrives
+    started = time.perf_counter()
+    with app.app_context():
+        for user_id in user_ids:
+            emit_notification_update(user_id, {'type': 'benchmark'})
+    published = time.perf_counter()
+    
+    buffers = {user_id: b'' for user_id in user_ids}
+    received = {}
+    while len(received) < len(user_ids) and time.perf_counter() - published < 60:
+        for key, _ in selector.select(timeout=1):
+            user_id = key.data
+            try:
+                chunk = key.fileobj.recv(65536)
+            except BlockingIOError:
+                continue
+            buffers[user_id] += chunk
+            if b'notification_update' in buffers[user_id] or not chunk:
+                received[user_id] = time.perf_counter()
+                selector.unregister(key.fileobj)
+                key.fileobj.close()
+    
+    delivered = [received[user_id] for user_id in user_ids if b'notification_update' in buffers[user_id]]
+    assert len(delivered) == len(user_ids), f'{len(user_ids) - len(delivered)} clients missed the event'
+    server.shutdown()
+    
+    print(f"streams={args.streams}  polls={args.polls}  idle={args.idle_seconds:.0f}s  db queries while idle={idle_queries}")
+    print(f"rss {baseline:.1f} MB -> {parked_rss:.1f} MB  "
+          f"({(parked_rss - baseline) * 1024 / len(user_ids):.1f} KB per parked client, server and client side)")
+    print(f"publish {(published - started) * 1000:.1f} ms, last delivery {(max(delivered) - started) * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,338 @@
+# Deterministic synthetic data: users with expenses, budgets and notifications, bulk inserted
+# Usage: python -m benchmarks.ledger_generator --database sqlite:////tmp/bench.db [--users 1000] [--expenses 10000]
+import argparse
+import calendar
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+import numpy as np
+
+# Share of transactions and lognormal (median dollars, sigma) per category
+CATEGORY_PROFILES = {
+    'food': (0.34, 14, 0.6),
+    'transport': (0.16, 11, 0.7),
+    'shopping': (0.14, 38, 0.9),
+    'entertainment': (0.09, 24, 0.8),
+    'bills': (0.08, 85, 0.5),
+    'healthcare': (0.05, 55, 0.9),
+    'education': (0.03, 70, 1.0),
+    'other': (0.11, 20, 1.1)
+}
+
+PAYMENT_METHOD_WEIGHTS = {
+    'debit_card': 0.34, 'credit_card': 0.30, 'cash': 0.14, 'digital_wallet': 0.12,
+    'bank_transfer': 0.07, 'check': 0.01, 'other': 0.02
+}
+
+MERCHANTS = {
+    'food': ['Grocery store', 'Cafe', 'Lunch', 'Bakery', 'Takeaway', 'Farmers market'],
+    'transport': ['Bus pass', 'Fuel', 'Taxi', 'Train ticket', 'Parking'],
+    'shopping': ['Clothes', 'Electronics', 'Home goods', 'Books', 'Gifts'],
+    'entertainment': ['Cinema', 'Concert', 'Streaming', 'Games', 'Museum'],
+    'bills': ['Electricity', 'Internet', 'Phone', 'Water', 'Insurance'],
+    'healthcare': ['Pharmacy', 'Doctor visit', 'Dentist', 'Gym'],
+    'education': ['Course', 'Textbooks', 'Workshop'],
+    'other': ['Haircut', 'Donation', 'Repairs', 'Pet supplies']
+}
+
+TAGS = [None, 'work', 'family', 'travel', 'subscription', 'work,travel', 'health']
+TAG_WEIGHTS = [0.70, 0.08, 0.08, 0.05, 0.05, 0.02, 0.02]
+LOCATIONS = [None, 'Home', 'Downtown', 'Office', 'Mall', 'Online', 'Airport']
+LOCATION_WEIGHTS = [0.55, 0.10, 0.12, 0.08, 0.06, 0.08, 0.01]
+
+NOTIFICATION_PROFILES = [
+    # (type, priority, share, title)
+    ('budget_alert', 'medium', 0.30, 'Budget Alert'),
+    ('spending_warning', 'high', 0.15, 'Spending Warning'),
+    ('monthly_report', 'low', 0.20, 'Monthly Report Ready'),
+    ('bill_reminder', 'medium', 0.15, 'Bill Reminder'),
+    ('unusual_spending', 'high', 0.08, 'Unusual Spending Pattern'),
+    ('budget_exceeded', 'urgent', 0.07, 'Budget Exceeded'),
+    ('system_update', 'low', 0.05, 'System Update')
+]
+
+PASSWORD = 'Bench-passw0rd'
+
+def _weights(values):
+    values = np.asarray(values, dtype=float)
+    return values / values.sum()
+
+def _day_weights(first_day, days):
+    """More spending on weekends and in December, as in real card data"""
+    ordinals = first_day.toordinal() + np.arange(days)
+    weekdays = (ordinals + 6) % 7  # date.weekday() of each ordinal
+    weights = np.where(weekdays >= 5, 1.35, 1.0)
+    months = np.array([date.fromordinal(int(day)).month for day in ordinals])
+    weights *= np.where(months == 12, 1.3, 1.0)
+    return weights / weights.sum()
+
+def _month_start(day, months_back):
+    month = day.year * 12 + day.month - 1 - months_back
+    return date(month // 12, month % 12 + 1, 1)
+
+def user_expenses(rng, user_id, count, first_day, day_weights):
+    """One user's expenses as column lists, dated by day_weights from first_day on"""
+    categories = list(CATEGORY_PROFILES)
+    shares = _weights([CATEGORY_PROFILES[category][0] for category in categories])
+    methods = list(PAYMENT_METHOD_WEIGHTS)
+    
+    # Users differ in how much they spend and how they pay
+    scale = rng.lognormal(0, 0.45)
+    method_weights = rng.dirichlet(np.array(list(PAYMENT_METHOD_WEIGHTS.values())) * 20)
+    
+    category_codes = rng.choice(len(categories), size=count, p=shares)
+    medians = np.array([CATEGORY_PROFILES[category][1] for category in categories])[category_codes]
+    sigmas = np.array([CATEGORY_PROFILES[category][2] for category in categories])[category_codes]
+    cents = np.maximum(np.rint(medians * scale * rng.lognormal(0, sigmas) * 100), 1).astype(np.int64)
+    # Sorted, as people record expenses roughly in date order
+    days = np.sort(first_day.toordinal() + rng.choice(len(day_weights), size=count, p=day_weights))
+    method_codes = rng.choice(len(methods), size=count, p=method_weights)
+    tag_codes = rng.choice(len(TAGS), size=count, p=TAG_WEIGHTS)
+    location_codes = rng.choice(len(LOCATIONS), size=count, p=LOCATION_WEIGHTS)
+    merchant_picks = rng.integers(0, 1 << 16, size=count)
+    seconds = rng.integers(7 * 3600, 23 * 3600, size=count)
+    
+    dates = [date.fromordinal(day) for day in days.tolist()]
+    created = [datetime(day.year, day.month, day.day) + timedelta(seconds=second)
+               for day, second in zip(dates, seconds.tolist())]
+    category_names = [categories[code] for code in category_codes.tolist()]
+    return {
+        'user_id': [user_id] * count,
+        'amount_cents': cents.tolist(),
+        'category': category_names,
+        'description': [MERCHANTS[category][pick % len(MERCHANTS[category])]
+                        for category, pick in zip(category_names, merchant_picks.tolist())],
+        'date': dates,
+        'payment_method': [methods[code] for code in method_codes.tolist()],
+        'tags': [TAGS[code] for code in tag_codes.tolist()],
+        'location': [LOCATIONS[code] for code in location_codes.tolist()],
+        'created_at': created,
+        'updated_at': created
+    }
+
+def user_budgets(rng, user_id, count, today, expenses):
+    """Monthly budgets for a few categories, this month first and then earlier months.
+    
+    Amounts sit around the user's own average monthly spend (from their expense
+    columns), so some budgets run over and raise alerts as they would in use.
+    """
+    if count <= 0:
+        return []
+    
+    categories = ['total'] + [str(category) for category in rng.choice(list(CATEGORY_PROFILES), size=4, replace=False)]
+    months = max(1, len({(day.year, day.month) for day in expenses['date']}))
+    monthly = Counter()
+    for category, cents in zip(expenses['category'], expenses['amount_cents']):
+        monthly[category] += cents
+    monthly['total'] = sum(monthly.values())
+    rows = []
+    for k in range(count):
+        category = categories[k % len(categories)]
+        start = _month_start(today, k // len(categories))
+        end = start.replace(day=calendar.monthrange(start.year, start.month)[1])
+        created_at = datetime(start.year, start.month, start.day, 9)
+        rows.append({
+            'user_id': user_id,
+            'category': category,
+            'amount_cents': max(100, int(round(monthly[category] / months * rng.uniform(0.8, 1.3) / 100)) * 100),
+            'period': 'monthly',
+            'start_date': start,
+            'end_date': end,
+            'is_active': True,
+            'alert_threshold': int(rng.choice([75, 80, 90])),
+            'spent_cents': 0,
+            'created_at': created_at,
+            'updated_at': created_at
+        })
+    return rows
+
+def user_notifications(rng, user_id, count, now):
+    """Notifications over the last 90 days; older ones are mostly read"""
+    shares = _weights([profile[2] for profile in NOTIFICATION_PROFILES])
+    kinds = rng.choice(len(NOTIFICATION_PROFILES), size=count, p=shares)
+    ages = rng.exponential(20 * 86400, size=count).clip(0, 90 * 86400)
+    reads = rng.random(count) < np.minimum(0.95, 0.3 + ages / (30 * 86400))
+    
+    rows = []
+    for i in range(count):
+        kind, priority, _, title = NOTIFICATION_PROFILES[kinds[i]]
+        created_at = now - timedelta(seconds=float(ages[i]))
+        rows.append({
+            'user_id': user_id,
+            'type': kind,
+            'title': title,
+            'message': f'{title} for your account',
+            'data': None,
+            'is_read': bool(reads[i]),
+            'is_sent': True,
+            'email_attempts': 0,
+            'priority': priority,
+            'created_at': created_at,
+            'read_at': created_at + timedelta(hours=2) if reads[i] else None
+        })
+    return rows
+
+def _as_columns(rows):
+    return {name: [row[name] for row in rows] for name in rows[0]} if rows else {}
+
+def _insert(connection, table, columns, chunk):
+    """Insert column lists in batches of `chunk` rows"""
+    names = list(columns)
+    if not names:
+        return 0
+    count = len(columns[names[0]])
+    dialect = connection.dialect
+    
+    if dialect.name == 'sqlite':
+        # SQLAlchemy's per-row parameter handling costs more than SQLite's own
+        # insert, so convert each column once and hand rows to the driver
+        statement = table.insert().compile(dialect=dialect, column_keys=names)
+        converted = {}
+        for name in names:
+            # created_at and updated_at share one list; convert it once
+            same = next((other for other in converted if columns[other] is columns[name]), None)
+            if same is not None:
+                converted[name] = converted[same]
+                continue
+            processor = table.c[name].type.dialect_impl(dialect).bind_processor(dialect)
+            converted[name] = [processor(value) for value in columns[name]] if processor else columns[name]
+        rows = list(zip(*(converted[name] for name in statement.positiontup)))
+        for start in range(0, count, chunk):
+            connection.exec_driver_sql(str(statement), rows[start:start + chunk])
+    else:
+        # executemany here becomes multi-row INSERTs (insertmanyvalues) on PostgreSQL
+        rows = [dict(zip(names, values)) for values in zip(*columns.values())]
+        for start in range(0, count, chunk):
+            connection.execute(table.insert(), rows[start:start + chunk])
+    return count
+
+def generate(engine, users=100, expenses=1000, budgets=10, notifications=50, years=2, seed=7,
+             today=None, chunk=20000, email_prefix='bench-user', progress=None):
+    """Insert `users` users with the given number of rows each; returns row counts.
+    
+    Every user's rows come from a generator seeded with (seed, user number), so
+    the same arguments always produce the same data. Counters kept by ORM
+    events (budget spend, unread counts) are not maintained by the bulk
+    inserts; reconcile them afterwards.
+    """
+    from sqlalchemy import select
+    from werkzeug.security import generate_password_hash
+    from models.user import User
+    from models.expense import Expense
+    from models.budget import Budget
+    from models.notification import Notification
+    
+    today = today or date.today()
+    now = datetime(today.year, today.month, today.day, 12)
+    first_day = today - timedelta(days=int(years * 365) - 1)
+    day_weights = _day_weights(first_day, (today - first_day).days + 1)
+    
+    # One hash for everyone; hashing per user would dominate generation time
+    password_hash = generate_password_hash(PASSWORD)
+    counts = {'users': 0, 'expenses': 0, 'budgets': 0, 'notifications': 0}
+    
+    with engine.begin() as connection:
+        if engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('PRAGMA synchronous = OFF')
+        
+        emails = [f'{email_prefix}-{number}@example.com' for number in range(users)]
+        _insert(connection, User.__table__, _as_columns([{
+            'email': email, 'password_hash': password_hash, 'first_name': 'Bench', 'last_name': f'User{number}',
+            'currency': 'USD', 'email_notifications': False, 'unread_notification_count': 0,
+            'is_active': True, 'is_verified': True, 'created_at': now, 'updated_at': now
+        } for number, email in enumerate(emails)]), chunk)
+        counts['users'] = users
+        
+        user_table = User.__table__
+        ids = dict(connection.execute(
+            select(user_table.c.email, user_table.c.id).where(user_table.c.email.like(f'{email_prefix}-%'))
+        ).all())
+        
+        tables = {'expenses': Expense.__table__, 'budgets': Budget.__table__, 'notifications': Notification.__table__}
+        pending = {name: {} for name in tables}
+        
+        # Building secondary indexes once at the end beats updating them per row
+        deferred = [index for name in ('expenses', 'notifications') for index in tables[name].indexes]
+        for index in deferred:
+            index.drop(connection, checkfirst=True)
+        
+        for number, email in enumerate(emails):
+            rng = np.random.default_rng([seed, number])
+            user_id = ids[email]
+            expense_columns = user_expenses(rng, user_id, expenses, first_day, day_weights)
+            generated = {
+                'expenses': expense_columns,
+                'budgets': _as_columns(user_budgets(rng, user_id, budgets, today, expense_columns)),
+                'notifications': _as_columns(user_notifications(rng, user_id, notifications, now))
+            }
+            
+            for name, columns in generated.items():
+                for column, values in columns.items():
+                    pending[name].setdefault(column, []).extend(values)
+                
+                buffered = len(next(iter(pending[name].values()), []))
+                if buffered >= chunk or (buffered and number == users - 1):
+                    counts[name] += _insert(connection, tables[name], pending[name], chunk)
+                    pending[name] = {}
+            
+            if progress and (number + 1) % max(1, users // 20) == 0:
+                progress(number + 1, counts)
+        
+        for index in deferred:
+            index.create(connection)
+    
+    return counts
+
+def reconcile_counters():
+    """Bring ORM-maintained counters in line with bulk-inserted rows (needs an app context)"""
+    from services.budget_spend import reconcile_budget_spend
+    from services.notification_counts import repair_unread_counts
+    
+    return len(reconcile_budget_spend()), len(repair_unread_counts())
+
+def bench_app(database, **settings):
+    """An app on `database` configured for benchmarking rather than development; settings override config"""
+    from app import create_app
+    from config import ProductionConfig
+    
+    class BenchConfig(ProductionConfig):
+        SQLALCHEMY_DATABASE_URI = database
+        QUERY_STATS_LOG = False
+        ENABLE_SCHEDULER = False
+        ENABLE_EMAIL_NOTIFICATIONS = False
+    
+    for name, value in settings.items():
+        setattr(BenchConfig, name, value)
+    return create_app(BenchConfig)
+
+def main():
+    parser = argparse.ArgumentParser(description='Synthetic ledger generator')
+    parser.add_argument('--database', required=True, help='SQLAlchemy URL, e.g. sqlite:////tmp/bench.db or postgresql://localhost/bench')
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--expenses', type=int, default=10000, help='expenses per user')
+    parser.add_argument('--budgets', type=int, default=10, help='budgets per user')
+    parser.add_argument('--notifications', type=int, default=50, help='notifications per user')
+    parser.add_argument('--years', type=float, default=2, help='years of history')
+    parser.add_argument('--seed', type=int, default=7)
+    parser.add_argument('--chunk', type=int, default=20000, help='rows per INSERT batch')
+    args = parser.parse_args()
+    
+    app = bench_app(args.database)
+    with app.app_context():
+        from app import db
+        
+        started = time.perf_counter()
+        counts = generate(
+            db.engine, args.users, args.expenses, args.budgets, args.notifications, args.years, args.seed,
+            chunk=args.chunk,
+            progress=lambda done, counts: print(f"  {done}/{args.users} users, {sum(counts.values())} rows", flush=True)
+        )
+        elapsed = time.perf_counter() - started
+        budgets_fixed, users_fixed = reconcile_counters()
+    
+    rows = sum(counts.values())
+    print(f"inserted {rows} rows in {elapsed:.1f} s ({rows / elapsed:,.0f} rows/s): {counts}")
+    print(f"reconciled {budgets_fixed} budget counters and {users_fixed} unread counts")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,60 @@
+# Minimal local SMTP server that accepts and counts messages, for tests and benchmarks
+import socketserver
+import threading
+import time
+
+class _SinkHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode('ascii'))
+    
+    def handle(self):
+        self.reply('220 sink ready')
+        
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            
+            command = line.decode('ascii', 'replace').strip().upper()
+            if command.startswith('EHLO'):
+                self.wfile.write(b'250-sink\r\n250 8BITMIME\r\n')
+            elif command.startswith(('HELO', 'MAIL', 'RCPT', 'RSET', 'NOOP')):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                
+                # Simulated server-side processing time per message
+                if self.server.latency:
+                    time.sleep(self.server.latency)
+                with self.server.lock:
+                    self.server.received += 1
+                self.reply('250 Queued')
+            elif command == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+class SMTPSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0):
+        super().__init__((host, port), _SinkHandler)
+        self.latency = latency
+        self.received = 0
+        self.lock = threading.Lock()
+    
+    @property
+    def port(self):
+        return self.server_address[1]
+    
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
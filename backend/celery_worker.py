@@ -0,0 +1,6 @@
+# Celery worker entry point: celery -A celery_worker.celery worker
+from app import create_app
+from services.tasks import make_celery
+
+app = create_app()
+celery = make_celery(app)
@@ -11,11 +11,21 @@ class Config:
     # Database config
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL') or 'sqlite:///finance_dashboard.db'
     SQLALCHEMY_TRACK_MODIFICATIONS = False
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_size': 10,
-        'pool_recycle': 120,
-        'pool_pre_ping': True
-    }
+    SQLALCHEMY_ENGINE_OPTIONS = {}  # Applied over the profile picked for the database's dialect
+    
+    # Connection pool config (per process: keep workers x (size + overflow) under the server's max_connections)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 10)
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW') or 10)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 10)  # Seconds to wait for a free connection
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE') or 1800)  # Seconds; below the server's idle timeout
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 30000)  # PostgreSQL/MySQL; 0 disables
+    
+    # SQLite pragmas (applied to every new connection)
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE') or 'WAL'
+    SQLITE_SYNCHRONOUS = os.environ.get('SQLITE_SYNCHRONOUS') or 'NORMAL'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS') or 5000)  # Wait this long for a writer's lock
+    SQLITE_CACHE_SIZE_MB = int(os.environ.get('SQLITE_CACHE_SIZE_MB') or 32)  # Page cache per connection
+    SQLITE_MMAP_SIZE_MB = int(os.environ.get('SQLITE_MMAP_SIZE_MB') or 256)
     
     # JWT config
     JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY') or 'jwt-secret-change-in-production'
@@ -30,10 +40,58 @@ class Config:
     MAIL_USE_TLS = os.environ.get('MAIL_USE_TLS', 'true').lower() in ['true', 'on', '1']
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
+    MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER') or MAIL_USERNAME or 'notifications@localhost'
+    
+    # Email outbox config (delivery of unsent notifications)
+    EMAIL_OUTBOX_INTERVAL = int(os.environ.get('EMAIL_OUTBOX_INTERVAL') or 30)  # Seconds between runs
+    EMAIL_OUTBOX_BATCH_SIZE = int(os.environ.get('EMAIL_OUTBOX_BATCH_SIZE') or 200)
+    EMAIL_OUTBOX_CONCURRENCY = int(os.environ.get('EMAIL_OUTBOX_CONCURRENCY') or 4)  # Parallel SMTP connections
+    EMAIL_OUTBOX_MAX_RETRIES = int(os.environ.get('EMAIL_OUTBOX_MAX_RETRIES') or 3)
+    EMAIL_OUTBOX_RETRY_BACKOFF = float(os.environ.get('EMAIL_OUTBOX_RETRY_BACKOFF') or 0.5)  # Seconds, doubled per retry
+    EMAIL_OUTBOX_MAX_AGE_HOURS = int(os.environ.get('EMAIL_OUTBOX_MAX_AGE_HOURS') or 24)  # Older notifications are not emailed
+    EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS') or 5)  # Runs before a failing email is given up on
     
     # Redis config (for caching and WebSocket)
     REDIS_URL = os.environ.get('REDIS_URL') or 'redis://localhost:6379/0'
     
+    # Background task config
+    TASK_BACKEND = os.environ.get('TASK_BACKEND', 'thread')  # thread, celery
+    TASK_WORKERS = int(os.environ.get('TASK_WORKERS') or 4)
+    TASKS_ALWAYS_EAGER = os.environ.get('TASKS_ALWAYS_EAGER', 'false').lower() in ['true', 'on', '1']
+    CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL') or REDIS_URL
+    CELERY_RESULT_BACKEND = os.environ.get('CELERY_RESULT_BACKEND')
+    
+    # Scheduled job config (enable on a single process)
+    ENABLE_SCHEDULER = os.environ.get('ENABLE_SCHEDULER', 'false').lower() in ['true', 'on', '1']
+    BUDGET_RECONCILE_HOUR = int(os.environ.get('BUDGET_RECONCILE_HOUR') or 3)
+    UNREAD_COUNT_REPAIR_INTERVAL = int(os.environ.get('UNREAD_COUNT_REPAIR_INTERVAL') or 3600)  # Seconds
+    
+    # Budget index config (in-process cache of each user's active budgets)
+    BUDGET_INDEX_MAX_USERS = int(os.environ.get('BUDGET_INDEX_MAX_USERS') or 10000)
+    BUDGET_INDEX_TTL = int(os.environ.get('BUDGET_INDEX_TTL') or 300)  # Seconds; bounds staleness across workers
+    
+    # Spend index config (in-process per-user prefix sums of spending by day and category)
+    SPEND_INDEX_MAX_MB = int(os.environ.get('SPEND_INDEX_MAX_MB') or 64)
+    SPEND_INDEX_TTL = int(os.environ.get('SPEND_INDEX_TTL') or 300)  # Seconds; bounds staleness across workers
+    
+    # Ledger cache config (in-process compact columns of each user's expenses for analytics)
+    LEDGER_CACHE_MAX_MB = int(os.environ.get('LEDGER_CACHE_MAX_MB') or 64)
+    LEDGER_CACHE_TTL = int(os.environ.get('LEDGER_CACHE_TTL') or 300)  # Seconds; bounds staleness across workers
+    
+    # Exchange rates (CSV of date,currency,rate: units of each currency per one base unit)
+    FX_RATES_FILE = os.environ.get('FX_RATES_FILE')
+    FX_BASE_CURRENCY = os.environ.get('FX_BASE_CURRENCY') or 'USD'
+    FX_RATES_GRACE_DAYS = int(os.environ.get('FX_RATES_GRACE_DAYS') or 7)  # Days past the file's last rate new expenses may use it
+    
+    # Bearer token required to scrape /api/metrics (open when unset)
+    METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+    
+    # Per-request SQL query stats (response headers in development, log lines otherwise)
+    QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', 'false').lower() in ['true', 'on', '1']
+    QUERY_STATS_LOG = os.environ.get('QUERY_STATS_LOG', 'true').lower() in ['true', 'on', '1']
+    QUERY_STATS_REPEAT_THRESHOLD = int(os.environ.get('QUERY_STATS_REPEAT_THRESHOLD') or 5)  # Same SELECT this often is logged as a likely N+1
+    QUERY_BUDGET_STRICT = os.environ.get('QUERY_BUDGET_STRICT', 'false').lower() in ['true', 'on', '1']  # Raise when an endpoint exceeds its query budget
+    
     # File upload config
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max file size
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'uploads')
@@ -51,19 +109,62 @@ class Config:
     # Notification config
     ENABLE_EMAIL_NOTIFICATIONS = os.environ.get('ENABLE_EMAIL_NOTIFICATIONS', 'true').lower() in ['true', 'on', '1']
     ENABLE_PUSH_NOTIFICATIONS = os.environ.get('ENABLE_PUSH_NOTIFICATIONS', 'false').lower() in ['true', 'on', '1']
+    
+    # Notification stream config (SSE and long-poll fallbacks)
+    NOTIFICATION_STREAM_HEARTBEAT = int(os.environ.get('NOTIFICATION_STREAM_HEARTBEAT') or 15)  # Seconds
+    NOTIFICATION_STREAM_MAX_SECONDS = int(os.environ.get('NOTIFICATION_STREAM_MAX_SECONDS') or 300)
+    NOTIFICATION_POLL_MAX_TIMEOUT = int(os.environ.get('NOTIFICATION_POLL_MAX_TIMEOUT') or 30)
+    
+    # Threads computing /api/dashboard panels (0 computes them one by one)
+    DASHBOARD_WORKERS = int(os.environ.get('DASHBOARD_WORKERS') or 4)
+    
+    # Largest result /api/analytics/pivot will return
+    PIVOT_MAX_ROWS = int(os.environ.get('PIVOT_MAX_ROWS') or 5000)
+    
+    # /api/batch config
+    BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS') or 20)
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS') or 4)  # Threads for parallel read-only items
+    
+    # Redis URL Socket.IO uses to pass emits between processes (unset: one process)
+    SOCKETIO_MESSAGE_QUEUE = os.environ.get('SOCKETIO_MESSAGE_QUEUE')
+    
+    # Presence registry config (memory or redis)
+    PRESENCE_BACKEND = os.environ.get('PRESENCE_BACKEND') or 'memory'
+    PRESENCE_TTL = int(os.environ.get('PRESENCE_TTL') or 60)  # Seconds without a heartbeat before offline
+    PRESENCE_OFFLINE_QUEUE_SIZE = int(os.environ.get('PRESENCE_OFFLINE_QUEUE_SIZE') or 100)
+    PRESENCE_OFFLINE_QUEUE_TTL = int(os.environ.get('PRESENCE_OFFLINE_QUEUE_TTL') or 86400)
+    
+    # Seconds notifications of each priority are buffered and merged into digests (0 sends at once)
+    NOTIFICATION_DIGEST_WINDOWS = {
+        'low': int(os.environ.get('NOTIFICATION_DIGEST_WINDOW_LOW') or 60),
+        'medium': int(os.environ.get('NOTIFICATION_DIGEST_WINDOW_MEDIUM') or 15),
+        'high': int(os.environ.get('NOTIFICATION_DIGEST_WINDOW_HIGH') or 5),
+        'urgent': 0
+    }
 
 class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_ECHO = True
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 5)
+    DB_STATEMENT_TIMEOUT_MS = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS') or 0)  # Let slow queries finish while profiling
+    QUERY_STATS_HEADERS = True
+    QUERY_STATS_LOG = False
 
 class ProductionConfig(Config):
     DEBUG = False
     SQLALCHEMY_ECHO = False
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE') or 20)
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT') or 5)  # Fail fast rather than queue behind a saturated pool
 
 class TestingConfig(Config):
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///:memory:'
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=5)
+    TASKS_ALWAYS_EAGER = True
+    NOTIFICATION_DIGEST_WINDOWS = {'low': 0, 'medium': 0, 'high': 0, 'urgent': 0}  # Deliver at once
+    QUERY_STATS_LOG = False
+    QUERY_BUDGET_STRICT = True
+    DB_STATEMENT_TIMEOUT_MS = 5000
 
 config = {
     'development': DevelopmentConfig,
@@ -0,0 +1,43 @@
+# Gunicorn settings: gunicorn -c gunicorn.conf.py "app:create_app()"
+import glob
+import os
+import tempfile
+
+bind = os.environ.get('GUNICORN_BIND') or '0.0.0.0:5000'
+
+# SSE streams, long polls and Socket.IO connections each hold a thread for as
+# long as they stay open, which would starve sync workers of requests
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS') or 100)
+
+# Socket.IO sessions and SSE/long-poll waiters live in the worker that accepted
+# them, and gunicorn cannot route a client back to the same worker. Run one
+# worker per instance; scale out with more instances behind a sticky load
+# balancer sharing SOCKETIO_MESSAGE_QUEUE and PRESENCE_BACKEND=redis
+workers = int(os.environ.get('GUNICORN_WORKERS') or 1)
+
+# create_app() picks its settings (pool sizes, timeouts) from FLASK_ENV
+os.environ.setdefault('FLASK_ENV', 'production')
+
+# Workers write their metric samples here so /api/metrics can sum them; this
+# must be set before prometheus_client is imported, which happens in the workers
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'expense-tracker-metrics'))
+
+def when_ready(server):
+    if workers > 1 and not os.environ.get('SOCKETIO_MESSAGE_QUEUE'):
+        server.log.warning(
+            "%s workers without SOCKETIO_MESSAGE_QUEUE: Socket.IO emits and polling clients "
+            "only reach the worker that owns the connection", workers
+        )
+
+def on_starting(server):
+    # Samples left by a previous run would be added to this one's
+    path = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    os.makedirs(path, exist_ok=True)
+    for name in glob.glob(os.path.join(path, '*.db')):
+        os.remove(name)
+
+def child_exit(server, worker):
+    # Drop the exited worker's live gauges; its counters and histograms still count
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
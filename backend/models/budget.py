@@ -1,6 +1,7 @@
 from app import db
 from datetime import datetime, date
-from sqlalchemy import Index, Numeric
+from sqlalchemy import Index, UniqueConstraint
+from services.money import cents_to_decimal, from_cents, to_cents
 
 class Budget(db.Model):
     __tablename__ = 'budgets'
@@ -8,12 +9,13 @@ class Budget(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
     category = db.Column(db.String(50), nullable=False, index=True)
-    amount = db.Column(Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # Integer minor units
     period = db.Column(db.String(20), nullable=False, default='monthly')  # monthly, yearly, weekly
     start_date = db.Column(db.Date, nullable=False)
     end_date = db.Column(db.Date, nullable=False)
     is_active = db.Column(db.Boolean, default=True)
     alert_threshold = db.Column(db.Integer, default=80)  # Alert when 80% of budget is used
+    spent_cents = db.Column(db.BigInteger, nullable=False, default=0)  # Running total, kept by services.budget_spend
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -21,6 +23,7 @@ class Budget(db.Model):
     __table_args__ = (
         Index('idx_user_category_period', 'user_id', 'category', 'period'),
         Index('idx_user_active_dates', 'user_id', 'is_active', 'start_date', 'end_date'),
+        UniqueConstraint('user_id', 'category', 'period', 'start_date', name='uq_budget_period_start'),
     )
     
     # Valid periods
@@ -35,7 +38,7 @@ class Budget(db.Model):
     def __init__(self, user_id, category, amount, period='monthly', start_date=None, end_date=None, **kwargs):
         self.user_id = user_id
         self.category = category.lower()
-        self.amount = float(amount)
+        self.amount_cents = to_cents(amount)
         self.period = period.lower()
         
         # Validate inputs
@@ -45,7 +48,7 @@ class Budget(db.Model):
         if self.period not in self.VALID_PERIODS:
             raise ValueError(f"Invalid period. Must be one of: {', '.join(self.VALID_PERIODS)}")
         
-        if self.amount <= 0:
+        if self.amount_cents <= 0:
             raise ValueError("Budget amount must be greater than 0")
         
         # Set dates based on period
@@ -90,6 +93,15 @@ class Budget(db.Model):
             else:
                 self.end_date = date(today.year, today.month + 1, 1) - timedelta(days=1)
     
+    @property
+    def amount(self):
+        """Budget amount as an exact Decimal, for display and input"""
+        return cents_to_decimal(self.amount_cents)
+    
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+    
     def to_dict(self):
         """Convert budget object to dictionary"""
         return {
@@ -97,7 +109,7 @@ class Budget(db.Model):
             'user_id': self.user_id,
             'category': self.category,
             'category_display': self.get_category_display_name(),
-            'amount': float(self.amount),
+            'amount': from_cents(self.amount_cents),
             'period': self.period,
             'start_date': self.start_date.isoformat() if self.start_date else None,
             'end_date': self.end_date.isoformat() if self.end_date else None,
@@ -122,36 +134,17 @@ class Budget(db.Model):
     
     def get_spent_amount(self):
         """Get total amount spent in this budget period"""
-        from models.expense import Expense
-        
-        if self.category == 'total':
-            # Total spending across all categories
-            expenses = Expense.query.filter(
-                Expense.user_id == self.user_id,
-                Expense.date >= self.start_date,
-                Expense.date <= self.end_date
-            ).all()
-        else:
-            # Spending for specific category
-            expenses = Expense.query.filter(
-                Expense.user_id == self.user_id,
-                Expense.category == self.category,
-                Expense.date >= self.start_date,
-                Expense.date <= self.end_date
-            ).all()
-        
-        return sum(float(expense.amount) for expense in expenses)
+        return from_cents(self.spent_cents)
     
     def get_remaining_amount(self):
         """Get remaining budget amount"""
-        return float(self.amount) - self.get_spent_amount()
+        return from_cents(self.amount_cents - (self.spent_cents or 0))
     
     def get_percentage_used(self):
         """Get percentage of budget used"""
-        spent = self.get_spent_amount()
-        if float(self.amount) == 0:
+        if not self.amount_cents:
             return 0
-        return (spent / float(self.amount)) * 100
+        return ((self.spent_cents or 0) / self.amount_cents) * 100
     
     def get_days_remaining(self):
         """Get number of days remaining in budget period"""
@@ -162,13 +155,19 @@ class Budget(db.Model):
     
     def is_over_budget(self):
         """Check if budget is exceeded"""
-        return self.get_spent_amount() > float(self.amount)
+        return (self.spent_cents or 0) > self.amount_cents
     
     def should_send_alert(self):
         """Check if alert should be sent based on threshold"""
         percentage_used = self.get_percentage_used()
         return percentage_used >= self.alert_threshold
     
+    def get_performance_score(self):
+        """Score from 100 (nothing spent) down to 0 (over budget)"""
+        if self.is_over_budget():
+            return 0
+        return min(100, (1 - self.get_percentage_used() / 100) * 100)
+    
     def get_daily_budget_remaining(self):
         """Get suggested daily budget for remaining days"""
         remaining_amount = self.get_remaining_amount()
@@ -189,7 +188,7 @@ class Budget(db.Model):
         for field, value in kwargs.items():
             if field in allowed_fields and hasattr(self, field):
                 if field == 'amount':
-                    value = float(value)
+                    field, value = 'amount_cents', to_cents(value)
                     if value <= 0:
                         raise ValueError("Budget amount must be greater than 0")
                 elif field == 'category':
@@ -212,17 +211,13 @@ class Budget(db.Model):
     @classmethod
     def get_active_budgets(cls, user_id, category=None):
         """Get active budgets for a user"""
-        query = cls.query.filter(
-            cls.user_id == user_id,
-            cls.is_active == True,
-            cls.start_date <= date.today(),
-            cls.end_date >= date.today()
-        )
+        from services.budget_index import get_budget_index
         
-        if category:
-            query = query.filter_by(category=category.lower())
+        intervals = get_budget_index(user_id).covering(date.today(), category)
+        if not intervals:
+            return []
         
-        return query.all()
+        return cls.query.filter(cls.id.in_([interval.id for interval in intervals])).all()
     
     @classmethod
     def get_budgets_needing_alerts(cls, user_id):
@@ -230,13 +225,82 @@ class Budget(db.Model):
         active_budgets = cls.get_active_budgets(user_id)
         return [budget for budget in active_budgets if budget.should_send_alert()]
     
+    @classmethod
+    def get_budget_vs_actual(cls, user_id, start_date, end_date):
+        """Get budget vs actual spending for budgets overlapping a date range"""
+        from services.budget_index import get_budget_index
+        
+        # Get active budgets for the period
+        intervals = get_budget_index(user_id).overlapping(start_date, end_date)
+        budgets = cls.query.filter(
+            cls.id.in_([interval.id for interval in intervals])
+        ).order_by(cls.start_date).all() if intervals else []
+        
+        budget_analysis = []
+        total_budgeted_cents = 0
+        total_spent_cents = 0
+        
+        for budget in budgets:
+            spent_cents = budget.spent_cents or 0
+            total_budgeted_cents += budget.amount_cents
+            total_spent_cents += spent_cents
+            
+            spent = from_cents(spent_cents)
+            budget_amount = from_cents(budget.amount_cents)
+            variance = from_cents(spent_cents - budget.amount_cents)
+            variance_percentage = (variance / budget_amount * 100) if budget_amount > 0 else 0
+            
+            budget_analysis.append({
+                'budget_id': budget.id,
+                'category': budget.category,
+                'display_name': budget.get_category_display_name(),
+                'period': budget.period,
+                'budgeted_amount': budget_amount,
+                'actual_spent': spent,
+                'remaining': from_cents(budget.amount_cents - spent_cents),
+                'variance': variance,
+                'variance_percentage': round(variance_percentage, 2),
+                'percentage_used': round(budget.get_percentage_used(), 2),
+                'is_over_budget': budget.is_over_budget(),
+                'days_remaining': budget.get_days_remaining(),
+                'daily_budget_remaining': budget.get_daily_budget_remaining()
+            })
+        
+        # Overall analysis
+        total_budgeted = from_cents(total_budgeted_cents)
+        total_spent = from_cents(total_spent_cents)
+        overall_variance = from_cents(total_spent_cents - total_budgeted_cents)
+        overall_variance_percentage = (overall_variance / total_budgeted * 100) if total_budgeted > 0 else 0
+        
+        return {
+            'budget_analysis': budget_analysis,
+            'summary': {
+                'total_budgeted': total_budgeted,
+                'total_spent': total_spent,
+                'total_remaining': from_cents(total_budgeted_cents - total_spent_cents),
+                'overall_variance': overall_variance,
+                'overall_variance_percentage': round(overall_variance_percentage, 2),
+                'overall_percentage_used': (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0,
+                'period': {
+                    'start_date': start_date.isoformat(),
+                    'end_date': end_date.isoformat()
+                }
+            }
+        }
+    
     @classmethod
     def get_budget_performance(cls, user_id, months=6):
-        """Get budget performance over time"""
-        from sqlalchemy import and_
+        """Get budget performance over time.
+        
+        Closed periods are read from their snapshot, which is written on the
+        first read after the period ends if the nightly job has not yet done so.
+        Only budgets whose period is still open are computed live.
+        """
+        from models.budget_snapshot import BudgetPeriodSnapshot
         from datetime import datetime, timedelta
         
         # Get budgets from the last N months
+        today = date.today()
         start_date = datetime.utcnow().date() - timedelta(days=30 * months)
         
         budgets = cls.query.filter(
@@ -244,13 +308,35 @@ class Budget(db.Model):
             cls.end_date >= start_date
         ).order_by(cls.start_date.desc()).all()
         
+        closed_ids = [budget.id for budget in budgets if budget.end_date < today]
+        snapshots = {}
+        if closed_ids:
+            snapshots = {
+                snapshot.budget_id: snapshot
+                for snapshot in BudgetPeriodSnapshot.query.filter(
+                    BudgetPeriodSnapshot.budget_id.in_(closed_ids)
+                ).all()
+            }
+        
+        missing = [
+            BudgetPeriodSnapshot.from_budget(budget)
+            for budget in budgets if budget.id in closed_ids and budget.id not in snapshots
+        ]
+        for snapshot in missing:
+            snapshots[snapshot.budget_id] = snapshot
+        
         performance_data = []
         for budget in budgets:
-            performance_data.append({
-                'budget': budget.to_dict(),
-                'performance_score': min(100, (1 - budget.get_percentage_used() / 100) * 100) if not budget.is_over_budget() else 0
-            })
+            if budget.id in snapshots:
+                performance_data.append(snapshots[budget.id].to_performance_dict())
+            else:
+                performance_data.append({
+                    'budget': budget.to_dict(),
+                    'performance_score': budget.get_performance_score()
+                })
         
+        # Saved last: the commit expires every budget loaded above
+        BudgetPeriodSnapshot.save(missing)
         return performance_data
     
     def __repr__(self):
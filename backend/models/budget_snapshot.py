@@ -0,0 +1,111 @@
+from app import db
+from datetime import datetime, date
+from sqlalchemy import Index
+from sqlalchemy.exc import IntegrityError
+
+class BudgetPeriodSnapshot(db.Model):
+    """Frozen result of a budget whose period has ended"""
+    __tablename__ = 'budget_period_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(db.Integer, db.ForeignKey('budgets.id'), nullable=False, unique=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    period = db.Column(db.String(20), nullable=False)
+    start_date = db.Column(db.Date, nullable=False)
+    end_date = db.Column(db.Date, nullable=False)
+    budget_amount_cents = db.Column(db.BigInteger, nullable=False)
+    spent_cents = db.Column(db.BigInteger, nullable=False)
+    percentage_used = db.Column(db.Float, nullable=False)
+    performance_score = db.Column(db.Float, nullable=False)
+    budget_data = db.Column(db.JSON, nullable=False)  # Budget.to_dict() when the period closed
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    budget = db.relationship(
+        'Budget',
+        backref=db.backref('period_snapshot', uselist=False, cascade='all, delete-orphan')
+    )
+    
+    # Indexes for better query performance
+    __table_args__ = (
+        Index('idx_snapshot_user_end', 'user_id', 'end_date'),
+    )
+    
+    @classmethod
+    def from_budget(cls, budget):
+        """Build a snapshot from a budget whose period has ended"""
+        if budget.end_date >= date.today():
+            raise ValueError("Budget period has not ended yet")
+        
+        snapshot = cls()
+        snapshot.budget_id = budget.id
+        snapshot.user_id = budget.user_id
+        snapshot.category = budget.category
+        snapshot.period = budget.period
+        snapshot.start_date = budget.start_date
+        snapshot.end_date = budget.end_date
+        snapshot.budget_amount_cents = budget.amount_cents
+        snapshot.spent_cents = budget.spent_cents or 0
+        snapshot.percentage_used = budget.get_percentage_used()
+        snapshot.performance_score = budget.get_performance_score()
+        snapshot.budget_data = budget.to_dict()
+        return snapshot
+    
+    def to_performance_dict(self):
+        """Same shape as an entry of Budget.get_budget_performance"""
+        return {
+            'budget': self.budget_data,
+            'performance_score': self.performance_score
+        }
+    
+    @classmethod
+    def capture(cls, budgets):
+        """Snapshot closed budgets, tolerating snapshots written concurrently"""
+        snapshots = [cls.from_budget(budget) for budget in budgets]
+        if not cls.save(snapshots):
+            return cls.query.filter(
+                cls.budget_id.in_([budget.id for budget in budgets])
+            ).all()
+        return snapshots
+    
+    @classmethod
+    def save(cls, snapshots):
+        """Commit built snapshots; returns False if another worker wrote them first"""
+        if not snapshots:
+            return True
+        
+        # One executemany; the ORM would insert row by row to fetch each id
+        columns = [column.key for column in cls.__table__.columns if column.key not in ('id', 'created_at')]
+        try:
+            db.session.execute(
+                cls.__table__.insert(),
+                [{column: getattr(snapshot, column) for column in columns} for snapshot in snapshots]
+            )
+            db.session.commit()
+        except IntegrityError:
+            # Another worker closed the same periods first; theirs are identical
+            db.session.rollback()
+            return False
+        return True
+    
+    @classmethod
+    def capture_closed_budgets(cls, batch_size=500):
+        """Snapshot every budget whose period ended and has no snapshot yet"""
+        from models.budget import Budget
+        
+        captured = 0
+        while True:
+            budgets = Budget.query.outerjoin(
+                cls, cls.budget_id == Budget.id
+            ).filter(
+                cls.id.is_(None),
+                Budget.end_date < date.today()
+            ).limit(batch_size).all()
+            
+            if not budgets:
+                return captured
+            
+            captured += len(cls.capture(budgets))
+    
+    def __repr__(self):
+        return f'<BudgetPeriodSnapshot {self.budget_id}: {self.start_date} - {self.end_date}>'
@@ -1,13 +1,14 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Index, Numeric
+from sqlalchemy import Index
+from services.money import cents_to_decimal, from_cents, to_cents
 
 class Expense(db.Model):
     __tablename__ = 'expenses'
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
-    amount = db.Column(Numeric(10, 2), nullable=False)
+    amount_cents = db.Column(db.BigInteger, nullable=False)  # Integer minor units; sum this, not amount
     category = db.Column(db.String(50), nullable=False, index=True)
     description = db.Column(db.Text, nullable=False)
     date = db.Column(db.Date, nullable=False, index=True)
@@ -20,6 +21,7 @@ class Expense(db.Model):
     tags = db.Column(db.String(255))  # Comma-separated tags
     location = db.Column(db.String(100))  # Expense location
     payment_method = db.Column(db.String(50), default='cash')  # cash, card, transfer, etc.
+    currency = db.Column(db.String(3))  # ISO 4217 code; None means the user's currency
     
     # Indexes for better query performance
     __table_args__ = (
@@ -42,7 +44,7 @@ class Expense(db.Model):
     
     def __init__(self, user_id, amount, category, description, date, **kwargs):
         self.user_id = user_id
-        self.amount = float(amount)
+        self.amount_cents = to_cents(amount)
         self.category = category.lower()
         self.description = description
         self.date = date
@@ -53,6 +55,7 @@ class Expense(db.Model):
         self.tags = kwargs.get('tags')
         self.location = kwargs.get('location')
         self.payment_method = kwargs.get('payment_method', 'cash')
+        self.currency = self.validate_currency(kwargs.get('currency'))
         
         # Validate category
         if self.category not in self.VALID_CATEGORIES:
@@ -63,15 +66,24 @@ class Expense(db.Model):
             raise ValueError(f"Invalid payment method. Must be one of: {', '.join(self.VALID_PAYMENT_METHODS)}")
         
         # Validate amount
-        if self.amount <= 0:
+        if self.amount_cents <= 0:
             raise ValueError("Amount must be greater than 0")
     
+    @property
+    def amount(self):
+        """Amount as an exact Decimal, for display and input"""
+        return cents_to_decimal(self.amount_cents)
+    
+    @amount.setter
+    def amount(self, value):
+        self.amount_cents = to_cents(value)
+    
     def to_dict(self):
         """Convert expense object to dictionary"""
         return {
             'id': self.id,
             'user_id': self.user_id,
-            'amount': float(self.amount),
+            'amount': from_cents(self.amount_cents),
             'category': self.category,
             'description': self.description,
             'date': self.date.isoformat() if self.date else None,
@@ -81,20 +93,21 @@ class Expense(db.Model):
             'notes': self.notes,
             'tags': self.tags.split(',') if self.tags else [],
             'location': self.location,
-            'payment_method': self.payment_method
+            'payment_method': self.payment_method,
+            'currency': self.currency
         }
     
     def update(self, **kwargs):
         """Update expense with provided fields"""
         allowed_fields = [
             'amount', 'category', 'description', 'date', 
-            'receipt_url', 'notes', 'tags', 'location', 'payment_method'
+            'receipt_url', 'notes', 'tags', 'location', 'payment_method', 'currency'
         ]
         
         for field, value in kwargs.items():
             if field in allowed_fields and hasattr(self, field):
                 if field == 'amount':
-                    value = float(value)
+                    field, value = 'amount_cents', to_cents(value)
                     if value <= 0:
                         raise ValueError("Amount must be greater than 0")
                 elif field == 'category':
@@ -104,11 +117,23 @@ class Expense(db.Model):
                 elif field == 'payment_method':
                     if value not in self.VALID_PAYMENT_METHODS:
                         raise ValueError(f"Invalid payment method. Must be one of: {', '.join(self.VALID_PAYMENT_METHODS)}")
+                elif field == 'currency':
+                    value = self.validate_currency(value)
                 
                 setattr(self, field, value)
         
         self.updated_at = datetime.utcnow()
     
+    @staticmethod
+    def validate_currency(currency):
+        """Normalize a three-letter currency code; None keeps the user's currency"""
+        if currency is None:
+            return None
+        currency = currency.strip().upper()
+        if len(currency) != 3 or not currency.isalpha():
+            raise ValueError("Currency must be a three-letter code such as USD")
+        return currency
+    
     @classmethod
     def get_category_display_name(cls, category):
         """Get display name for category"""
@@ -147,16 +172,18 @@ class Expense(db.Model):
     def get_monthly_totals(cls, user_id, months=6):
         """Get monthly spending totals for the last N months"""
         from sqlalchemy import func, extract
-        from datetime import datetime, timedelta
+        from datetime import datetime
         
-        # Calculate start date (N months ago)
-        start_date = datetime.utcnow().replace(day=1) - timedelta(days=30 * (months - 1))
+        # First day of the month N - 1 months before this one
+        today = datetime.utcnow().date()
+        index = today.year * 12 + today.month - 1 - (months - 1)
+        start_date = datetime(index // 12, index % 12 + 1, 1)
         
         # Query to get monthly totals
         monthly_data = db.session.query(
             extract('year', cls.date).label('year'),
             extract('month', cls.date).label('month'),
-            func.sum(cls.amount).label('total')
+            func.sum(cls.amount_cents).label('total_cents')
         ).filter(
             cls.user_id == user_id,
             cls.date >= start_date.date()
@@ -177,7 +204,7 @@ class Expense(db.Model):
         
         query = db.session.query(
             cls.category,
-            func.sum(cls.amount).label('total'),
+            func.sum(cls.amount_cents).label('total_cents'),
             func.count(cls.id).label('count')
         ).filter_by(user_id=user_id)
         
@@ -186,7 +213,7 @@ class Expense(db.Model):
         if end_date:
             query = query.filter(cls.date <= end_date)
         
-        return query.group_by(cls.category).order_by(func.sum(cls.amount).desc()).all()
+        return query.group_by(cls.category).order_by(func.sum(cls.amount_cents).desc()).all()
     
     @classmethod
     def get_spending_trends(cls, user_id, days=30):
@@ -198,7 +225,7 @@ class Expense(db.Model):
         
         daily_data = db.session.query(
             cls.date,
-            func.sum(cls.amount).label('total'),
+            func.sum(cls.amount_cents).label('total_cents'),
             func.count(cls.id).label('count')
         ).filter(
             cls.user_id == user_id,
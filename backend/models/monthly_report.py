@@ -0,0 +1,43 @@
+from app import db
+from datetime import datetime
+from sqlalchemy import UniqueConstraint
+from sqlalchemy.exc import IntegrityError
+
+class MonthlyReportSnapshot(db.Model):
+    """Frozen monthly report for a month that has ended"""
+    __tablename__ = 'monthly_report_snapshots'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    report_data = db.Column(db.JSON, nullable=False)  # The /monthly-reports response body
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    # One snapshot per user and month
+    __table_args__ = (
+        UniqueConstraint('user_id', 'year', 'month', name='uq_monthly_report_month'),
+    )
+    
+    @classmethod
+    def get_report(cls, user_id, year, month):
+        """Get the stored report for a month, or None"""
+        snapshot = db.session.query(cls.report_data).filter_by(
+            user_id=user_id,
+            year=year,
+            month=month
+        ).first()
+        return snapshot.report_data if snapshot else None
+    
+    @classmethod
+    def store(cls, user_id, year, month, report):
+        """Persist a closed month's report, tolerating one written concurrently"""
+        try:
+            db.session.add(cls(user_id=user_id, year=year, month=month, report_data=report))
+            db.session.commit()
+        except IntegrityError:
+            # Another worker stored the same month first; theirs is identical
+            db.session.rollback()
+    
+    def __repr__(self):
+        return f'<MonthlyReportSnapshot {self.user_id}: {self.year}-{self.month:02d}>'
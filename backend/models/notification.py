@@ -1,6 +1,8 @@
 from app import db
 from datetime import datetime
-from sqlalchemy import Index
+from sqlalchemy import Index, tuple_
+from services.money import from_cents
+import base64
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
@@ -13,6 +15,7 @@ class Notification(db.Model):
     data = db.Column(db.JSON)  # Additional data as JSON
     is_read = db.Column(db.Boolean, default=False, index=True)
     is_sent = db.Column(db.Boolean, default=False)  # For email notifications
+    email_attempts = db.Column(db.Integer, nullable=False, default=0)  # Outbox runs that failed to email it
     priority = db.Column(db.String(20), default='medium')  # low, medium, high, urgent
     created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
     read_at = db.Column(db.DateTime)
@@ -42,6 +45,9 @@ class Notification(db.Model):
     # Priority levels
     PRIORITY_LEVELS = ['low', 'medium', 'high', 'urgent']
     
+    # Columns returned by the compact listing projection
+    COMPACT_COLUMNS = ['id', 'type', 'title', 'message', 'data', 'is_read', 'priority', 'created_at', 'expires_at']
+    
     def __init__(self, user_id, notification_type, title, message, **kwargs):
         self.user_id = user_id
         self.type = notification_type
@@ -159,7 +165,7 @@ class Notification(db.Model):
             'category': budget.category,
             'percentage_used': percentage_used,
             'amount_spent': budget.get_spent_amount(),
-            'budget_amount': float(budget.amount)
+            'budget_amount': from_cents(budget.amount_cents)
         }
         
         return cls(
@@ -175,7 +181,7 @@ class Notification(db.Model):
     def create_budget_exceeded(cls, user_id, budget):
         """Create a budget exceeded notification"""
         title = f"Budget Exceeded: {budget.get_category_display_name()}"
-        over_amount = budget.get_spent_amount() - float(budget.amount)
+        over_amount = from_cents((budget.spent_cents or 0) - budget.amount_cents)
         message = f"You've exceeded your {budget.period} budget for {budget.get_category_display_name()} by ${over_amount:.2f}. Consider reviewing your spending."
         
         data = {
@@ -183,7 +189,7 @@ class Notification(db.Model):
             'category': budget.category,
             'over_amount': over_amount,
             'amount_spent': budget.get_spent_amount(),
-            'budget_amount': float(budget.amount)
+            'budget_amount': from_cents(budget.amount_cents)
         }
         
         return cls(
@@ -283,7 +289,7 @@ class Notification(db.Model):
         if notification_type:
             query = query.filter_by(type=notification_type)
         
-        query = query.order_by(cls.created_at.desc())
+        query = query.order_by(cls.created_at.desc(), cls.id.desc())
         
         if limit:
             query = query.limit(limit)
@@ -292,20 +298,84 @@ class Notification(db.Model):
         
         return query.all()
     
+    @staticmethod
+    def encode_cursor(created_at, notification_id):
+        """Encode a (created_at, id) position as an opaque cursor"""
+        raw = f"{created_at.isoformat()}|{notification_id}"
+        return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+    
+    @staticmethod
+    def decode_cursor(cursor):
+        """Decode a cursor into (created_at, id), raising ValueError if malformed"""
+        try:
+            raw = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8')
+            created_at, notification_id = raw.split('|')
+            return datetime.fromisoformat(created_at), int(notification_id)
+        except Exception:
+            raise ValueError("Invalid cursor")
+    
+    @classmethod
+    def get_notifications_page(cls, user_id, cursor=None, limit=50, notification_type=None,
+                               unread_only=False, compact=False):
+        """Get one page of notifications, newest first, after an optional cursor.
+        
+        Seeks on (created_at, id) so every page costs the same however deep it
+        is. With `compact` only the listing columns are selected and returned
+        as plain dicts with raw timestamps, skipping ORM objects and to_dict().
+        Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        columns = [getattr(cls, name) for name in cls.COMPACT_COLUMNS] if compact else [cls]
+        query = db.session.query(*columns).filter(cls.user_id == user_id)
+        
+        if notification_type:
+            query = query.filter(cls.type == notification_type)
+        if unread_only:
+            query = query.filter(cls.is_read == False)
+        
+        if cursor:
+            created_at, notification_id = cls.decode_cursor(cursor)
+            query = query.filter(tuple_(cls.created_at, cls.id) < tuple_(created_at, notification_id))
+        
+        # Fetch one extra row to know whether another page exists
+        rows = query.order_by(cls.created_at.desc(), cls.id.desc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        
+        next_cursor = None
+        if has_more and rows:
+            next_cursor = cls.encode_cursor(rows[-1].created_at, rows[-1].id)
+        
+        if compact:
+            items = [
+                {
+                    name: (value.isoformat() if isinstance(value, datetime) else value)
+                    for name, value in zip(cls.COMPACT_COLUMNS, row)
+                }
+                for row in rows
+            ]
+        else:
+            items = rows
+        
+        return items, next_cursor
+    
     @classmethod
     def mark_all_as_read(cls, user_id):
         """Mark all notifications as read for a user"""
-        notifications = cls.query.filter(
+        from services.notification_counts import set_unread_count_from_source
+        
+        count = cls.query.filter(
             cls.user_id == user_id,
             cls.is_read == False
-        ).all()
+        ).update({
+            'is_read': True,
+            'read_at': datetime.utcnow()
+        }, synchronize_session='fetch')
         
-        for notification in notifications:
-            notification.is_read = True
-            notification.read_at = datetime.utcnow()
+        # The bulk update bypasses the per-row counter events
+        set_unread_count_from_source(user_id)
         
         db.session.commit()
-        return len(notifications)
+        return count
     
     @classmethod
     def cleanup_expired_notifications(cls):
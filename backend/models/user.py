@@ -1,9 +1,11 @@
-from datetime import datetime
+from datetime import date, datetime
+import calendar
 import bcrypt
 from flask_jwt_extended import create_access_token, create_refresh_token
 
 # Import db from app module to avoid circular imports
 from app import db
+from services.metrics import track_password_hash
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -15,6 +17,7 @@ class User(db.Model):
     last_name = db.Column(db.String(50), nullable=False)
     currency = db.Column(db.String(3), default='USD', nullable=False)
     email_notifications = db.Column(db.Boolean, default=True)
+    unread_notification_count = db.Column(db.Integer, nullable=False, default=0)  # Kept by services.notification_counts
     is_active = db.Column(db.Boolean, default=True)
     is_verified = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
@@ -36,11 +39,13 @@ class User(db.Model):
     
     def set_password(self, password):
         """Hash and set the user's password"""
-        self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+        with track_password_hash('hash'):
+            self.password_hash = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
     
     def check_password(self, password):
         """Check if the provided password matches the stored hash"""
-        return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
+        with track_password_hash('check'):
+            return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
     
     def generate_tokens(self):
         """Generate JWT access and refresh tokens"""
@@ -84,33 +89,16 @@ class User(db.Model):
     
     def get_total_expenses(self, start_date=None, end_date=None):
         """Get total expenses for the user within a date range"""
-        query = self.expenses
-        
-        if start_date:
-            query = query.filter(Expense.date >= start_date)
-        if end_date:
-            query = query.filter(Expense.date <= end_date)
-        
-        return sum(expense.amount for expense in query.all())
+        from services.money import cents_to_decimal
+        from services.spend_index import get_spend_index
+        return cents_to_decimal(get_spend_index(self.id).range_sum(start_date, end_date))
     
     def get_expenses_by_category(self, start_date=None, end_date=None):
         """Get expenses grouped by category"""
-        query = self.expenses
-        
-        if start_date:
-            query = query.filter(Expense.date >= start_date)
-        if end_date:
-            query = query.filter(Expense.date <= end_date)
-        
-        expenses = query.all()
-        category_totals = {}
-        
-        for expense in expenses:
-            if expense.category not in category_totals:
-                category_totals[expense.category] = 0
-            category_totals[expense.category] += expense.amount
-        
-        return category_totals
+        from services.money import cents_to_decimal
+        from services.spend_index import get_spend_index
+        totals = get_spend_index(self.id).category_totals(start_date, end_date)
+        return {category: cents_to_decimal(cents) for category, cents in totals.items()}
     
     def get_monthly_spending(self, year=None, month=None):
         """Get spending for a specific month"""
@@ -119,13 +107,11 @@ class User(db.Model):
         if not month:
             month = datetime.utcnow().month
         
-        from sqlalchemy import extract
-        monthly_expenses = self.expenses.filter(
-            extract('year', Expense.date) == year,
-            extract('month', Expense.date) == month
-        ).all()
-        
-        return sum(expense.amount for expense in monthly_expenses)
+        from services.money import cents_to_decimal
+        from services.spend_index import get_spend_index
+        start_date = date(year, month, 1)
+        end_date = date(year, month, calendar.monthrange(year, month)[1])
+        return cents_to_decimal(get_spend_index(self.id).range_sum(start_date, end_date))
     
     def __repr__(self):
         return f'<User {self.email}>'
@@ -1,71 +1,81 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from models.expense import Expense
 from models.budget import Budget
 from models.user import User
+from services.pivot import PIVOT_DIMENSIONS, PivotResultTooLarge, run_pivot
+from services.trends import TREND_PERIODS, get_trend_series, moving_average
+from services.monthly_reports import get_monthly_report
+from services.downsample import lttb
+from services.ledger import get_ledger_view
+from services.money import from_cents
+from services.query_stats import query_budget
 from datetime import datetime, timedelta, date
 from sqlalchemy import func, extract
+import numpy as np
 import calendar
 
 analytics_bp = Blueprint('analytics', __name__)
 
 @analytics_bp.route('/spending-trends', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_spending_trends():
     """Get spending trends over time"""
     try:
         current_user_id = get_jwt_identity()
         
         # Get query parameters
-        period = request.args.get('period', 'monthly')  # daily, weekly, monthly, yearly
-        months = request.args.get('months', default=6, type=int)
+        period = request.args.get('period', 'monthly')  # daily, weekly, monthly, quarterly, yearly
+        window = request.args.get('moving_average', type=int)
+        max_points = request.args.get('max_points', type=int)
         
-        if period == 'monthly':
-            # Get monthly trends
-            monthly_data = Expense.get_monthly_totals(current_user_id, months)
-            
-            trends = []
-            for year, month, total in monthly_data:
-                month_name = calendar.month_name[int(month)]
-                trends.append({
-                    'period': f"{month_name} {int(year)}",
-                    'year': int(year),
-                    'month': int(month),
-                    'total': float(total or 0),
-                    'date': f"{int(year)}-{int(month):02d}-01"
-                })
-            
-            return jsonify({
-                'trends': trends,
-                'period': period,
-                'months': months
-            }), 200
-        
-        elif period == 'daily':
-            # Get daily trends for the last 30 days
-            days = request.args.get('days', default=30, type=int)
-            daily_data = Expense.get_spending_trends(current_user_id, days)
-            
-            trends = []
-            for expense_date, total, count in daily_data:
-                trends.append({
-                    'date': expense_date.isoformat(),
-                    'total': float(total or 0),
-                    'count': int(count or 0)
-                })
-            
+        if period not in TREND_PERIODS:
             return jsonify({
-                'trends': trends,
-                'period': period,
-                'days': days
-            }), 200
+                'message': f"Invalid period. Use {', '.join(TREND_PERIODS)}",
+                'error': 'invalid_period'
+            }), 400
         
-        else:
+        # Each period has its own count parameter: days, weeks, months, quarters or years
+        count_param, default_count = TREND_PERIODS[period]
+        count = request.args.get(count_param, default=default_count, type=int)
+        
+        if count < 1 or count > 1000:
             return jsonify({
-                'message': 'Invalid period. Use daily or monthly',
-                'error': 'invalid_period'
+                'message': f'{count_param} must be between 1 and 1000',
+                'error': 'invalid_range'
             }), 400
+        
+        trends = get_trend_series(current_user_id, period, count)
+        
+        response = {
+            'trends': trends,
+            'period': period,
+            count_param: count
+        }
+        
+        # Trailing average over the bucket totals, aligned with trends
+        if window:
+            response['moving_average'] = moving_average([entry['total'] for entry in trends], window)
+            response['moving_average_window'] = window
+        
+        # Thin long series for charting; the average is thinned at the same points
+        if max_points and len(trends) > max_points:
+            keep = lttb(
+                [date.fromisoformat(entry['date']).toordinal() for entry in trends],
+                [entry['total'] for entry in trends],
+                max(max_points, 3)
+            ).tolist()
+            response['trends'] = [trends[i] for i in keep]
+            if window:
+                response['moving_average'] = [response['moving_average'][i] for i in keep]
+            response['downsampled'] = {
+                'original_points': len(trends),
+                'returned_points': len(keep)
+            }
+        
+        return jsonify(response), 200
             
     except Exception as e:
         return jsonify({
@@ -75,6 +85,7 @@ def get_spending_trends():
 
 @analytics_bp.route('/category-insights', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_category_insights():
     """Get category-based spending insights"""
     try:
@@ -93,12 +104,11 @@ def get_category_insights():
         if end_date:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Get category totals
-        category_data = Expense.get_category_totals(
-            current_user_id,
-            start_date=start_date_obj,
-            end_date=end_date_obj
-        )
+        # Get category totals, largest first
+        category_data = [
+            (category, from_cents(cents), count)
+            for category, cents, count in get_ledger_view(current_user_id, start_date_obj, end_date_obj).group_totals('category')
+        ]
         
         total_spending = sum(float(total) for _, total, _ in category_data)
         
@@ -141,6 +151,7 @@ def get_category_insights():
 
 @analytics_bp.route('/monthly-reports', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_monthly_reports():
     """Get detailed monthly reports"""
     try:
@@ -157,122 +168,8 @@ def get_monthly_reports():
                 'error': 'invalid_month'
             }), 400
         
-        # Get start and end dates for the month
-        start_date = date(year, month, 1)
-        if month == 12:
-            end_date = date(year + 1, 1, 1) - timedelta(days=1)
-        else:
-            end_date = date(year, month + 1, 1) - timedelta(days=1)
-        
-        # Get expenses for the month
-        expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_date,
-            end_date=end_date
-        )
-        
-        # Calculate totals
-        total_spent = sum(float(expense.amount) for expense in expenses)
-        total_transactions = len(expenses)
-        
-        # Category breakdown
-        category_totals = {}
-        for expense in expenses:
-            category = expense.category
-            if category not in category_totals:
-                category_totals[category] = 0
-            category_totals[category] += float(expense.amount)
-        
-        # Daily breakdown
-        daily_totals = {}
-        for expense in expenses:
-            day = expense.date.day
-            if day not in daily_totals:
-                daily_totals[day] = 0
-            daily_totals[day] += float(expense.amount)
-        
-        # Get budgets for this month
-        budgets = Budget.query.filter(
-            Budget.user_id == current_user_id,
-            Budget.start_date <= end_date,
-            Budget.end_date >= start_date
-        ).all()
-        
-        budget_performance = []
-        total_budget = 0
-        
-        for budget in budgets:
-            spent = budget.get_spent_amount()
-            budget_amount = float(budget.amount)
-            total_budget += budget_amount
-            
-            budget_performance.append({
-                'category': budget.category,
-                'display_name': budget.get_category_display_name(),
-                'budget_amount': budget_amount,
-                'spent_amount': spent,
-                'remaining': budget_amount - spent,
-                'percentage_used': (spent / budget_amount * 100) if budget_amount > 0 else 0,
-                'is_over_budget': spent > budget_amount
-            })
-        
-        # Compare with previous month
-        prev_month = month - 1 if month > 1 else 12
-        prev_year = year if month > 1 else year - 1
-        
-        prev_start_date = date(prev_year, prev_month, 1)
-        if prev_month == 12:
-            prev_end_date = date(prev_year + 1, 1, 1) - timedelta(days=1)
-        else:
-            prev_end_date = date(prev_year, prev_month + 1, 1) - timedelta(days=1)
-        
-        prev_expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=prev_start_date,
-            end_date=prev_end_date
-        )
-        prev_total_spent = sum(float(expense.amount) for expense in prev_expenses)
-        
-        month_over_month_change = 0
-        if prev_total_spent > 0:
-            month_over_month_change = ((total_spent - prev_total_spent) / prev_total_spent) * 100
-        
-        return jsonify({
-            'report': {
-                'year': year,
-                'month': month,
-                'month_name': calendar.month_name[month],
-                'total_spent': total_spent,
-                'total_transactions': total_transactions,
-                'average_per_day': total_spent / end_date.day if end_date.day > 0 else 0,
-                'average_per_transaction': total_spent / total_transactions if total_transactions > 0 else 0,
-                'month_over_month_change': round(month_over_month_change, 2)
-            },
-            'category_breakdown': [
-                {
-                    'category': category,
-                    'display_name': Expense.get_category_display_name(category),
-                    'total': total,
-                    'percentage': (total / total_spent * 100) if total_spent > 0 else 0
-                }
-                for category, total in sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
-            ],
-            'daily_breakdown': [
-                {
-                    'day': day,
-                    'total': total,
-                    'date': date(year, month, day).isoformat()
-                }
-                for day, total in sorted(daily_totals.items())
-            ],
-            'budget_performance': budget_performance,
-            'budget_summary': {
-                'total_budget': total_budget,
-                'total_spent': total_spent,
-                'total_remaining': total_budget - total_spent,
-                'overall_percentage_used': (total_spent / total_budget * 100) if total_budget > 0 else 0
-            }
-        }), 200
+        # Months that have ended are served from their snapshot
+        return jsonify(get_monthly_report(current_user_id, year, month)), 200
         
     except Exception as e:
         return jsonify({
@@ -282,6 +179,7 @@ def get_monthly_reports():
 
 @analytics_bp.route('/year-over-year', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_year_over_year():
     """Get year-over-year comparison"""
     try:
@@ -291,46 +189,24 @@ def get_year_over_year():
         current_year = request.args.get('current_year', default=datetime.utcnow().year, type=int)
         previous_year = current_year - 1
         
-        # Get data for both years
+        # Get both years' expenses at once and total them per month
+        ledger = get_ledger_view(current_user_id, date(previous_year, 1, 1), date(current_year, 12, 31))
+        months = ledger.dates.astype('datetime64[M]').astype(np.int64) - (previous_year - 1970) * 12
+        totals = np.bincount(months, weights=ledger.cents, minlength=24)
+        counts = np.bincount(months, minlength=24)
+        
         current_year_data = {}
         previous_year_data = {}
         
         for month in range(1, 13):
-            # Current year
-            start_date = date(current_year, month, 1)
-            if month == 12:
-                end_date = date(current_year + 1, 1, 1) - timedelta(days=1)
-            else:
-                end_date = date(current_year, month + 1, 1) - timedelta(days=1)
-            
-            current_expenses = Expense.get_expenses_by_user(
-                current_user_id,
-                start_date=start_date,
-                end_date=end_date
-            )
-            current_total = sum(float(expense.amount) for expense in current_expenses)
             current_year_data[month] = {
-                'total': current_total,
-                'count': len(current_expenses),
+                'total': from_cents(int(totals[month + 11])),
+                'count': int(counts[month + 11]),
                 'month_name': calendar.month_name[month]
             }
-            
-            # Previous year
-            prev_start_date = date(previous_year, month, 1)
-            if month == 12:
-                prev_end_date = date(previous_year + 1, 1, 1) - timedelta(days=1)
-            else:
-                prev_end_date = date(previous_year, month + 1, 1) - timedelta(days=1)
-            
-            prev_expenses = Expense.get_expenses_by_user(
-                current_user_id,
-                start_date=prev_start_date,
-                end_date=prev_end_date
-            )
-            prev_total = sum(float(expense.amount) for expense in prev_expenses)
             previous_year_data[month] = {
-                'total': prev_total,
-                'count': len(prev_expenses),
+                'total': from_cents(int(totals[month - 1])),
+                'count': int(counts[month - 1]),
                 'month_name': calendar.month_name[month]
             }
         
@@ -392,6 +268,7 @@ def get_year_over_year():
 
 @analytics_bp.route('/budget-vs-actual', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_budget_vs_actual():
     """Get budget vs actual spending analysis"""
     try:
@@ -413,66 +290,95 @@ def get_budget_vs_actual():
             start_date_obj = datetime.strptime(start_date, '%Y-%m-%d').date()
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Get active budgets for the period
-        budgets = Budget.query.filter(
-            Budget.user_id == current_user_id,
-            Budget.is_active == True,
-            Budget.start_date <= end_date_obj,
-            Budget.end_date >= start_date_obj
-        ).all()
-        
-        budget_analysis = []
-        total_budgeted = 0
-        total_spent = 0
-        
-        for budget in budgets:
-            spent = budget.get_spent_amount()
-            budget_amount = float(budget.amount)
-            
-            total_budgeted += budget_amount
-            total_spent += spent
-            
-            variance = spent - budget_amount
-            variance_percentage = (variance / budget_amount * 100) if budget_amount > 0 else 0
-            
-            budget_analysis.append({
-                'budget_id': budget.id,
-                'category': budget.category,
-                'display_name': budget.get_category_display_name(),
-                'period': budget.period,
-                'budgeted_amount': budget_amount,
-                'actual_spent': spent,
-                'remaining': budget_amount - spent,
-                'variance': variance,
-                'variance_percentage': round(variance_percentage, 2),
-                'percentage_used': round(budget.get_percentage_used(), 2),
-                'is_over_budget': budget.is_over_budget(),
-                'days_remaining': budget.get_days_remaining(),
-                'daily_budget_remaining': budget.get_daily_budget_remaining()
-            })
+        return jsonify(Budget.get_budget_vs_actual(current_user_id, start_date_obj, end_date_obj)), 200
         
-        # Overall analysis
-        overall_variance = total_spent - total_budgeted
-        overall_variance_percentage = (overall_variance / total_budgeted * 100) if total_budgeted > 0 else 0
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to get budget vs actual analysis',
+            'error': str(e)
+        }), 500
+
+@analytics_bp.route('/budget-performance', methods=['GET'])
+@jwt_required()
+@query_budget(3)
+def get_budget_performance():
+    """Get budget performance history"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        months = request.args.get('months', default=6, type=int)
+        
+        performance = Budget.get_budget_performance(current_user_id, months)
+        scores = [item['performance_score'] for item in performance]
         
         return jsonify({
-            'budget_analysis': budget_analysis,
+            'performance': performance,
             'summary': {
-                'total_budgeted': total_budgeted,
-                'total_spent': total_spent,
-                'total_remaining': total_budgeted - total_spent,
-                'overall_variance': overall_variance,
-                'overall_variance_percentage': round(overall_variance_percentage, 2),
-                'overall_percentage_used': (total_spent / total_budgeted * 100) if total_budgeted > 0 else 0,
-                'period': {
-                    'start_date': start_date_obj.isoformat(),
-                    'end_date': end_date_obj.isoformat()
-                }
+                'months': months,
+                'budget_count': len(performance),
+                'average_score': round(sum(scores) / len(scores), 2) if scores else 0
             }
         }), 200
         
     except Exception as e:
         return jsonify({
-            'message': 'Failed to get budget vs actual analysis',
+            'message': 'Failed to get budget performance',
+            'error': str(e)
+        }), 500
+
+@analytics_bp.route('/pivot', methods=['GET'])
+@jwt_required()
+@query_budget(2)
+def get_pivot():
+    """Get expense totals grouped by any combination of dimensions"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        dimensions = [d.strip() for d in request.args.get('dimensions', 'category').split(',') if d.strip()]
+        measures = [m.strip() for m in request.args.get('measures', 'sum,count').split(',') if m.strip()]
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        
+        if len(dimensions) > len(PIVOT_DIMENSIONS):
+            return jsonify({
+                'message': 'Too many dimensions',
+                'error': 'invalid_pivot'
+            }), 400
+        
+        try:
+            result = run_pivot(
+                current_user_id,
+                dimensions,
+                measures or ['sum'],
+                start_date=datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+                end_date=datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None,
+                category=request.args.get('category'),
+                payment_method=request.args.get('payment_method'),
+                max_rows=current_app.config['PIVOT_MAX_ROWS']
+            )
+        except PivotResultTooLarge as e:
+            return jsonify({
+                'message': str(e),
+                'error': 'result_too_large'
+            }), 400
+        except ValueError as e:
+            return jsonify({
+                'message': str(e),
+                'error': 'invalid_pivot'
+            }), 400
+        
+        return jsonify({
+            'dimensions': dimensions,
+            'measures': measures or ['sum'],
+            'rows': result['rows'],
+            'totals': result['totals'],
+            'row_count': len(result['rows'])
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to get pivot',
             'error': str(e)
         }), 500
@@ -4,6 +4,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from marshmallow import Schema, fields, ValidationError
 import re
 from datetime import datetime
+from services.metrics import track_password_hash
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -60,12 +61,15 @@ def register():
                 'error': 'weak_password'
             }), 400
         
+        with track_password_hash('hash'):
+            password_hash = generate_password_hash(data['password'])
+        
         # Create new user
         user = User(
             first_name=data['first_name'].strip().title(),
             last_name=data['last_name'].strip().title(),
             email=data['email'].lower(),
-            password_hash=generate_password_hash(data['password']),
+            password_hash=password_hash,
             created_at=datetime.utcnow(),
             is_active=True
         )
@@ -114,7 +118,12 @@ def login():
         # Find user and verify password
         user = User.query.filter_by(email=data['email'].lower()).first()
         
-        if not user or not check_password_hash(user.password_hash, data['password']):
+        password_ok = False
+        if user:
+            with track_password_hash('check'):
+                password_ok = check_password_hash(user.password_hash, data['password'])
+        
+        if not password_ok:
             return jsonify({
                 'message': 'Invalid email or password'
             }), 401
@@ -0,0 +1,46 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from services.batch import run_batch
+
+batch_bp = Blueprint('batch', __name__)
+
+@batch_bp.route('/', methods=['POST'])
+@jwt_required()
+def batch_requests():
+    """Run several API calls in one round trip"""
+    try:
+        data = request.get_json() or {}
+        items = data.get('requests')
+        
+        if not isinstance(items, list) or not items:
+            return jsonify({
+                'message': 'requests must be a non-empty list',
+                'error': 'invalid_batch'
+            }), 400
+        
+        max_requests = current_app.config['BATCH_MAX_REQUESTS']
+        if len(items) > max_requests:
+            return jsonify({
+                'message': f'A batch may contain at most {max_requests} requests',
+                'error': 'batch_too_large'
+            }), 400
+        
+        if not all(isinstance(item, dict) and isinstance(item.get('path'), str) for item in items):
+            return jsonify({
+                'message': 'Each request needs a path',
+                'error': 'invalid_batch'
+            }), 400
+        
+        results = run_batch(
+            current_app._get_current_object(),
+            items,
+            parallel=bool(data.get('parallel'))
+        )
+        
+        return jsonify({'responses': results}), 200
+        
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to run batch',
+            'error': str(e)
+        }), 500
@@ -0,0 +1,53 @@
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from services.dashboard import PANELS, build_dashboard
+from services.query_stats import query_budget
+
+dashboard_bp = Blueprint('dashboard', __name__)
+
+@dashboard_bp.route('/', methods=['GET'])
+@jwt_required()
+@query_budget(8)
+def get_dashboard():
+    """Get every dashboard panel in one response"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        months = request.args.get('months', default=6, type=int)
+        notification_limit = request.args.get('notification_limit', default=5, type=int)
+        panels = request.args.get('panels')
+        panels = [panel.strip() for panel in panels.split(',')] if panels else list(PANELS)
+        
+        invalid = [panel for panel in panels if panel not in PANELS]
+        if invalid:
+            return jsonify({
+                'message': f"Invalid panels: {', '.join(invalid)}. Must be among: {', '.join(PANELS)}",
+                'error': 'invalid_panel'
+            }), 400
+        
+        if months < 1 or months > 36:
+            return jsonify({
+                'message': 'months must be between 1 and 36',
+                'error': 'invalid_months'
+            }), 400
+        
+        results, errors, timings = build_dashboard(
+            current_app._get_current_object(),
+            current_user_id,
+            months=months,
+            notification_limit=notification_limit,
+            panels=panels
+        )
+        
+        return jsonify({
+            'panels': results,
+            'errors': errors,
+            'timings': timings
+        }), 200
+        
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to get dashboard',
+            'error': str(e)
+        }), 500
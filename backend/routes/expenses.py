@@ -4,6 +4,12 @@ from marshmallow import Schema, fields, ValidationError
 from app import db
 from models.expense import Expense
 from models.user import User
+from services.tasks import enqueue
+from services.budget_alerts import check_expense_budgets, check_bulk_expense_budgets
+from services.fx import check_convertible, convert_amounts
+from services.ledger import get_ledger_view
+from services.money import from_cents
+from services.query_stats import query_budget
 from datetime import datetime, date
 from decimal import Decimal
 
@@ -19,6 +25,7 @@ class ExpenseSchema(Schema):
     tags = fields.Str(load_default=None)
     location = fields.Str(load_default=None)
     payment_method = fields.Str(load_default='cash', validate=lambda x: x in Expense.VALID_PAYMENT_METHODS)
+    currency = fields.Str(load_default=None)
 
 class ExpenseUpdateSchema(Schema):
     amount = fields.Decimal(places=2, validate=lambda x: x > 0)
@@ -29,9 +36,19 @@ class ExpenseUpdateSchema(Schema):
     tags = fields.Str()
     location = fields.Str()
     payment_method = fields.Str(validate=lambda x: x in Expense.VALID_PAYMENT_METHODS)
+    currency = fields.Str(allow_none=True)
+
+def check_expense_currency(expense, user_id):
+    """Raise MissingFxRate (a ValueError) unless the expense's currency converts into the user's on its date"""
+    if expense.currency is not None:
+        # Loading the user must not flush an update that is about to be rejected
+        with db.session.no_autoflush:
+            currency = db.session.get(User, user_id).currency
+        check_convertible(expense.currency, expense.date, currency)
 
 @expenses_bp.route('/', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_expenses():
     """Get user's expenses with optional filtering"""
     try:
@@ -89,8 +106,14 @@ def get_expenses():
         
         expenses = query.all()
         
-        # Calculate summary statistics
-        total_amount = sum(float(expense.amount) for expense in expenses)
+        # Calculate summary statistics, in the user's currency
+        cents = [expense.amount_cents for expense in expenses]
+        if any(expense.currency for expense in expenses):
+            cents = convert_amounts(
+                cents, [expense.date.toordinal() for expense in expenses], [expense.currency for expense in expenses],
+                db.session.get(User, current_user_id).currency
+            )
+        total_amount = from_cents(sum(amount for amount in cents if amount is not None))
         
         return jsonify({
             'expenses': [expense.to_dict() for expense in expenses],
@@ -106,7 +129,7 @@ def get_expenses():
                 'average_amount': total_amount / len(expenses) if expenses else 0
             }
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get expenses',
@@ -134,69 +157,28 @@ def create_expense():
             notes=data.get('notes'),
             tags=data.get('tags'),
             location=data.get('location'),
-            payment_method=data.get('payment_method', 'cash')
+            payment_method=data.get('payment_method', 'cash'),
+            currency=data.get('currency')
         )
+        check_expense_currency(expense, current_user_id)
         
         db.session.add(expense)
         db.session.commit()
         
-        # Check budget alerts after adding expense
-        from models.budget import Budget
-        from models.notification import Notification
-        
-        # Get active budgets for this category and total budget
-        category_budget = Budget.query.filter(
-            Budget.user_id == current_user_id,
-            Budget.category == expense.category,
-            Budget.is_active == True,
-            Budget.start_date <= expense.date,
-            Budget.end_date >= expense.date
-        ).first()
-        
-        total_budget = Budget.query.filter(
-            Budget.user_id == current_user_id,
-            Budget.category == 'total',
-            Budget.is_active == True,
-            Budget.start_date <= expense.date,
-            Budget.end_date >= expense.date
-        ).first()
-        
-        notifications_created = []
-        
-        # Check category budget
-        if category_budget:
-            percentage_used = category_budget.get_percentage_used()
-            
-            if category_budget.is_over_budget():
-                notification = Notification.create_budget_exceeded(current_user_id, category_budget)
-                db.session.add(notification)
-                notifications_created.append(notification)
-            elif category_budget.should_send_alert():
-                notification = Notification.create_budget_alert(current_user_id, category_budget, percentage_used)
-                db.session.add(notification)
-                notifications_created.append(notification)
-        
-        # Check total budget
-        if total_budget:
-            percentage_used = total_budget.get_percentage_used()
-            
-            if total_budget.is_over_budget():
-                notification = Notification.create_budget_exceeded(current_user_id, total_budget)
-                db.session.add(notification)
-                notifications_created.append(notification)
-            elif total_budget.should_send_alert():
-                notification = Notification.create_budget_alert(current_user_id, total_budget, percentage_used)
-                db.session.add(notification)
-                notifications_created.append(notification)
-        
-        db.session.commit()
+        # Check budget alerts after the expense is committed
+        notifications_created = enqueue(
+            check_expense_budgets,
+            current_user_id,
+            expense.category,
+            expense.date.isoformat()
+        ) or []
         
         return jsonify({
             'message': 'Expense created successfully',
             'expense': expense.to_dict(),
             'notifications': [notif.to_dict() for notif in notifications_created]
         }), 201
-        
+    
     except ValidationError as err:
         return jsonify({
             'message': 'Validation error',
@@ -216,6 +198,7 @@ def create_expense():
 
 @expenses_bp.route('/<int:expense_id>', methods=['GET'])
 @jwt_required()
+@query_budget(2)
 def get_expense(expense_id):
     """Get a specific expense"""
     try:
@@ -235,7 +218,7 @@ def get_expense(expense_id):
         return jsonify({
             'expense': expense.to_dict()
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get expense',
@@ -266,19 +249,21 @@ def update_expense(expense_id):
         
         # Update expense
         expense.update(**data)
+        check_expense_currency(expense, current_user_id)
         db.session.commit()
         
         return jsonify({
             'message': 'Expense updated successfully',
             'expense': expense.to_dict()
         }), 200
-        
+    
     except ValidationError as err:
         return jsonify({
             'message': 'Validation error',
             'errors': err.messages
         }), 400
     except ValueError as e:
+        db.session.rollback()
         return jsonify({
             'message': str(e),
             'error': 'validation_error'
@@ -314,7 +299,7 @@ def delete_expense(expense_id):
         return jsonify({
             'message': 'Expense deleted successfully'
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -337,7 +322,7 @@ def get_categories():
         return jsonify({
             'categories': categories
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get categories',
@@ -346,6 +331,7 @@ def get_categories():
 
 @expenses_bp.route('/summary', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_expense_summary():
     """Get expense summary with statistics"""
     try:
@@ -364,48 +350,28 @@ def get_expense_summary():
         if end_date:
             end_date_obj = datetime.strptime(end_date, '%Y-%m-%d').date()
         
-        # Get expenses
-        expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_date_obj,
-            end_date=end_date_obj
-        )
+        # Get expenses as compact columns
+        ledger = get_ledger_view(current_user_id, start_date_obj, end_date_obj)
         
         # Calculate summary statistics
-        total_amount = sum(float(expense.amount) for expense in expenses)
-        expense_count = len(expenses)
-        
-        # Category breakdown
-        category_totals = {}
-        for expense in expenses:
-            category = expense.category
-            if category not in category_totals:
-                category_totals[category] = {
-                    'amount': 0,
-                    'count': 0,
-                    'display_name': Expense.get_category_display_name(category)
-                }
-            category_totals[category]['amount'] += float(expense.amount)
-            category_totals[category]['count'] += 1
-        
-        # Sort categories by amount
-        sorted_categories = sorted(
-            category_totals.items(),
-            key=lambda x: x[1]['amount'],
-            reverse=True
-        )
+        total_amount = from_cents(ledger.total_cents())
+        expense_count = len(ledger)
+        
+        # Category breakdown, largest first
+        sorted_categories = [
+            (category, {
+                'amount': from_cents(cents),
+                'count': count,
+                'display_name': Expense.get_category_display_name(category)
+            })
+            for category, cents, count in ledger.group_totals('category')
+        ]
         
         # Payment method breakdown
-        payment_method_totals = {}
-        for expense in expenses:
-            method = expense.payment_method
-            if method not in payment_method_totals:
-                payment_method_totals[method] = {
-                    'amount': 0,
-                    'count': 0
-                }
-            payment_method_totals[method]['amount'] += float(expense.amount)
-            payment_method_totals[method]['count'] += 1
+        payment_method_totals = {
+            method: {'amount': from_cents(cents), 'count': count}
+            for method, cents, count in ledger.group_totals('payment_method')
+        }
         
         return jsonify({
             'summary': {
@@ -437,7 +403,7 @@ def get_expense_summary():
                 for method, data in payment_method_totals.items()
             ]
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get expense summary',
@@ -478,12 +444,14 @@ def create_bulk_expenses():
                     notes=validated_data.get('notes'),
                     tags=validated_data.get('tags'),
                     location=validated_data.get('location'),
-                    payment_method=validated_data.get('payment_method', 'cash')
+                    payment_method=validated_data.get('payment_method', 'cash'),
+                    currency=validated_data.get('currency')
                 )
+                check_expense_currency(expense, current_user_id)
                 
                 db.session.add(expense)
                 created_expenses.append(expense)
-                
+            
             except ValidationError as err:
                 errors.append({
                     'index': i,
@@ -504,11 +472,18 @@ def create_bulk_expenses():
         
         db.session.commit()
         
+        # Check budget alerts once for every distinct category and day
+        entries = sorted({
+            (expense.category, expense.date.isoformat())
+            for expense in created_expenses
+        })
+        enqueue(check_bulk_expense_budgets, current_user_id, entries)
+        
         return jsonify({
             'message': f'Successfully created {len(created_expenses)} expenses',
             'expenses': [expense.to_dict() for expense in created_expenses]
         }), 201
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({
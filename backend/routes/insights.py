@@ -4,6 +4,10 @@ from app import db
 from models.expense import Expense
 from models.budget import Budget
 from models.user import User
+from services.downsample import lttb
+from services.ledger import get_ledger_view
+from services.money import from_cents
+from services.query_stats import query_budget
 from datetime import datetime, timedelta, date
 from sqlalchemy import func, extract
 import numpy as np
@@ -16,34 +20,34 @@ insights_bp = Blueprint('insights', __name__)
 
 @insights_bp.route('/spending-patterns', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_spending_patterns():
     """Get AI-powered spending pattern analysis"""
     try:
         current_user_id = get_jwt_identity()
+        max_points = request.args.get('max_points', type=int)
         
         # Get expenses for analysis (last 12 months)
         start_date = datetime.utcnow().date() - timedelta(days=365)
-        expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_date
-        )
+        ledger = get_ledger_view(current_user_id, start_date)
         
-        if len(expenses) < 10:
+        if len(ledger) < 10:
             return jsonify({
                 'message': 'Insufficient data for pattern analysis',
                 'patterns': [],
                 'recommendations': ['Add more expenses to get meaningful insights']
             }), 200
         
-        # Convert to DataFrame for analysis
-        df = pd.DataFrame([{
-            'amount': float(expense.amount),
-            'category': expense.category,
-            'date': expense.date,
-            'day_of_week': expense.date.weekday(),
-            'day_of_month': expense.date.day,
-            'month': expense.date.month
-        } for expense in expenses])
+        # Convert to DataFrame for analysis straight from the ledger's columns
+        dates = pd.to_datetime(ledger.dates)
+        df = pd.DataFrame({
+            'amount': ledger.amounts,
+            'category': ledger.category_names(),
+            'date': dates,
+            'day_of_week': dates.dayofweek,
+            'day_of_month': dates.day,
+            'month': dates.month
+        })
         
         patterns = []
         
@@ -111,7 +115,8 @@ def get_spending_patterns():
         overall_std = df['amount'].std()
         threshold = overall_mean + (2 * overall_std)  # 2 standard deviations
         
-        unusual_expenses = df[df['amount'] > threshold]
+        unusual = (df['amount'] > threshold).to_numpy()
+        unusual_expenses = df[unusual]
         
         patterns.append({
             'type': 'unusual_spending',
@@ -120,7 +125,7 @@ def get_spending_patterns():
             'data': {
                 'threshold': float(threshold),
                 'count': len(unusual_expenses),
-                'total_unusual': float(unusual_expenses['amount'].sum()),
+                'total_unusual': from_cents(int(ledger.cents[unusual].sum())),
                 'categories': unusual_expenses['category'].value_counts().to_dict()
             }
         })
@@ -133,13 +138,25 @@ def get_spending_patterns():
         
         current_velocity = df_sorted['velocity'].iloc[-1] if len(df_sorted) > 0 else 0
         
+        # With max_points the whole series is returned, thinned for charting;
+        # otherwise the last 30 points
+        if max_points:
+            keep = lttb(df_sorted['days_since_start'].to_numpy(), df_sorted['velocity'].to_numpy(), max(max_points, 3))
+            velocity_trend = df_sorted[['date', 'velocity']].iloc[keep]
+        else:
+            velocity_trend = df_sorted[['date', 'velocity']].tail(30)
+        
         patterns.append({
             'type': 'spending_velocity',
             'title': 'Spending Velocity',
             'description': f"Your current spending rate is ${current_velocity:.2f} per day",
             'data': {
                 'current_velocity': float(current_velocity),
-                'velocity_trend': df_sorted[['date', 'velocity']].tail(30).to_dict('records')
+                'velocity_trend': [
+                    {'date': row.date.date().isoformat(), 'velocity': float(row.velocity)}
+                    for row in velocity_trend.itertuples()
+                ],
+                'total_points': len(df_sorted)
             }
         })
         
@@ -152,8 +169,8 @@ def get_spending_patterns():
             'analysis_period': {
                 'start_date': start_date.isoformat(),
                 'end_date': datetime.utcnow().date().isoformat(),
-                'total_expenses': len(expenses),
-                'total_amount': float(df['amount'].sum())
+                'total_expenses': len(ledger),
+                'total_amount': from_cents(ledger.total_cents())
             }
         }), 200
         
@@ -165,6 +182,7 @@ def get_spending_patterns():
 
 @insights_bp.route('/budget-recommendations', methods=['GET'])
 @jwt_required()
+@query_budget(5)
 def get_budget_recommendations():
     """Get personalized budget recommendations"""
     try:
@@ -172,50 +190,32 @@ def get_budget_recommendations():
         
         # Get historical spending data (last 6 months)
         start_date = datetime.utcnow().date() - timedelta(days=180)
-        expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_date
-        )
+        ledger = get_ledger_view(current_user_id, start_date)
         
-        if len(expenses) < 5:
+        if len(ledger) < 5:
             return jsonify({
                 'message': 'Insufficient data for budget recommendations',
                 'recommendations': [],
                 'suggested_budgets': []
             }), 200
         
-        # Analyze spending by category
-        category_analysis = {}
-        total_spending = 0
-        
-        for expense in expenses:
-            category = expense.category
-            amount = float(expense.amount)
-            total_spending += amount
-            
-            if category not in category_analysis:
-                category_analysis[category] = {
-                    'amounts': [],
-                    'total': 0,
-                    'count': 0
-                }
-            
-            category_analysis[category]['amounts'].append(amount)
-            category_analysis[category]['total'] += amount
-            category_analysis[category]['count'] += 1
-        
         # Calculate statistics for each category
+        amounts = ledger.amounts
+        categories = ledger.category_names()
+        total_spending = from_cents(ledger.total_cents())
         category_stats = {}
-        for category, data in category_analysis.items():
-            amounts = np.array(data['amounts'])
+        
+        for category, cents, count in ledger.group_totals('category'):
+            category_amounts = amounts[categories == category]
+            total = from_cents(cents)
             category_stats[category] = {
-                'mean': float(np.mean(amounts)),
-                'median': float(np.median(amounts)),
-                'std': float(np.std(amounts)),
-                'total': data['total'],
-                'count': data['count'],
-                'percentage_of_total': (data['total'] / total_spending) * 100,
-                'monthly_average': data['total'] / 6  # 6 months of data
+                'mean': float(np.mean(category_amounts)),
+                'median': float(np.median(category_amounts)),
+                'std': float(np.std(category_amounts)),
+                'total': total,
+                'count': count,
+                'percentage_of_total': (total / total_spending) * 100,
+                'monthly_average': total / 6  # 6 months of data
             }
         
         # Get current budgets
@@ -250,7 +250,7 @@ def get_budget_recommendations():
             # Check if current budget exists and compare
             if category in current_budget_dict:
                 current_budget = current_budget_dict[category]
-                current_amount = float(current_budget.amount)
+                current_amount = from_cents(current_budget.amount_cents)
                 
                 if current_amount < monthly_avg * 0.8:
                     recommendations.append({
@@ -326,6 +326,7 @@ def get_budget_recommendations():
 
 @insights_bp.route('/forecasting/advanced-predictions', methods=['GET'])
 @jwt_required()
+@query_budget(3)
 def get_advanced_predictions():
     """Get advanced ML-based spending predictions"""
     try:
@@ -336,12 +337,9 @@ def get_advanced_predictions():
         
         # Get historical data (at least 6 months for meaningful predictions)
         start_date = datetime.utcnow().date() - timedelta(days=365)
-        expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_date
-        )
+        ledger = get_ledger_view(current_user_id, start_date)
         
-        if len(expenses) < 20:
+        if len(ledger) < 20:
             return jsonify({
                 'message': 'Insufficient data for advanced predictions',
                 'predictions': [],
@@ -349,12 +347,13 @@ def get_advanced_predictions():
             }), 200
         
         # Convert to DataFrame
-        df = pd.DataFrame([{
-            'amount': float(expense.amount),
-            'category': expense.category,
-            'date': expense.date,
-            'year_month': expense.date.strftime('%Y-%m')
-        } for expense in expenses])
+        dates = pd.to_datetime(ledger.dates)
+        df = pd.DataFrame({
+            'amount': ledger.amounts,
+            'category': ledger.category_names(),
+            'date': dates,
+            'year_month': dates.strftime('%Y-%m')
+        })
         
         # Monthly aggregation
         monthly_data = df.groupby('year_month')['amount'].sum().reset_index()
@@ -1,20 +1,31 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from flask_socketio import emit, join_room, leave_room
+from flask import Blueprint, request, jsonify, Response, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, decode_token
+from flask_jwt_extended.internal_utils import verify_token_type, verify_token_not_blocklisted
+from flask_socketio import emit, join_room, leave_room, ConnectionRefusedError
 from app import db, socketio
 from models.notification import Notification
 from models.budget import Budget
 from models.expense import Expense
 from models.user import User
+from services.notification_counts import get_unread_count
+from services.notification_digest import deliver_notifications
+from services.notification_waiters import waiters
+from services.presence import presence, is_listening
+from services.spend_index import get_spend_index
+from services.money import from_cents
+from services.metrics import socket_connected, socket_disconnected
+from services.query_stats import query_budget
+import calendar
+import json
+import jwt
+import time
 from datetime import datetime, timedelta
 
 notifications_bp = Blueprint('notifications', __name__)
 
-# Store active WebSocket connections
-active_connections = {}
-
 @notifications_bp.route('/', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_notifications():
     """Get user notifications with pagination"""
     try:
@@ -25,6 +36,37 @@ def get_notifications():
         limit = request.args.get('limit', default=50, type=int)
         offset = request.args.get('offset', default=0, type=int)
         unread_only = request.args.get('unread_only', default=False, type=bool)
+        compact = request.args.get('fields') == 'compact'
+        
+        # Unread count comes from the user's counter
+        unread_count = get_unread_count(current_user_id)
+        
+        # Cursor pagination: pass cursor= (empty) for the first page, then next_cursor
+        if 'cursor' in request.args:
+            try:
+                items, next_cursor = Notification.get_notifications_page(
+                    current_user_id,
+                    cursor=request.args.get('cursor'),
+                    limit=limit,
+                    notification_type=notification_type,
+                    unread_only=unread_only,
+                    compact=compact
+                )
+            except ValueError as e:
+                return jsonify({
+                    'message': str(e),
+                    'error': 'invalid_cursor'
+                }), 400
+            
+            return jsonify({
+                'notifications': items if compact else [notification.to_dict() for notification in items],
+                'pagination': {
+                    'unread_count': unread_count,
+                    'limit': limit,
+                    'next_cursor': next_cursor,
+                    'has_more': next_cursor is not None
+                }
+            }), 200
         
         # Get notifications
         query = Notification.query.filter_by(user_id=current_user_id)
@@ -36,19 +78,17 @@ def get_notifications():
             query = query.filter_by(is_read=False)
         
         # Get total count for pagination
-        total_count = query.count()
+        if unread_only and not notification_type:
+            total_count = unread_count
+        else:
+            total_count = query.count()
         
         # Apply pagination and ordering
         notifications = query.order_by(
-            Notification.created_at.desc()
+            Notification.created_at.desc(),
+            Notification.id.desc()
         ).limit(limit).offset(offset).all()
         
-        # Get unread count
-        unread_count = Notification.query.filter(
-            Notification.user_id == current_user_id,
-            Notification.is_read == False
-        ).count()
-        
         return jsonify({
             'notifications': [notification.to_dict() for notification in notifications],
             'pagination': {
@@ -59,13 +99,108 @@ def get_notifications():
                 'has_more': offset + len(notifications) < total_count
             }
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get notifications',
             'error': str(e)
         }), 500
 
+@notifications_bp.route('/unread-count', methods=['GET'])
+@jwt_required()
+@query_budget(2)
+def get_notification_unread_count():
+    """Get the user's unread notification count for badges"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        return jsonify({
+            'unread_count': get_unread_count(current_user_id)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to get unread count',
+            'error': str(e)
+        }), 500
+
+def _parse_last_event_id():
+    value = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        return int(value) if value is not None else None
+    except ValueError:
+        return None
+
+@notifications_bp.route('/stream', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_notifications():
+    """Server-Sent Events stream of notification updates.
+    
+    EventSource cannot send headers, so the token may also be passed as
+    ?jwt=<token>. The connection is closed after NOTIFICATION_STREAM_MAX_SECONDS
+    and the browser reconnects with Last-Event-ID to resume.
+    """
+    current_user_id = get_jwt_identity()
+    heartbeat = current_app.config['NOTIFICATION_STREAM_HEARTBEAT']
+    max_seconds = current_app.config['NOTIFICATION_STREAM_MAX_SECONDS']
+    subscriber, backlog = waiters.subscribe(current_user_id, _parse_last_event_id())
+    replay_offline_updates(current_user_id, lambda event_name, data: waiters.publish(current_user_id, event_name, data))
+    
+    def format_event(event):
+        return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event['data'])}\n\n"
+    
+    def generate():
+        try:
+            yield f"retry: {heartbeat * 1000}\n\n"
+            for event in backlog:
+                yield format_event(event)
+            
+            deadline = time.monotonic() + max_seconds
+            while time.monotonic() < deadline:
+                event = waiters.wait(subscriber, min(heartbeat, max(0, deadline - time.monotonic())))
+                yield format_event(event) if event else ": keepalive\n\n"
+        finally:
+            waiters.unsubscribe(current_user_id, subscriber)
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+@notifications_bp.route('/poll', methods=['GET'])
+@jwt_required()
+def poll_notifications():
+    """Long-poll for notification updates after last_event_id"""
+    try:
+        current_user_id = get_jwt_identity()
+        
+        # Get query parameters
+        timeout = request.args.get('timeout', default=25, type=float)
+        timeout = max(0, min(timeout, current_app.config['NOTIFICATION_POLL_MAX_TIMEOUT']))
+        last_event_id = _parse_last_event_id()
+        
+        subscriber, events = waiters.subscribe(current_user_id, last_event_id)
+        try:
+            replay_offline_updates(current_user_id, lambda event_name, data: waiters.publish(current_user_id, event_name, data))
+            if not events:
+                event = waiters.wait(subscriber, timeout)
+                if event:
+                    events = [event] + waiters.drain(subscriber)
+        finally:
+            waiters.unsubscribe(current_user_id, subscriber)
+        
+        return jsonify({
+            'events': events,
+            'last_event_id': events[-1]['id'] if events else last_event_id
+        }), 200
+    
+    except Exception as e:
+        return jsonify({
+            'message': 'Failed to poll notifications',
+            'error': str(e)
+        }), 500
+
 @notifications_bp.route('/<int:notification_id>/read', methods=['POST'])
 @jwt_required()
 def mark_notification_read(notification_id):
@@ -96,7 +231,7 @@ def mark_notification_read(notification_id):
             'message': 'Notification marked as read',
             'notification': notification.to_dict()
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to mark notification as read',
@@ -121,7 +256,7 @@ def mark_all_notifications_read():
         return jsonify({
             'message': f'Marked {count} notifications as read'
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to mark all notifications as read',
@@ -183,7 +318,7 @@ def create_budget_alert():
             return jsonify({
                 'message': 'Budget alert not needed at this time'
             }), 200
-            
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -193,6 +328,7 @@ def create_budget_alert():
 
 @notifications_bp.route('/spending-warnings', methods=['GET'])
 @jwt_required()
+@query_budget(4)
 def get_spending_warnings():
     """Get spending warnings based on current patterns"""
     try:
@@ -203,64 +339,34 @@ def get_spending_warnings():
         # Get current month spending
         now = datetime.utcnow()
         start_of_month = now.replace(day=1).date()
-        
-        # Get expenses for current month
-        current_month_expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=start_of_month
-        )
+        index = get_spend_index(current_user_id)
         
         # Calculate spending by category
-        category_spending = {}
-        total_spending = 0
-        
-        for expense in current_month_expenses:
-            category = expense.category
-            amount = float(expense.amount)
-            total_spending += amount
-            
-            if category not in category_spending:
-                category_spending[category] = 0
-            category_spending[category] += amount
-        
-        # Get historical averages for comparison
-        six_months_ago = start_of_month - timedelta(days=180)
-        historical_expenses = Expense.get_expenses_by_user(
-            current_user_id,
-            start_date=six_months_ago,
-            end_date=start_of_month
-        )
+        category_spending = {
+            category: from_cents(cents)
+            for category, cents in index.category_totals(start_of_month).items()
+        }
+        total_spending = from_cents(index.range_sum(start_of_month))
         
+        # Get historical spending per category for each of the last six full months
         historical_category_spending = {}
-        historical_months = {}
+        month_end = start_of_month - timedelta(days=1)
         
-        for expense in historical_expenses:
-            month_key = expense.date.strftime('%Y-%m')
-            category = expense.category
-            amount = float(expense.amount)
-            
-            if month_key not in historical_months:
-                historical_months[month_key] = {}
-            if category not in historical_months[month_key]:
-                historical_months[month_key][category] = 0
-            historical_months[month_key][category] += amount
-        
-        # Calculate average monthly spending by category
-        for month_data in historical_months.values():
-            for category, amount in month_data.items():
-                if category not in historical_category_spending:
-                    historical_category_spending[category] = []
-                historical_category_spending[category].append(amount)
+        for _ in range(6):
+            month_start = month_end.replace(day=1)
+            for category, cents in index.category_totals(month_start, month_end).items():
+                historical_category_spending.setdefault(category, []).append(from_cents(cents))
+            month_end = month_start - timedelta(days=1)
+        
+        # Days into month
+        days_in_month = calendar.monthrange(now.year, now.month)[1]
+        days_elapsed = now.day
         
         # Calculate averages and detect warnings
         for category, amounts in historical_category_spending.items():
             avg_historical = sum(amounts) / len(amounts)
             current_spending = category_spending.get(category, 0)
             
-            # Days into month
-            days_in_month = (now.replace(month=now.month + 1, day=1) - timedelta(days=1)).day
-            days_elapsed = now.day
-            
             # Project spending for full month
             if days_elapsed > 0:
                 projected_spending = (current_spending / days_elapsed) * days_in_month
@@ -283,12 +389,12 @@ def get_spending_warnings():
         
         for budget in active_budgets:
             if budget.is_over_budget():
-                over_amount = budget.get_spent_amount() - float(budget.amount)
+                over_amount = from_cents((budget.spent_cents or 0) - budget.amount_cents)
                 warnings.append({
                     'type': 'budget_exceeded',
                     'category': budget.category,
                     'display_name': budget.get_category_display_name(),
-                    'budget_amount': float(budget.amount),
+                    'budget_amount': from_cents(budget.amount_cents),
                     'spent_amount': budget.get_spent_amount(),
                     'over_amount': over_amount,
                     'message': f"You've exceeded your {budget.get_category_display_name()} budget by ${over_amount:.2f}"
@@ -299,7 +405,7 @@ def get_spending_warnings():
                     'type': 'budget_warning',
                     'category': budget.category,
                     'display_name': budget.get_category_display_name(),
-                    'budget_amount': float(budget.amount),
+                    'budget_amount': from_cents(budget.amount_cents),
                     'spent_amount': budget.get_spent_amount(),
                     'percentage_used': percentage_used,
                     'message': f"You've used {percentage_used:.1f}% of your {budget.get_category_display_name()} budget"
@@ -313,7 +419,7 @@ def get_spending_warnings():
                 'analysis_date': now.isoformat()
             }
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get spending warnings',
@@ -341,7 +447,7 @@ def get_notification_settings():
             'spending_warnings': True,
             'monthly_reports': True
         }), 200
-        
+    
     except Exception as e:
         return jsonify({
             'message': 'Failed to get notification settings',
@@ -376,7 +482,7 @@ def update_notification_settings():
                 'email_notifications': user.email_notifications
             }
         }), 200
-        
+    
     except Exception as e:
         db.session.rollback()
         return jsonify({
@@ -385,56 +491,135 @@ def update_notification_settings():
         }), 500
 
 # WebSocket events
+def _socket_identity(auth):
+    """User id from the access token sent with the Socket.IO handshake"""
+    token = (auth or {}).get('token') or request.args.get('jwt')
+    if not token:
+        raise ConnectionRefusedError('Missing access token')
+    
+    try:
+        claims = decode_token(token)
+        verify_token_type(claims, refresh=False)
+        verify_token_not_blocklisted(jwt.get_unverified_header(token), claims)
+    except Exception:
+        raise ConnectionRefusedError('Invalid access token')
+    return int(claims[current_app.config['JWT_IDENTITY_CLAIM']])
+
 @socketio.on('connect')
 def handle_connect(auth):
-    """Handle client connection"""
+    """Handle client connection; the socket stays bound to its token's user"""
+    # Raising ConnectionRefusedError rejects the handshake
+    user_id = _socket_identity(auth)
+    socket_connected()
     try:
-        # In production, verify JWT token from auth
-        user_id = auth.get('user_id') if auth else None
-        
-        if user_id:
-            join_room(f'user_{user_id}')
-            active_connections[request.sid] = user_id
-            emit('connected', {'message': 'Connected to notifications'})
+        presence.bind(request.sid, user_id)
+        _join_user(user_id)
+        emit('connected', {'message': 'Connected to notifications'})
     except Exception as e:
         emit('error', {'message': str(e)})
 
 @socketio.on('disconnect')
 def handle_disconnect():
     """Handle client disconnection"""
+    if presence.unbind(request.sid) is None:
+        return
+    socket_disconnected()
     try:
-        user_id = active_connections.get(request.sid)
+        user_id = presence.disconnect(request.sid)
         if user_id:
             leave_room(f'user_{user_id}')
-            del active_connections[request.sid]
     except Exception as e:
         print(f"Disconnect error: {e}")
 
 @socketio.on('join_notifications')
-def handle_join_notifications(data):
-    """Join user-specific notification room"""
+def handle_join_notifications(data=None):
+    """Rejoin the bound user's notification room; any user_id sent is ignored"""
     try:
-        user_id = data.get('user_id')
-        if user_id:
-            join_room(f'user_{user_id}')
-            active_connections[request.sid] = user_id
-            emit('joined', {'room': f'user_{user_id}'})
+        user_id = presence.identity_for(request.sid)
+        if user_id is None:
+            emit('error', {'message': 'Not authenticated'})
+            return
+        if presence.user_for(request.sid) != user_id:
+            _join_user(user_id)
+        emit('joined', {'room': f'user_{user_id}'})
     except Exception as e:
         emit('error', {'message': str(e)})
 
+@socketio.on('heartbeat')
+def handle_heartbeat(data=None):
+    """Keep the connection marked online"""
+    try:
+        if presence.heartbeat(request.sid) is None:
+            emit('rejoin', {'message': 'Presence expired'})
+    except Exception as e:
+        emit('error', {'message': str(e)})
+
+def _join_user(user_id):
+    join_room(f'user_{user_id}')
+    presence.connect(request.sid, user_id)
+    replay_offline_updates(user_id, lambda event_name, data: emit(event_name, data, to=request.sid))
+
+def replay_offline_updates(user_id, send):
+    """Send updates queued while the user was offline, then their unread count"""
+    items = presence.take_offline(user_id)
+    if not items:
+        return 0
+    
+    # Notifications were queued by id; load them all at once
+    notification_ids = []
+    for item in items:
+        if item['event'] == 'new_notifications':
+            notification_ids.extend(item['data']['notification_ids'])
+        else:
+            send(item['event'], item['data'])
+    
+    if notification_ids:
+        notifications = Notification.query.filter(
+            Notification.id.in_(notification_ids)
+        ).order_by(Notification.created_at, Notification.id).all()
+        if notifications:
+            send('new_notifications', {
+                'notifications': [notification.to_dict() for notification in notifications]
+            })
+    
+    send('unread_count', {'unread_count': get_unread_count(user_id)})
+    return len(items)
+
 def emit_notification_update(user_id, data):
     """Emit notification update to specific user"""
     try:
+        if not is_listening(user_id):
+            presence.queue_offline(user_id, 'notification_update', data)
+            return
+        
         socketio.emit('notification_update', data, room=f'user_{user_id}')
+        waiters.publish(user_id, 'notification_update', data)
     except Exception as e:
         print(f"WebSocket emit error: {e}")
 
 def send_real_time_notification(user_id, notification):
     """Send real-time notification to user"""
+    send_real_time_notifications(user_id, [notification])
+
+def send_real_time_notifications(user_id, notifications):
+    """Send a batch of real-time notifications to a user in one emit"""
     try:
-        socketio.emit('new_notification', {
-            'notification': notification.to_dict()
-        }, room=f'user_{user_id}')
+        # Offline users get them on reconnect; skip serializing them now
+        if not is_listening(user_id):
+            presence.queue_offline(user_id, 'new_notifications', {
+                'notification_ids': [notification.id for notification in notifications]
+            })
+            return
+        
+        if len(notifications) == 1:
+            event_name = 'new_notification'
+            payload = {'notification': notifications[0].to_dict()}
+        else:
+            event_name = 'new_notifications'
+            payload = {'notifications': [notification.to_dict() for notification in notifications]}
+        
+        socketio.emit(event_name, payload, room=f'user_{user_id}')
+        waiters.publish(user_id, event_name, payload)
     except Exception as e:
         print(f"Real-time notification error: {e}")
 
@@ -467,15 +652,12 @@ def check_budget_alerts():
                         percentage_used
                     )
                     
-                    db.session.add(notification)
+                    # Saved and pushed through the digest buffer
+                    deliver_notifications(budget.user_id, [notification])
                     notifications_created += 1
-                    
-                    # Send real-time notification
-                    send_real_time_notification(budget.user_id, notification)
         
-        db.session.commit()
         return notifications_created
-        
+    
     except Exception as e:
         db.session.rollback()
         print(f"Budget alert check error: {e}")
@@ -0,0 +1,100 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from flask import g, request
+from werkzeug.exceptions import HTTPException, NotFound
+
+# Blueprints a batch may call into
+BATCH_BLUEPRINTS = {'expenses', 'analytics', 'insights', 'notifications'}
+
+# Streaming endpoints make no sense inside a batch
+BATCH_EXCLUDED_ENDPOINTS = {'notifications.stream_notifications', 'notifications.poll_notifications'}
+
+READ_ONLY_METHODS = {'GET', 'HEAD'}
+
+# Where flask_jwt_extended keeps the verified token for the current context
+_JWT_STATE = ('_jwt_extended_jwt', '_jwt_extended_jwt_header', '_jwt_extended_jwt_user', '_jwt_extended_jwt_location')
+
+def init_batch(app):
+    """Create the pool that runs read-only batch items side by side"""
+    workers = app.config.get('BATCH_WORKERS', 4)
+    app.extensions['batch_executor'] = ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix='batch'
+    ) if workers > 0 else None
+
+def _dispatch(app, item):
+    """Run one sub-request against its view, reusing the batch's verified JWT"""
+    method = str(item.get('method', 'GET')).upper()
+    path = item.get('path') or ''
+
+    with app.test_request_context(path, method=method, json=item.get('body')):
+        try:
+            if request.routing_exception is not None:
+                raise request.routing_exception
+
+            endpoint = request.url_rule.endpoint
+            if endpoint.split('.')[0] not in BATCH_BLUEPRINTS or endpoint in BATCH_EXCLUDED_ENDPOINTS:
+                raise NotFound(f"{path} cannot be called from a batch")
+
+            # The batch request already verified the token; skip @jwt_required
+            view = app.view_functions[endpoint]
+            view = getattr(view, '__wrapped__', view)
+            response = app.make_response(view(**request.view_args))
+
+            return {
+                'id': item.get('id'),
+                'status': response.status_code,
+                'body': response.get_json(silent=True)
+            }
+        except HTTPException as e:
+            return {
+                'id': item.get('id'),
+                'status': e.code,
+                'body': {'message': e.description}
+            }
+        except Exception as e:
+            return {
+                'id': item.get('id'),
+                'status': 500,
+                'body': {'message': 'Sub-request failed', 'error': str(e)}
+            }
+
+def _dispatch_in_context(app, item, jwt_state):
+    # A worker thread needs its own app context, and so its own DB session
+    with app.app_context():
+        for name, value in jwt_state.items():
+            setattr(g, name, value)
+        return _dispatch(app, item)
+
+def run_batch(app, items, parallel=False):
+    """Run sub-requests in order, returning one result per item.
+
+    Items share the caller's app context, so they share its verified JWT and
+    DB session. With `parallel`, each run of consecutive read-only items is
+    spread over the batch pool; writes still run one at a time, in order, so
+    a read after a write sees it.
+    """
+    executor = app.extensions.get('batch_executor') if parallel else None
+    jwt_state = {name: g.get(name) for name in _JWT_STATE}
+    results = []
+
+    position = 0
+    while position < len(items):
+        item = items[position]
+        reads = []
+        while executor is not None and position + len(reads) < len(items):
+            candidate = items[position + len(reads)]
+            if str(candidate.get('method', 'GET')).upper() not in READ_ONLY_METHODS:
+                break
+            reads.append(candidate)
+
+        if len(reads) > 1:
+            # copy_context() carries the request's query stats into the worker
+            futures = [executor.submit(copy_context().run, _dispatch_in_context, app, read, jwt_state) for read in reads]
+            results.extend(future.result() for future in futures)
+            position += len(reads)
+        else:
+            results.append(_dispatch(app, item))
+            position += 1
+
+    return results
@@ -0,0 +1,71 @@
+from app import db
+from models.budget import Budget
+from models.notification import Notification
+from services.budget_index import get_budget_index
+from services.notification_digest import deliver_notifications
+from services.tasks import task
+from datetime import datetime
+
+def _parse_date(value):
+    if isinstance(value, str):
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    return value
+
+def _evaluate_budgets(user_id, budget_ids):
+    """Create alert/exceeded notifications for the given budgets"""
+    notifications_created = []
+    
+    for budget_id in budget_ids:
+        budget = db.session.get(Budget, budget_id)
+        if not budget:
+            continue
+        
+        # Spent is loaded once per budget instead of once per check
+        spent_cents = budget.spent_cents or 0
+        percentage_used = (spent_cents / budget.amount_cents * 100) if budget.amount_cents > 0 else 0
+        
+        if spent_cents > budget.amount_cents:
+            notification = Notification.create_budget_exceeded(user_id, budget)
+        elif percentage_used >= budget.alert_threshold:
+            notification = Notification.create_budget_alert(user_id, budget, percentage_used)
+        else:
+            continue
+        
+        notifications_created.append(notification)
+    
+    # Saved now if urgent or eager, otherwise merged into the user's next digest
+    return deliver_notifications(user_id, notifications_created)
+
+@task
+def check_expense_budgets(user_id, category, expense_date):
+    """Create budget notifications for the budgets covering a new expense"""
+    expense_date = _parse_date(expense_date)
+    index = get_budget_index(user_id)
+    
+    # Category budget first, then the total budget
+    budget_ids = []
+    for name in (category, 'total'):
+        intervals = index.covering(expense_date, name)
+        if intervals:
+            budget_ids.append(intervals[0].id)
+    
+    return _evaluate_budgets(user_id, budget_ids)
+
+@task
+def check_bulk_expense_budgets(user_id, entries):
+    """Evaluate every budget touched by a bulk import once.
+    
+    `entries` is a list of (category, date) pairs; the user's budget index is
+    loaded once and shared by all of them.
+    """
+    index = get_budget_index(user_id)
+    
+    budget_ids = []
+    for category, expense_date in entries:
+        expense_date = _parse_date(expense_date)
+        for name in (category, 'total'):
+            intervals = index.covering(expense_date, name)
+            if intervals and intervals[0].id not in budget_ids:
+                budget_ids.append(intervals[0].id)
+    
+    return _evaluate_budgets(user_id, budget_ids)
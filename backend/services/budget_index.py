@@ -0,0 +1,164 @@
+from app import db
+from models.budget import Budget
+from services.metrics import record_cache_lookup
+from bisect import bisect_right
+from collections import OrderedDict, namedtuple
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from flask import current_app
+import threading
+import time
+
+BudgetInterval = namedtuple('BudgetInterval', ['id', 'category', 'start_date', 'end_date'])
+
+class UserBudgetIndex:
+    """Active budgets of one user as sorted date intervals per category"""
+    
+    def __init__(self, intervals):
+        self.categories = {}
+        
+        grouped = {}
+        for interval in intervals:
+            grouped.setdefault(interval.category, []).append(interval)
+        
+        for category, items in grouped.items():
+            items.sort(key=lambda x: (x.start_date, x.id))
+            
+            # Running max of end dates lets a backwards scan stop early
+            max_ends = []
+            for item in items:
+                max_ends.append(max(max_ends[-1], item.end_date) if max_ends else item.end_date)
+            
+            self.categories[category] = (items, [item.start_date for item in items], max_ends)
+    
+    def _scan(self, category, start, end):
+        """Intervals in a category that overlap [start, end]"""
+        if category not in self.categories:
+            return []
+        
+        items, starts, max_ends = self.categories[category]
+        matches = []
+        
+        # Only intervals starting on or before `end` can overlap
+        i = bisect_right(starts, end) - 1
+        while i >= 0 and max_ends[i] >= start:
+            if items[i].end_date >= start:
+                matches.append(items[i])
+            i -= 1
+        
+        matches.reverse()
+        return matches
+    
+    def covering(self, day, category=None):
+        """Budgets whose period contains the given day"""
+        return self.overlapping(day, day, category)
+    
+    def overlapping(self, start, end, category=None):
+        """Budgets whose period overlaps the given date range"""
+        categories = [category.lower()] if category else list(self.categories)
+        
+        matches = []
+        for name in categories:
+            matches.extend(self._scan(name, start, end))
+        return matches
+    
+    def __len__(self):
+        return sum(len(items) for items, _, _ in self.categories.values())
+
+class BudgetIndexCache:
+    """Per-user budget indexes, dropped whenever one of the user's budgets changes"""
+    
+    def __init__(self, max_users=10000, ttl=300):
+        self.max_users = max_users
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        """Get the user's index, loading it with one query on a miss"""
+        user_id = int(user_id)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                record_cache_lookup('budget_index', True)
+                return entry[0]
+        
+        record_cache_lookup('budget_index', False)
+        index = UserBudgetIndex(self._load(user_id))
+        
+        with self._lock:
+            self._entries[user_id] = (index, now)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.max_users:
+                self._entries.popitem(last=False)
+        
+        return index
+    
+    def invalidate(self, user_id=None):
+        """Drop one user's index, or every index when no user is given"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(int(user_id), None)
+    
+    @staticmethod
+    def _load(user_id):
+        rows = db.session.query(
+            Budget.id,
+            Budget.category,
+            Budget.start_date,
+            Budget.end_date
+        ).filter(
+            Budget.user_id == user_id,
+            Budget.is_active == True
+        ).all()
+        
+        return [BudgetInterval(*row) for row in rows]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = BudgetIndexCache(
+                    max_users=current_app.config.get('BUDGET_INDEX_MAX_USERS', 10000),
+                    ttl=current_app.config.get('BUDGET_INDEX_TTL', 300)
+                )
+    return _cache
+
+def get_budget_index(user_id):
+    """Get the cached active-budget index for a user"""
+    return _get_cache().get(user_id)
+
+def invalidate_budget_index(user_id=None):
+    """Forget cached budget indexes after budgets change outside the ORM"""
+    if _cache is not None:
+        _cache.invalidate(user_id)
+
+# Budget writes invalidate the owner's index immediately and again on commit,
+# so a concurrent reader cannot keep an index loaded before the commit landed
+@event.listens_for(Budget, 'after_insert')
+@event.listens_for(Budget, 'after_update')
+@event.listens_for(Budget, 'after_delete')
+def _budget_changed(mapper, connection, target):
+    invalidate_budget_index(target.user_id)
+    
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('budget_index_dirty', set()).add(target.user_id)
+
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    for user_id in session.info.pop('budget_index_dirty', ()):
+        invalidate_budget_index(user_id)
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('budget_index_dirty', None)
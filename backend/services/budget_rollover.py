@@ -0,0 +1,156 @@
+from app import db
+from models.budget import Budget
+from services.budget_index import invalidate_budget_index
+from services.budget_spend import foreign_spent_cents, spent_cents_expression
+from services.monthly_reports import drop_reports_for_budgets
+from datetime import date, datetime, timedelta
+from sqlalchemy import BigInteger, and_, case, func, insert, literal, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+
+# Periods that repeat; custom budgets keep their explicit dates
+RECURRING_PERIODS = ['weekly', 'monthly', 'yearly']
+
+def next_period_dates(period, end_date):
+    """Start and end date of the period following one that ends on end_date"""
+    start = end_date + timedelta(days=1)
+    
+    if period == 'weekly':
+        return start, start + timedelta(days=6)
+    elif period == 'monthly':
+        if start.month == 12:
+            return start, date(start.year + 1, 1, 1) - timedelta(days=1)
+        return start, date(start.year, start.month + 1, 1) - timedelta(days=1)
+    elif period == 'yearly':
+        return start, date(start.year, 12, 31)
+    
+    raise ValueError(f"Invalid recurring period. Must be one of: {', '.join(RECURRING_PERIODS)}")
+
+def _insert_ignoring_duplicates(table, dialect):
+    """INSERT that skips rows conflicting with a unique constraint, where the dialect supports it"""
+    if dialect == 'postgresql':
+        return postgresql.insert(table).on_conflict_do_nothing()
+    if dialect == 'sqlite':
+        return sqlite.insert(table).on_conflict_do_nothing()
+    if dialect == 'mysql':
+        return insert(table).prefix_with('IGNORE')
+    return insert(table)
+
+def _rollover_pass(today):
+    """Insert the next period for every ended recurring budget that has none"""
+    budgets = Budget.__table__
+    successor = aliased(budgets)
+    
+    ended = and_(
+        budgets.c.is_active == True,
+        budgets.c.period.in_(RECURRING_PERIODS),
+        budgets.c.end_date < today,
+        ~select(successor.c.id).where(
+            successor.c.user_id == budgets.c.user_id,
+            successor.c.category == budgets.c.category,
+            successor.c.period == budgets.c.period,
+            successor.c.start_date > budgets.c.end_date
+        ).exists()
+    )
+    
+    # Period boundaries are shared by many budgets (every monthly budget ends
+    # on the same day), so the next dates come from a handful of CASE arms
+    boundaries = db.session.execute(
+        select(budgets.c.period, budgets.c.end_date).where(ended).distinct()
+    ).all()
+    if not boundaries:
+        return 0
+    
+    next_dates = {
+        (period, end_date): next_period_dates(period, end_date)
+        for period, end_date in boundaries
+    }
+    next_start = case(
+        *[
+            (and_(budgets.c.period == period, budgets.c.end_date == end_date), literal(dates[0]))
+            for (period, end_date), dates in next_dates.items()
+        ]
+    )
+    next_end = case(
+        *[
+            (and_(budgets.c.period == period, budgets.c.end_date == end_date), literal(dates[1]))
+            for (period, end_date), dates in next_dates.items()
+        ]
+    )
+    
+    now = datetime.utcnow()
+    last_id = db.session.execute(select(func.max(budgets.c.id))).scalar() or 0
+    
+    # Successors a concurrent run already inserted are skipped, not an error
+    dialect = db.session.get_bind().dialect.name
+    result = db.session.execute(
+        _insert_ignoring_duplicates(budgets, dialect).from_select(
+            [
+                'user_id', 'category', 'amount_cents', 'period', 'start_date', 'end_date',
+                'is_active', 'alert_threshold', 'spent_cents', 'created_at', 'updated_at'
+            ],
+            select(
+                budgets.c.user_id,
+                budgets.c.category,
+                budgets.c.amount_cents,
+                budgets.c.period,
+                next_start,
+                next_end,
+                budgets.c.is_active,
+                budgets.c.alert_threshold,
+                literal(0, BigInteger),
+                literal(now),
+                literal(now)
+            ).where(ended, next_start.isnot(None))
+        )
+    )
+    
+    # Expenses may already exist in the new periods (late run, future dates)
+    db.session.execute(
+        update(budgets).where(
+            budgets.c.id > last_id
+        ).values(spent_cents=spent_cents_expression(budgets))
+    )
+    for budget_id, cents in foreign_spent_cents(db.session.connection(), budgets.c.id > last_id).items():
+        db.session.execute(
+            update(budgets).where(budgets.c.id == budget_id).values(spent_cents=budgets.c.spent_cents + cents)
+        )
+    
+    # Catch-up successors can start in closed months; ORM events don't see this INSERT
+    drop_reports_for_budgets(db.session.connection(), db.session.execute(
+        select(budgets.c.user_id, budgets.c.start_date, budgets.c.end_date).where(
+            budgets.c.id > last_id,
+            budgets.c.start_date < today.replace(day=1)
+        )
+    ).all())
+    
+    return result.rowcount
+
+def rollover_recurring_budgets(today=None, max_passes=60):
+    """Create next-period rows for all recurring budgets whose period ended.
+    
+    Each pass is one INSERT ... SELECT over every user. Budgets that missed
+    several periods catch up one period per pass. Safe to run repeatedly: a
+    budget that already has a successor is skipped, and rows a concurrent run
+    inserted first hit the unique (user_id, category, period, start_date)
+    constraint and are skipped by ON CONFLICT DO NOTHING (INSERT IGNORE on MySQL).
+    """
+    today = today or date.today()
+    created = 0
+    
+    try:
+        for _ in range(max_passes):
+            inserted = _rollover_pass(today)
+            db.session.commit()
+            
+            if not inserted:
+                break
+            created += inserted
+    except IntegrityError:
+        # Dialects without an ignoring INSERT: another process rolled the same budgets over
+        db.session.rollback()
+    finally:
+        invalidate_budget_index()
+    
+    return created
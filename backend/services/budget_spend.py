@@ -0,0 +1,242 @@
+from app import db
+from models.budget import Budget
+from models.expense import Expense
+from models.user import User
+from services.fx import convert_amounts
+from sqlalchemy import BigInteger, and_, cast, event, func, or_, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+# Expense columns that decide which budgets an expense counts towards
+_EXPENSE_FIELDS = ('amount_cents', 'category', 'date', 'currency')
+
+# Budget columns that decide which expenses a budget covers
+_BUDGET_FIELDS = ('user_id', 'category', 'start_date', 'end_date')
+
+def _covers(budgets, expenses):
+    return and_(
+        expenses.c.user_id == budgets.c.user_id,
+        expenses.c.date >= budgets.c.start_date,
+        expenses.c.date <= budgets.c.end_date,
+        or_(budgets.c.category == 'total', expenses.c.category == budgets.c.category)
+    )
+
+def _spent_subquery(budgets):
+    """Correlated SUM of the expenses in the owner's currency covered by each budget row"""
+    expenses = Expense.__table__
+    return db.select(func.coalesce(func.sum(expenses.c.amount_cents), 0)).where(
+        _covers(budgets, expenses),
+        expenses.c.currency.is_(None)
+    ).scalar_subquery()
+
+def spent_cents_expression(budgets):
+    """SQL expression for a budget row's spent cents from expenses in the owner's currency.
+    
+    Expenses recorded with a currency are converted in Python; add
+    foreign_spent_cents() for those.
+    """
+    return cast(_spent_subquery(budgets), BigInteger)
+
+def foreign_spent_cents(connection, *criteria):
+    """{budget_id: cents} of expenses recorded with a currency, converted into the owner's, for matching budgets"""
+    budgets = Budget.__table__
+    expenses = Expense.__table__
+    users = User.__table__
+    rows = connection.execute(
+        select(budgets.c.id, users.c.currency, expenses.c.currency, expenses.c.date, func.sum(expenses.c.amount_cents))
+        .select_from(
+            budgets.join(users, users.c.id == budgets.c.user_id)
+            .join(expenses, and_(_covers(budgets, expenses), expenses.c.currency.isnot(None)))
+        )
+        .where(*criteria)
+        .group_by(budgets.c.id, users.c.currency, expenses.c.currency, expenses.c.date)
+    ).all()
+    
+    by_target = {}
+    for row in rows:
+        by_target.setdefault(row[1] or 'USD', []).append(row)
+    
+    totals = {}
+    for target, group in by_target.items():
+        converted = convert_amounts(
+            [int(row[4]) for row in group], [row[3].toordinal() for row in group], [row[2] for row in group], target
+        )
+        for row, cents in zip(group, converted):
+            if cents is not None:
+                totals[row[0]] = totals.get(row[0], 0) + cents
+    return totals
+
+def _old_value(target, field):
+    history = get_history(target, field)
+    return history.deleted[0] if history.deleted else getattr(target, field)
+
+def _add_delta(target, user_id, category, expense_date, cents, currency=None):
+    session = Session.object_session(target)
+    if session is None or not cents:
+        return
+    
+    # Converting needs the owner's currency and that day's rate; recompute the
+    # covering budgets instead, as other currencies are rare
+    if currency is not None:
+        session.info.setdefault('budget_spend_rescope', set()).add((user_id, category, expense_date))
+        return
+    
+    deltas = session.info.setdefault('budget_spend_deltas', {})
+    key = (user_id, category, expense_date)
+    deltas[key] = deltas.get(key, 0) + cents
+
+@event.listens_for(Expense, 'after_insert')
+def _expense_inserted(mapper, connection, target):
+    _add_delta(target, target.user_id, target.category, target.date, target.amount_cents, target.currency)
+
+@event.listens_for(Expense, 'after_delete')
+def _expense_deleted(mapper, connection, target):
+    _add_delta(
+        target,
+        target.user_id,
+        _old_value(target, 'category'),
+        _old_value(target, 'date'),
+        -_old_value(target, 'amount_cents'),
+        _old_value(target, 'currency')
+    )
+
+@event.listens_for(Expense, 'after_update')
+def _expense_updated(mapper, connection, target):
+    if not any(get_history(target, field).has_changes() for field in _EXPENSE_FIELDS):
+        return
+    
+    # Take the old amount out of the old window and add the new one, which
+    # also covers moves across categories and dates
+    _add_delta(
+        target,
+        target.user_id,
+        _old_value(target, 'category'),
+        _old_value(target, 'date'),
+        -_old_value(target, 'amount_cents'),
+        _old_value(target, 'currency')
+    )
+    _add_delta(target, target.user_id, target.category, target.date, target.amount_cents, target.currency)
+
+@event.listens_for(Budget, 'after_insert')
+def _budget_inserted(mapper, connection, target):
+    session = Session.object_session(target)
+    if session is not None:
+        session.info.setdefault('budget_spend_recompute', set()).add(target.id)
+
+@event.listens_for(Budget, 'after_update')
+def _budget_updated(mapper, connection, target):
+    if any(get_history(target, field).has_changes() for field in _BUDGET_FIELDS):
+        _budget_inserted(mapper, connection, target)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    # Spent counters are in the owner's currency
+    session = Session.object_session(target)
+    if session is not None and get_history(target, 'currency').has_changes():
+        session.info.setdefault('budget_spend_rescope', set()).add((target.id, None, None))
+
+@event.listens_for(Session, 'after_flush')
+def _apply_spend_changes(session, flush_context):
+    deltas = session.info.pop('budget_spend_deltas', None)
+    recompute = session.info.pop('budget_spend_recompute', None)
+    rescope = session.info.pop('budget_spend_rescope', None)
+    
+    if not deltas and not recompute and not rescope:
+        return
+    
+    budgets = Budget.__table__
+    connection = session.connection()
+    
+    # Budgets covering changed expenses in other currencies, or every budget of
+    # a user whose currency changed
+    recompute = set(recompute or ())
+    for user_id, category, expense_date in rescope or ():
+        criteria = [budgets.c.user_id == user_id]
+        if category is not None:
+            criteria += [
+                or_(budgets.c.category == category, budgets.c.category == 'total'),
+                budgets.c.start_date <= expense_date,
+                budgets.c.end_date >= expense_date
+            ]
+        recompute.update(connection.execute(select(budgets.c.id).where(*criteria)).scalars())
+    
+    # One atomic increment per distinct (user, category, day) in the flush
+    for (user_id, category, expense_date), cents in (deltas or {}).items():
+        if not cents:
+            continue
+        connection.execute(
+            update(budgets).where(
+                budgets.c.user_id == user_id,
+                or_(budgets.c.category == category, budgets.c.category == 'total'),
+                budgets.c.start_date <= expense_date,
+                budgets.c.end_date >= expense_date
+            ).values(spent_cents=budgets.c.spent_cents + cents)
+        )
+    
+    # New or re-scoped budgets are recomputed from source after the deltas,
+    # so expenses flushed alongside them are not counted twice
+    if recompute:
+        connection.execute(
+            update(budgets).where(
+                budgets.c.id.in_(recompute)
+            ).values(spent_cents=spent_cents_expression(budgets))
+        )
+        for budget_id, cents in foreign_spent_cents(connection, budgets.c.id.in_(recompute)).items():
+            connection.execute(
+                update(budgets).where(budgets.c.id == budget_id).values(spent_cents=budgets.c.spent_cents + cents)
+            )
+        
+        # The identity map still holds the pre-flush value
+        for budget_id in recompute:
+            budget = session.identity_map.get(session.identity_key(Budget, budget_id))
+            if budget is not None:
+                session.expire(budget, ['spent_cents'])
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_spend_changes(session):
+    session.info.pop('budget_spend_deltas', None)
+    session.info.pop('budget_spend_recompute', None)
+    session.info.pop('budget_spend_rescope', None)
+
+def reconcile_budget_spend(fix=True):
+    """Recompute every budget's spent counter from expenses and report drift.
+    
+    Returns a list of {'budget_id', 'user_id', 'stored_cents', 'actual_cents',
+    'drift_cents'} for budgets whose counter was wrong. With `fix` the
+    counters are corrected in the same pass.
+    """
+    budgets = Budget.__table__
+    rows = db.session.execute(
+        db.select(
+            budgets.c.id,
+            budgets.c.user_id,
+            budgets.c.spent_cents,
+            spent_cents_expression(budgets)
+        )
+    ).all()
+    foreign = foreign_spent_cents(db.session.connection())
+    
+    drift = []
+    for budget_id, user_id, stored_cents, actual_cents in rows:
+        actual_cents = int(actual_cents or 0) + foreign.get(budget_id, 0)
+        if (stored_cents or 0) != actual_cents:
+            drift.append({
+                'budget_id': budget_id,
+                'user_id': user_id,
+                'stored_cents': stored_cents,
+                'actual_cents': actual_cents,
+                'drift_cents': (stored_cents or 0) - actual_cents
+            })
+    
+    if fix and drift:
+        db.session.execute(
+            update(Budget),
+            [{'id': item['budget_id'], 'spent_cents': item['actual_cents']} for item in drift]
+        )
+    
+    db.session.commit()
+    
+    for item in drift:
+        print(f"Budget {item['budget_id']} spent drift: {item['drift_cents']} cents")
+    
+    return drift
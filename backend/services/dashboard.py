@@ -0,0 +1,222 @@
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from datetime import date
+import calendar
+import time
+import numpy as np
+from models.budget import Budget
+from models.expense import Expense
+from models.notification import Notification
+from services.ledger import get_ledger_view
+from services.notification_counts import get_unread_count
+
+# One user's expenses over the dashboard window, one array per column
+ExpenseColumns = namedtuple('ExpenseColumns', ['dates', 'categories', 'payment_methods', 'cents'])
+
+PANELS = ('overview', 'trends', 'categories', 'budgets', 'notifications')
+
+def init_dashboard(app):
+    """Create the pool that computes dashboard panels side by side"""
+    workers = app.config.get('DASHBOARD_WORKERS', 4)
+    app.extensions['dashboard_executor'] = ThreadPoolExecutor(
+        max_workers=workers,
+        thread_name_prefix='dashboard'
+    ) if workers > 0 else None
+
+def month_bounds(day):
+    """First and last day of the month containing day"""
+    return day.replace(day=1), day.replace(day=calendar.monthrange(day.year, day.month)[1])
+
+def months_back(day, months):
+    """First day of the month `months - 1` months before day's month"""
+    index = day.year * 12 + day.month - 1 - (months - 1)
+    return date(index // 12, index % 12 + 1, 1)
+
+def load_expense_columns(user_id, start_date, end_date):
+    """One user's expenses in a date range as columns, from their cached ledger"""
+    ledger = get_ledger_view(user_id, start_date, end_date)
+    return ExpenseColumns(ledger.dates, ledger.category_names(), ledger.payment_method_names(), ledger.cents)
+
+def _group_totals(keys, cents):
+    """(key, cents, count) per distinct key, largest total first"""
+    if not len(keys):
+        return []
+    
+    labels, inverse = np.unique(keys, return_inverse=True)
+    totals = np.bincount(inverse, weights=cents, minlength=len(labels))
+    counts = np.bincount(inverse, minlength=len(labels))
+    order = np.argsort(-totals, kind='stable')
+    return [(labels[i], int(round(totals[i])), int(counts[i])) for i in order]
+
+def _period_mask(columns, start_date, end_date):
+    return (columns.dates >= np.datetime64(start_date)) & (columns.dates <= np.datetime64(end_date))
+
+def overview_panel(columns, start_date, end_date):
+    """Same shape as /api/expenses/summary for the current period"""
+    mask = _period_mask(columns, start_date, end_date)
+    cents = columns.cents[mask]
+    total_amount = int(cents.sum()) / 100
+    expense_count = int(mask.sum())
+    
+    return {
+        'summary': {
+            'total_amount': total_amount,
+            'expense_count': expense_count,
+            'average_amount': total_amount / expense_count if expense_count > 0 else 0,
+            'date_range': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            }
+        },
+        'category_breakdown': [
+            {
+                'category': category,
+                'display_name': Expense.get_category_display_name(category),
+                'amount': total / 100,
+                'count': count,
+                'percentage': (total / 100 / total_amount * 100) if total_amount > 0 else 0
+            }
+            for category, total, count in _group_totals(columns.categories[mask], cents)
+        ],
+        'payment_method_breakdown': [
+            {
+                'payment_method': method,
+                'amount': total / 100,
+                'count': count,
+                'percentage': (total / 100 / total_amount * 100) if total_amount > 0 else 0
+            }
+            for method, total, count in _group_totals(columns.payment_methods[mask], cents)
+        ]
+    }
+
+def trends_panel(columns, first_month, months):
+    """Monthly totals like /api/analytics/spending-trends, with empty months as zero"""
+    month_index = (columns.dates.astype('datetime64[M]') - np.datetime64(first_month, 'M')).astype(np.int64)
+    in_range = (month_index >= 0) & (month_index < months)
+    totals = np.bincount(month_index[in_range], weights=columns.cents[in_range], minlength=months)
+    
+    trends = []
+    for offset in range(months):
+        index = first_month.year * 12 + first_month.month - 1 + offset
+        year, month = index // 12, index % 12 + 1
+        trends.append({
+            'period': f"{calendar.month_name[month]} {year}",
+            'year': year,
+            'month': month,
+            'total': int(round(totals[offset])) / 100,
+            'date': f"{year}-{month:02d}-01"
+        })
+    
+    return {'trends': trends, 'period': 'monthly', 'months': months}
+
+def categories_panel(columns, start_date, end_date):
+    """Same shape as /api/analytics/category-insights for the current period"""
+    mask = _period_mask(columns, start_date, end_date)
+    groups = _group_totals(columns.categories[mask], columns.cents[mask])
+    total_spending = sum(total for _, total, _ in groups) / 100
+    
+    insights = [
+        {
+            'category': category,
+            'display_name': Expense.get_category_display_name(category),
+            'total': total / 100,
+            'count': count,
+            'percentage': round(total / 100 / total_spending * 100, 2) if total_spending > 0 else 0,
+            'average_per_transaction': total / 100 / count if count > 0 else 0
+        }
+        for category, total, count in groups
+    ]
+    
+    return {
+        'category_breakdown': insights,
+        'summary': {
+            'total_spending': total_spending,
+            'total_categories': len(insights),
+            'top_category': insights[0] if insights else None,
+            'most_frequent_category': max(insights, key=lambda x: x['count']) if insights else None,
+            'date_range': {
+                'start_date': start_date.isoformat(),
+                'end_date': end_date.isoformat()
+            }
+        }
+    }
+
+def budgets_panel(user_id, start_date, end_date):
+    """Same shape as /api/analytics/budget-vs-actual for the current period"""
+    return Budget.get_budget_vs_actual(user_id, start_date, end_date)
+
+def notifications_panel(user_id, limit):
+    """Latest notifications in compact form plus the unread count"""
+    items, next_cursor = Notification.get_notifications_page(user_id, limit=limit, compact=True)
+    return {
+        'notifications': items,
+        'unread_count': get_unread_count(user_id),
+        'next_cursor': next_cursor
+    }
+
+def _timed(func, *args):
+    started = time.perf_counter()
+    return func(*args), round((time.perf_counter() - started) * 1000, 2)
+
+def _timed_in_context(app, func, *args):
+    # Each worker thread gets its own app context and so its own session
+    with app.app_context():
+        return _timed(func, *args)
+
+def build_dashboard(app, user_id, today=None, months=6, notification_limit=5, panels=PANELS):
+    """Assemble the requested dashboard panels from one expense load.
+    
+    The budget and notification panels read their own tables, so they start
+    on the pool while the expense columns load; the expense panels then run
+    side by side over the shared columns. Returns (panels, errors, timings)
+    with timings in milliseconds.
+    """
+    started = time.perf_counter()
+    today = today or date.today()
+    start_date, end_date = month_bounds(today)
+    first_month = months_back(today, months)
+    executor = app.extensions.get('dashboard_executor')
+    
+    # Each pending panel is a callable returning (result, milliseconds)
+    def submit(func, *args, in_context=True):
+        if executor is None:
+            return lambda: _timed(func, *args)
+        # copy_context() carries the request's query stats into the worker
+        if in_context:
+            return executor.submit(copy_context().run, _timed_in_context, app, func, *args).result
+        return executor.submit(copy_context().run, _timed, func, *args).result
+    
+    pending = {}
+    if 'budgets' in panels:
+        pending['budgets'] = submit(budgets_panel, user_id, start_date, end_date)
+    if 'notifications' in panels:
+        pending['notifications'] = submit(notifications_panel, user_id, notification_limit)
+    
+    timings = {}
+    if {'overview', 'trends', 'categories'} & set(panels):
+        columns, timings['load'] = _timed(load_expense_columns, user_id, min(first_month, start_date), end_date)
+        
+        # Pure array work, no database access
+        column_panels = {
+            'overview': (overview_panel, columns, start_date, end_date),
+            'trends': (trends_panel, columns, first_month, months),
+            'categories': (categories_panel, columns, start_date, end_date)
+        }
+        for name, (func, *args) in column_panels.items():
+            if name in panels:
+                pending[name] = submit(func, *args, in_context=False)
+    
+    results = {}
+    errors = {}
+    for name in panels:
+        if name not in pending:
+            continue
+        try:
+            results[name], timings[name] = pending[name]()
+        except Exception as e:
+            results[name] = None
+            errors[name] = str(e)
+    
+    timings['total'] = round((time.perf_counter() - started) * 1000, 2)
+    return results, errors, timings
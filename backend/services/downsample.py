@@ -0,0 +1,104 @@
+import numpy as np
+
+# Above this many (bucket, anchor, candidate) cells the areas are computed one
+# bucket at a time instead of all at once
+_MAX_AREA_CELLS = 4_000_000
+
+def lttb(x, y, max_points, keep_peak=True):
+    """Indices of the points Largest-Triangle-Three-Buckets keeps, in order.
+    
+    The first and last points are always kept and the interior is split into
+    max_points - 2 buckets. From each bucket the point forming the largest
+    triangle with the previous pick and the next bucket's average is kept,
+    which preserves the series' visual shape. With `keep_peak` the bucket
+    holding the series maximum keeps that maximum.
+    
+    The previous pick is always one of the previous bucket's points, so the
+    best candidate for every possible previous pick is computed for all
+    buckets in one broadcast; walking the buckets is then a chain of integer
+    lookups. Very wide buckets fall back to one vectorized step per bucket.
+    """
+    n = len(y)
+    if max_points >= n or max_points < 3:
+        return np.arange(n)
+    
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    
+    # Bucket b covers interior points edges[b]:edges[b + 1]
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.int64)
+    starts = edges[:-1]
+    widths = np.diff(edges)
+    
+    # Average of each bucket; the next bucket's is the third triangle vertex
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    avg_x = (cum_x[edges[1:]] - cum_x[starts]) / widths
+    avg_y = (cum_y[edges[1:]] - cum_y[starts]) / widths
+    next_x = np.append(avg_x[1:], x[-1])
+    next_y = np.append(avg_y[1:], y[-1])
+    
+    peak = int(np.argmax(y)) if keep_peak else -1
+    buckets = len(widths)
+    width = int(widths.max())
+    
+    if buckets * width * width > _MAX_AREA_CELLS:
+        chosen = _lttb_by_bucket(x, y, starts, edges[1:], next_x, next_y, peak)
+    else:
+        chosen = _lttb_broadcast(x, y, starts, widths, width, next_x, next_y, peak)
+    
+    return np.concatenate(([0], chosen, [n - 1]))
+
+def _lttb_broadcast(x, y, starts, widths, width, next_x, next_y, peak):
+    buckets = len(widths)
+    offsets = np.arange(width)
+    valid = offsets[None, :] < widths[:, None]
+    candidates = np.where(valid, starts[:, None] + offsets[None, :], starts[:, None])
+    
+    # Possible previous picks: the first point for bucket 0, else the previous bucket
+    anchors = np.empty_like(candidates)
+    anchors[0] = 0
+    anchors[1:] = candidates[:-1]
+    
+    xa = x[anchors][:, :, None]
+    ya = y[anchors][:, :, None]
+    xc = x[candidates][:, None, :]
+    yc = y[candidates][:, None, :]
+    nx = next_x[:, None, None]
+    ny = next_y[:, None, None]
+    
+    areas = np.abs((xa - nx) * (yc - ya) - (xa - xc) * (ny - ya))
+    areas[~np.broadcast_to(valid[:, None, :], areas.shape)] = -1.0
+    
+    # best[b][p]: offset picked in bucket b when bucket b - 1 picked offset p
+    best = areas.argmax(axis=2).tolist()
+    start_list = starts.tolist()
+    width_list = widths.tolist()
+    
+    chosen = []
+    previous = 0
+    for b in range(buckets):
+        start = start_list[b]
+        if start <= peak < start + width_list[b]:
+            previous = peak - start
+        else:
+            previous = best[b][previous]
+        chosen.append(start + previous)
+    
+    return np.array(chosen, dtype=np.int64)
+
+def _lttb_by_bucket(x, y, starts, ends, next_x, next_y, peak):
+    chosen = np.empty(len(starts), dtype=np.int64)
+    a = 0
+    for b, (start, end) in enumerate(zip(starts.tolist(), ends.tolist())):
+        if start <= peak < end:
+            a = peak
+        else:
+            areas = np.abs(
+                (x[a] - next_x[b]) * (y[start:end] - y[a])
+                - (x[a] - x[start:end]) * (next_y[b] - y[a])
+            )
+            a = start + int(np.argmax(areas))
+        chosen[b] = a
+    
+    return chosen
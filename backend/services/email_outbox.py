@@ -0,0 +1,179 @@
+from app import db, mail
+from models.notification import Notification
+from models.user import User
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from flask import current_app
+from flask_mail import Message
+from sqlalchemy import update
+import queue
+import smtplib
+import time
+
+# Errors after which the SMTP connection is dropped and reopened
+_CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, OSError)
+
+class SMTPConnectionPool:
+    """Open Flask-Mail connections kept between sends and outbox runs"""
+    
+    def __init__(self, size):
+        self.size = size
+        self._idle = queue.LifoQueue(maxsize=size)
+    
+    def acquire(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return mail.connect().__enter__()
+    
+    def release(self, connection):
+        try:
+            self._idle.put_nowait(connection)
+        except queue.Full:
+            self.discard(connection)
+    
+    def discard(self, connection):
+        try:
+            connection.__exit__(None, None, None)
+        except Exception:
+            pass
+    
+    def close(self):
+        while True:
+            try:
+                self.discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+def _get_pool(app):
+    pool = app.extensions.get('smtp_pool')
+    if pool is None:
+        pool = app.extensions['smtp_pool'] = SMTPConnectionPool(app.config['EMAIL_OUTBOX_CONCURRENCY'])
+    return pool
+
+def build_message(notification_id, email, title, body):
+    """Build the email for one notification"""
+    message = Message(
+        subject=title,
+        recipients=[email],
+        body=body,
+        sender=current_app.config['MAIL_DEFAULT_SENDER']
+    )
+    message.extra_headers = {'X-Notification-Id': str(notification_id)}
+    return message
+
+def _send_chunk(app, pool, items):
+    """Send messages over one pooled connection; returns (sent, refused, failed) ids"""
+    retries = app.config['EMAIL_OUTBOX_MAX_RETRIES']
+    backoff = app.config['EMAIL_OUTBOX_RETRY_BACKOFF']
+    sent_ids, refused_ids, failed_ids = [], [], []
+    
+    with app.app_context():
+        connection = None
+        for notification_id, email, title, body in items:
+            message = build_message(notification_id, email, title, body)
+            
+            for attempt in range(retries + 1):
+                try:
+                    if connection is None:
+                        connection = pool.acquire()
+                    connection.send(message)
+                    sent_ids.append(notification_id)
+                    break
+                except smtplib.SMTPRecipientsRefused as e:
+                    # Permanent for this address; retrying will not help
+                    print(f"Email for notification {notification_id} refused: {e}")
+                    refused_ids.append(notification_id)
+                    break
+                except _CONNECTION_ERRORS + (smtplib.SMTPException,) as e:
+                    if connection is not None:
+                        pool.discard(connection)
+                        connection = None
+                    
+                    if attempt == retries:
+                        print(f"Email for notification {notification_id} failed: {e}")
+                        failed_ids.append(notification_id)
+                    else:
+                        time.sleep(backoff * (2 ** attempt))
+        
+        if connection is not None:
+            pool.release(connection)
+    
+    return sent_ids, refused_ids, failed_ids
+
+def _claim_batch(after_id, batch_size, max_age, max_attempts):
+    """Next unsent notifications of users who want email, oldest first"""
+    query = db.session.query(
+        Notification.id,
+        User.email,
+        Notification.title,
+        Notification.message
+    ).join(
+        User, User.id == Notification.user_id
+    ).filter(
+        Notification.is_sent == False,
+        Notification.id > after_id,
+        Notification.email_attempts < max_attempts,
+        Notification.created_at >= datetime.utcnow() - max_age,
+        User.email_notifications == True
+    ).order_by(Notification.id).limit(batch_size)
+    
+    # Lets several outbox workers share the table on PostgreSQL/MySQL
+    return query.with_for_update(skip_locked=True, of=Notification).all()
+
+def run_email_outbox(max_batches=None):
+    """Email unsent notifications in batches; returns how many were sent.
+    
+    Each batch is split across EMAIL_OUTBOX_CONCURRENCY threads that each
+    send over a pooled SMTP connection, retrying with exponential backoff.
+    Sent rows are then flagged with one UPDATE per batch. Each run that
+    fails to send a row counts an attempt, and a refused address uses them
+    all up, so rows past EMAIL_OUTBOX_MAX_ATTEMPTS are no longer picked up.
+    """
+    app = current_app._get_current_object()
+    if not app.config.get('ENABLE_EMAIL_NOTIFICATIONS'):
+        return 0
+    
+    batch_size = app.config['EMAIL_OUTBOX_BATCH_SIZE']
+    concurrency = app.config['EMAIL_OUTBOX_CONCURRENCY']
+    max_age = timedelta(hours=app.config['EMAIL_OUTBOX_MAX_AGE_HOURS'])
+    max_attempts = app.config['EMAIL_OUTBOX_MAX_ATTEMPTS']
+    pool = _get_pool(app)
+    
+    total_sent = 0
+    after_id = 0
+    batches = 0
+    
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='email-outbox') as executor:
+        while max_batches is None or batches < max_batches:
+            rows = _claim_batch(after_id, batch_size, max_age, max_attempts)
+            if not rows:
+                db.session.commit()
+                break
+            
+            after_id = rows[-1][0]
+            batches += 1
+            
+            items = [tuple(row) for row in rows]
+            chunks = [items[i::concurrency] for i in range(concurrency) if items[i::concurrency]]
+            sent_ids, refused_ids, failed_ids = [], [], []
+            for sent, refused, failed in executor.map(lambda chunk: _send_chunk(app, pool, chunk), chunks):
+                sent_ids.extend(sent)
+                refused_ids.extend(refused)
+                failed_ids.extend(failed)
+            
+            for ids, values in (
+                (sent_ids, {'is_sent': True}),
+                (refused_ids, {'email_attempts': max_attempts}),
+                (failed_ids, {'email_attempts': Notification.email_attempts + 1})
+            ):
+                if ids:
+                    db.session.execute(
+                        update(Notification).where(
+                            Notification.id.in_(ids)
+                        ).values(**values).execution_options(synchronize_session=False)
+                    )
+            db.session.commit()
+            total_sent += len(sent_ids)
+    
+    return total_sent
@@ -0,0 +1,70 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+def _is_memory(url):
+    return url.database in (None, '', ':memory:')
+
+def engine_options(config):
+    """Engine options suited to the configured database's dialect; SQLALCHEMY_ENGINE_OPTIONS overrides them"""
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    backend = url.get_backend_name()
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS') or 0
+    
+    if backend == 'sqlite':
+        # Flask-SQLAlchemy shares one connection for in-memory databases; local
+        # files never go stale, so no recycling or pre-ping
+        options = {} if _is_memory(url) else {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT']
+        }
+    else:
+        options = {
+            'pool_size': config['DB_POOL_SIZE'],
+            'max_overflow': config['DB_MAX_OVERFLOW'],
+            'pool_timeout': config['DB_POOL_TIMEOUT'],
+            'pool_recycle': config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True
+        }
+        # Set at connect time so the timeout survives the pool's rollbacks
+        if timeout and backend == 'postgresql':
+            options['connect_args'] = {'options': f'-c statement_timeout={int(timeout)}'}
+        elif timeout and backend == 'mysql':
+            # MySQL 5.7.8+ (SELECTs only); MariaDB wants DB_STATEMENT_TIMEOUT_MS=0
+            options['connect_args'] = {'init_command': f'SET SESSION max_execution_time={int(timeout)}'}
+    
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    return options
+
+def sqlite_pragmas(config):
+    """PRAGMA statements run on every new SQLite connection"""
+    return [
+        # WAL lets readers carry on while a writer commits; NORMAL only syncs at checkpoints in WAL mode
+        f"PRAGMA journal_mode={config['SQLITE_JOURNAL_MODE']}",
+        f"PRAGMA synchronous={config['SQLITE_SYNCHRONOUS']}",
+        f"PRAGMA busy_timeout={int(config['SQLITE_BUSY_TIMEOUT_MS'])}",
+        # Negative cache_size is in KiB
+        f"PRAGMA cache_size={-int(config['SQLITE_CACHE_SIZE_MB']) * 1024}",
+        f"PRAGMA mmap_size={int(config['SQLITE_MMAP_SIZE_MB']) * 1024 * 1024}"
+    ]
+
+def init_engine_profiles(app):
+    """Apply per-connection settings to the app's SQLite engines"""
+    with app.app_context():
+        from app import db
+        for engine in db.engines.values():
+            if engine.dialect.name != 'sqlite' or getattr(engine, '_pragmas_applied', False):
+                continue
+            
+            pragmas = sqlite_pragmas(app.config)
+            
+            def apply_pragmas(dbapi_connection, connection_record, pragmas=pragmas):
+                cursor = dbapi_connection.cursor()
+                try:
+                    for pragma in pragmas:
+                        cursor.execute(pragma)
+                finally:
+                    cursor.close()
+            
+            event.listen(engine, 'connect', apply_pragmas)
+            engine._pragmas_applied = True
@@ -0,0 +1,181 @@
+import csv
+import logging
+import os
+import threading
+from datetime import date
+import numpy as np
+from flask import current_app, has_app_context
+
+logger = logging.getLogger('fx')
+
+class MissingFxRate(ValueError):
+    """No exchange rate is known for a currency being converted"""
+
+class FxTable:
+    """Daily exchange rates as one numpy row per currency, indexed by day.
+    
+    rates[c, d] is how many units of currency c one unit of the base currency
+    bought on day first_day + d. Days without a published rate (weekends,
+    holidays) carry the last known rate forward; days outside the table use
+    its first or last day.
+    """
+    
+    def __init__(self, base, first_day, currencies, rates, published_from=None):
+        self.base = base
+        self.first_day = first_day
+        self.rows = {currency: row for row, currency in enumerate(currencies)}
+        self.rates = rates
+        # First day each currency has a published rate; earlier days are back-filled
+        self.published_from = published_from or {currency: first_day for currency in currencies}
+    
+    @property
+    def last_day(self):
+        return self.first_day + self.rates.shape[1] - 1
+    
+    @classmethod
+    def from_rows(cls, base, rows):
+        """Build from (date, currency, units per base) rows in any order"""
+        rows = [(day.toordinal(), currency.upper(), float(rate)) for day, currency, rate in rows]
+        currencies = sorted({currency for _, currency, _ in rows} | {base})
+        rows_by_currency = {currency: row for row, currency in enumerate(currencies)}
+        
+        if rows:
+            first_day = min(day for day, _, _ in rows)
+            days = max(day for day, _, _ in rows) - first_day + 1
+        else:
+            first_day, days = date.today().toordinal(), 1
+        
+        rates = np.full((len(currencies), days), np.nan)
+        for day, currency, rate in rows:
+            rates[rows_by_currency[currency], day - first_day] = rate
+        rates[rows_by_currency[base]] = 1.0
+        
+        # Forward-fill each currency from its last published day, then back-fill
+        # the days before its first one
+        published = ~np.isnan(rates)
+        last = np.maximum.accumulate(np.where(published, np.arange(days), 0), axis=1)
+        rates = np.take_along_axis(rates, last, axis=1)
+        first = published.argmax(axis=1)
+        leading = np.arange(days)[None, :] < first[:, None]
+        rates = np.where(leading, rates[np.arange(len(currencies)), first][:, None], rates)
+        
+        published_from = {currency: first_day + int(first[row]) for row, currency in enumerate(currencies)}
+        return cls(base, first_day, currencies, rates, published_from)
+    
+    @classmethod
+    def load(cls, path, base):
+        """Load a CSV file with date (YYYY-MM-DD), currency and rate columns"""
+        with open(path, newline='') as handle:
+            return cls.from_rows(base, [
+                (date.fromisoformat(row['date']), row['currency'], row['rate'])
+                for row in csv.DictReader(handle)
+            ])
+    
+    def _row(self, currency):
+        row = self.rows.get(currency)
+        if row is None:
+            raise MissingFxRate(f"No exchange rate for {currency}")
+        return row
+    
+    def covers(self, currency, day, grace_days=0):
+        """Whether a rate was published for currency on or before `day` and the table runs to within grace_days of it"""
+        if currency not in self.rows:
+            return False
+        return self.published_from[currency] <= day.toordinal() <= self.last_day + grace_days
+    
+    def convert_cents(self, cents, days, codes, names, target):
+        """Convert cents spent on the given day ordinals into the target currency.
+        
+        Each row's currency is names[codes[i]]. Rates for all rows are looked
+        up at once and results rounded to whole cents.
+        """
+        codes = np.asarray(codes, dtype=np.intp)
+        source_rows = np.zeros(len(names), dtype=np.intp)
+        for code in np.unique(codes).tolist():
+            source_rows[code] = self._row(names[code])
+        
+        day_index = np.clip(np.asarray(days, dtype=np.int64) - self.first_day, 0, self.rates.shape[1] - 1)
+        factors = self.rates[self._row(target), day_index] / self.rates[source_rows[codes], day_index]
+        return np.rint(np.asarray(cents) * factors).astype(np.int64)
+
+_table = None
+_table_key = None
+_table_lock = threading.Lock()
+
+def get_fx_table():
+    """The configured FX table, reloaded when its file changes; None if there is no file"""
+    global _table, _table_key
+    path = current_app.config.get('FX_RATES_FILE') if has_app_context() else None
+    if not path or not os.path.exists(path):
+        return None
+    
+    key = (path, os.stat(path).st_mtime_ns)
+    if key != _table_key:
+        with _table_lock:
+            if key != _table_key:
+                _table = FxTable.load(path, current_app.config.get('FX_BASE_CURRENCY', 'USD'))
+                _table_key = key
+    return _table
+
+def convert_cents(cents, days, codes, names, target):
+    """Convert cents in mixed currencies into one, using the configured FX table"""
+    table = get_fx_table()
+    if table is None:
+        used = sorted({names[code] for code in np.unique(codes).tolist()})
+        raise MissingFxRate(f"No exchange rates are configured to convert {', '.join(used)} to {target}")
+    return table.convert_cents(cents, days, codes, names, target)
+
+def convertible(currencies, target):
+    """The currencies among `currencies` that can be converted into target"""
+    table = get_fx_table()
+    if table is None or target not in table.rows:
+        return {currency for currency in currencies if currency == target}
+    return {currency for currency in currencies if currency == target or currency in table.rows}
+
+def warn_unconvertible(currencies, target):
+    if currencies:
+        logger.warning('No exchange rate to convert %s to %s; leaving those expenses out', ', '.join(sorted(currencies)), target)
+
+def check_convertible(currency, day, target):
+    """Raise MissingFxRate unless an expense in `currency` on `day` can be converted into target.
+    
+    Expenses are checked when written, so reads only meet currencies without
+    rates if the rates file changes afterwards.
+    """
+    if currency is None or currency == target:
+        return
+    table = get_fx_table()
+    if table is None:
+        raise MissingFxRate(f"No exchange rates are configured; record expenses in {target}")
+    
+    grace_days = current_app.config.get('FX_RATES_GRACE_DAYS', 7)
+    for code in (currency, target):
+        if code not in table.rows:
+            raise MissingFxRate(f"No exchange rate for {code}")
+        if not table.covers(code, day, grace_days):
+            raise MissingFxRate(f"No {code} exchange rate for {day.isoformat()}")
+
+def convert_amounts(cents, days, currencies, target):
+    """Convert cents, each in its own currency (None: already target) on its own day ordinal, into target.
+    
+    Returns a list aligned with the input and holding None where no rate is
+    known; callers leave those amounts out rather than fail the request.
+    """
+    results = [amount if currency is None or currency == target else None
+               for amount, currency in zip(cents, currencies)]
+    pending = [i for i, amount in enumerate(results) if amount is None]
+    if not pending:
+        return results
+    
+    names = sorted(convertible({currencies[i] for i in pending}, target))
+    warn_unconvertible({currencies[i] for i in pending} - set(names), target)
+    
+    rows = [i for i in pending if currencies[i] in names]
+    if rows:
+        codes = {name: code for code, name in enumerate(names)}
+        converted = get_fx_table().convert_cents(
+            [cents[i] for i in rows], [days[i] for i in rows], [codes[currencies[i]] for i in rows], names, target
+        )
+        for i, amount in zip(rows, converted.tolist()):
+            results[i] = amount
+    return results
@@ -0,0 +1,399 @@
+from array import array
+from collections import OrderedDict
+from datetime import date
+import threading
+import time
+import numpy as np
+from flask import current_app
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from models.expense import Expense
+from models.user import User
+from services.fx import convert_cents, convertible, warn_unconvertible
+from services.metrics import record_cache_lookup
+
+# date.toordinal() of 1970-01-01, where datetime64[D] counts from
+_EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+class _Codes:
+    """Small integer codes for a shared, slowly growing set of strings"""
+    
+    def __init__(self, values):
+        self.values = list(values)
+        self._codes = {value: code for code, value in enumerate(self.values)}
+        self._lock = threading.Lock()
+    
+    def code(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            with self._lock:
+                code = self._codes.get(value)
+                if code is None:
+                    code = self._codes[value] = len(self.values)
+                    self.values.append(value)
+        return code
+    
+    def names(self, codes):
+        return np.array(self.values, dtype=object)[codes]
+
+# Shared by every ledger; unexpected legacy values are appended on first sight
+CATEGORY_CODES = _Codes(Expense.VALID_CATEGORIES)
+PAYMENT_METHOD_CODES = _Codes([None] + Expense.VALID_PAYMENT_METHODS)
+
+# Code 0 is None: the expense is in its owner's currency
+CURRENCY_CODES = _Codes([None])
+
+class LedgerView:
+    """A copy of a ledger's columns, newest first, optionally limited to a date range.
+    
+    `cents` are in `currency`, the owner's currency, once convert() has run;
+    expenses recorded in another currency keep their code in `currencies`.
+    """
+    
+    def __init__(self, ids, cents, days, categories, payment_methods, tags, locations, currencies,
+                 tag_values, location_values, currency):
+        self.ids = ids
+        self.cents = cents
+        self.days = days
+        self.categories = categories
+        self.payment_methods = payment_methods
+        self.tags = tags
+        self.locations = locations
+        self.currencies = currencies
+        self.tag_values = tag_values
+        self.location_values = location_values
+        self.currency = currency
+    
+    def convert(self):
+        """Convert expenses recorded in other currencies into the owner's, in one vectorized pass.
+        
+        Expenses in a currency without rates (the rates file changed after they
+        were written) are left out with a warning instead of failing the read.
+        """
+        own = CURRENCY_CODES.code(self.currency)
+        foreign = (self.currencies != 0) & (self.currencies != own)
+        if foreign.any():
+            codes = np.unique(self.currencies[foreign]).tolist()
+            usable = convertible({CURRENCY_CODES.values[code] for code in codes}, self.currency)
+            unusable = [code for code in codes if CURRENCY_CODES.values[code] not in usable]
+            if unusable:
+                warn_unconvertible({CURRENCY_CODES.values[code] for code in unusable}, self.currency)
+                self._keep(~np.isin(self.currencies, unusable))
+                foreign = (self.currencies != 0) & (self.currencies != own)
+        if foreign.any():
+            self.cents[foreign] = convert_cents(
+                self.cents[foreign], self.days[foreign], self.currencies[foreign],
+                CURRENCY_CODES.values, self.currency
+            )
+        return self
+    
+    def _keep(self, mask):
+        for name in ('ids', 'cents', 'days', 'categories', 'payment_methods', 'tags', 'locations', 'currencies'):
+            setattr(self, name, getattr(self, name)[mask])
+    
+    def __len__(self):
+        return len(self.ids)
+    
+    @property
+    def dates(self):
+        return (self.days - _EPOCH_ORDINAL).astype('datetime64[D]')
+    
+    @property
+    def amounts(self):
+        return self.cents / 100
+    
+    def total_cents(self):
+        return int(self.cents.sum())
+    
+    def category_names(self):
+        return CATEGORY_CODES.names(self.categories)
+    
+    def payment_method_names(self):
+        return PAYMENT_METHOD_CODES.names(self.payment_methods)
+    
+    def tag_names(self):
+        return np.array(self.tag_values, dtype=object)[self.tags]
+    
+    def location_names(self):
+        return np.array(self.location_values, dtype=object)[self.locations]
+    
+    def group_totals(self, by):
+        """(label, cents, count) per category or payment method, largest total first"""
+        if by == 'category':
+            codes, table = self.categories, CATEGORY_CODES.values
+        elif by == 'payment_method':
+            codes, table = self.payment_methods, PAYMENT_METHOD_CODES.values
+        else:
+            raise ValueError(f"Cannot group by '{by}'")
+        
+        totals = np.bincount(codes, weights=self.cents, minlength=len(table))
+        counts = np.bincount(codes, minlength=len(table))
+        order = [code for code in np.argsort(-totals, kind='stable').tolist() if counts[code]]
+        return [(table[code], int(round(totals[code])), int(counts[code])) for code in order]
+
+class UserLedger:
+    """One user's expenses as parallel typed arrays, 34 bytes per expense"""
+    
+    def __init__(self, currency='USD'):
+        self.currency = currency
+        self.ids = array('q')
+        self.cents = array('q')
+        self.days = array('i')
+        self.categories = array('H')
+        self.payment_methods = array('H')
+        self.tags = array('i')
+        self.locations = array('i')
+        self.currencies = array('H')
+        
+        # Per-user interned strings; code 0 is None
+        self.tag_values = [None]
+        self.location_values = [None]
+        self._tag_codes = {None: 0}
+        self._location_codes = {None: 0}
+    
+    @classmethod
+    def load(cls, user_id):
+        """Build a user's ledger from one query over the needed columns"""
+        expenses = Expense.__table__
+        rows = db.session.execute(
+            select(
+                expenses.c.id, expenses.c.amount_cents, expenses.c.date, expenses.c.category,
+                expenses.c.payment_method, expenses.c.tags, expenses.c.location, expenses.c.currency
+            ).where(expenses.c.user_id == user_id).order_by(expenses.c.date, expenses.c.id)
+        ).all()
+        currency = db.session.execute(
+            select(User.__table__.c.currency).where(User.__table__.c.id == user_id)
+        ).scalar()
+        
+        ledger = cls(currency or 'USD')
+        for row in rows:
+            ledger.append(*row)
+        return ledger
+    
+    def append(self, expense_id, cents, expense_date, category, payment_method, tags, location, currency):
+        self.ids.append(expense_id)
+        self.cents.append(cents)
+        self.days.append(expense_date.toordinal())
+        self.categories.append(CATEGORY_CODES.code(category))
+        self.payment_methods.append(PAYMENT_METHOD_CODES.code(payment_method))
+        self.tags.append(self._intern(tags, self.tag_values, self._tag_codes))
+        self.locations.append(self._intern(location, self.location_values, self._location_codes))
+        self.currencies.append(CURRENCY_CODES.code(currency))
+    
+    def remove(self, expense_id):
+        """Remove an expense by moving the last row into its place"""
+        try:
+            position = self.ids.index(expense_id)
+        except ValueError:
+            return
+        
+        for column in self._columns():
+            column[position] = column[-1]
+            column.pop()
+    
+    def put(self, expense_id, *values):
+        self.remove(expense_id)
+        self.append(expense_id, *values)
+    
+    def view(self, start_date=None, end_date=None):
+        """Copy of the columns for expenses between two dates inclusive"""
+        columns = [np.frombuffer(column, dtype=column.typecode) if len(column) else np.array([], dtype=column.typecode)
+                   for column in self._columns()]
+        ids, cents, days, categories, payment_methods, tags, locations, currencies = columns
+        
+        mask = np.ones(len(ids), dtype=bool)
+        if start_date is not None:
+            mask &= days >= start_date.toordinal()
+        if end_date is not None:
+            mask &= days <= end_date.toordinal()
+        
+        # Newest first, as Expense.get_expenses_by_user returns them; fancy
+        # indexing copies, so the arrays can keep growing after this returns
+        rows = np.flatnonzero(mask)
+        rows = rows[np.lexsort((-ids[rows], -days[rows]))]
+        view = LedgerView(
+            ids[rows], cents[rows], days[rows], categories[rows].astype(np.intp),
+            payment_methods[rows].astype(np.intp), tags[rows], locations[rows], currencies[rows].astype(np.intp),
+            list(self.tag_values), list(self.location_values), self.currency
+        )
+        del columns, ids, cents, days, categories, payment_methods, tags, locations, currencies
+        return view
+    
+    @property
+    def nbytes(self):
+        strings = sum(len(value) for value in self.tag_values[1:]) + sum(len(value) for value in self.location_values[1:])
+        return sum(column.itemsize * len(column) for column in self._columns()) + strings
+    
+    def _columns(self):
+        return (
+            self.ids, self.cents, self.days, self.categories, self.payment_methods,
+            self.tags, self.locations, self.currencies
+        )
+    
+    @staticmethod
+    def _intern(value, values, codes):
+        code = codes.get(value)
+        if code is None:
+            code = codes[value] = len(values)
+            values.append(value)
+        return code
+
+class LedgerCache:
+    """Per-user ledgers, updated on commit and evicted LRU past a memory cap"""
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loading = {}
+        self._lock = threading.Lock()
+    
+    def view(self, user_id, start_date=None, end_date=None):
+        """Columns of the user's expenses in a date range, loading the ledger on a miss"""
+        user_id = int(user_id)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                record_cache_lookup('ledger', True)
+                return entry[0].view(start_date, end_date)
+            # [loaders in flight, generation]; commits bump the generation
+            loading = self._loading.setdefault(user_id, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+        
+        record_cache_lookup('ledger', False)
+        try:
+            ledger = UserLedger.load(user_id)
+        except Exception:
+            with self._lock:
+                self._finish_load(user_id, generation)
+            raise
+        
+        with self._lock:
+            # A commit landed while loading; serve this ledger once but don't keep it
+            if self._finish_load(user_id, generation):
+                self._drop(user_id)
+                self._entries[user_id] = (ledger, now, ledger.nbytes)
+                self._bytes += ledger.nbytes
+                while self._bytes > self.max_bytes and len(self._entries) > 1:
+                    self._drop(next(iter(self._entries)))
+            return ledger.view(start_date, end_date)
+    
+    def apply(self, changes):
+        """Apply committed ('put', user_id, expense_id, values), ('delete', user_id, expense_id)
+        or ('invalidate', user_id) changes"""
+        with self._lock:
+            for change in changes:
+                user_id = int(change[1])
+                if user_id in self._loading:
+                    self._loading[user_id][1] += 1
+                
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                if change[0] == 'invalidate':
+                    self._drop(user_id)
+                    continue
+                if change[0] == 'put':
+                    entry[0].put(change[2], *change[3])
+                else:
+                    entry[0].remove(change[2])
+                
+                # Re-measure so appends count against the cap
+                self._bytes += entry[0].nbytes - entry[2]
+                self._entries[user_id] = (entry[0], entry[1], entry[0].nbytes)
+    
+    def invalidate(self, user_id=None):
+        """Drop one user's ledger, or every ledger when no user is given"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._bytes = 0
+                for loading in self._loading.values():
+                    loading[1] += 1
+            else:
+                user_id = int(user_id)
+                self._drop(user_id)
+                if user_id in self._loading:
+                    self._loading[user_id][1] += 1
+    
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+    
+    def _finish_load(self, user_id, generation):
+        # Called with the lock held; False if a commit landed since the load began
+        loading = self._loading[user_id]
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[user_id]
+        return loading[1] == generation
+    
+    def _drop(self, user_id):
+        # Called with the lock held
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = LedgerCache(
+                    max_bytes=current_app.config.get('LEDGER_CACHE_MAX_MB', 64) * 1024 * 1024,
+                    ttl=current_app.config.get('LEDGER_CACHE_TTL', 300)
+                )
+    return _cache
+
+def get_ledger_view(user_id, start_date=None, end_date=None):
+    """Get a user's expenses between two dates as compact columns, in the user's currency"""
+    return _get_cache().view(user_id, start_date, end_date).convert()
+
+def invalidate_ledger(user_id=None):
+    """Forget cached ledgers after expenses change outside the ORM"""
+    if _cache is not None:
+        _cache.invalidate(user_id)
+
+def _record(target, change):
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault('ledger_changes', []).append(change)
+
+@event.listens_for(Expense, 'after_insert')
+@event.listens_for(Expense, 'after_update')
+def _expense_written(mapper, connection, target):
+    _record(target, ('put', target.user_id, target.id, (
+        target.amount_cents, target.date, target.category, target.payment_method, target.tags, target.location,
+        target.currency
+    )))
+
+@event.listens_for(Expense, 'after_delete')
+def _expense_deleted(mapper, connection, target):
+    _record(target, ('delete', target.user_id, target.id))
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    # Ledgers are converted into the owner's currency; reload after it changes
+    if get_history(target, 'currency').has_changes():
+        _record(target, ('invalidate', target.id))
+
+# Changes reach the cache only once committed, so readers never see rolled-back expenses
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changes = session.info.pop('ledger_changes', None)
+    if changes and _cache is not None:
+        _cache.apply(changes)
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('ledger_changes', None)
@@ -0,0 +1,140 @@
+from contextlib import contextmanager
+import hmac
+import os
+import time
+from flask import request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+
+# Under gunicorn each worker writes its samples to PROMETHEUS_MULTIPROC_DIR and
+# /api/metrics adds them up; gauges say how workers combine ('livesum' drops
+# workers that have exited)
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by route',
+    ['blueprint', 'endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'http_requests_in_progress', 'Requests being handled', ['method'], multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUT = Histogram(
+    'db_pool_checkout_seconds', 'Time spent waiting for a pooled database connection',
+    buckets=(0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Database connections currently checked out', multiprocess_mode='livesum'
+)
+CACHE_LOOKUPS = Counter(
+    'cache_lookups_total', 'In-process cache lookups by outcome (hit or miss)', ['cache', 'result']
+)
+SOCKETIO_CLIENTS = Gauge(
+    'socketio_connected_clients', 'Open Socket.IO connections', multiprocess_mode='livesum'
+)
+TASK_QUEUE_DEPTH = Gauge(
+    'task_queue_depth', 'Background tasks waiting for a thread-backend worker', multiprocess_mode='livesum'
+)
+PASSWORD_HASHES_IN_PROGRESS = Gauge(
+    'password_hashes_in_progress', 'Password hashes and checks running', ['operation'], multiprocess_mode='livesum'
+)
+PASSWORD_HASH_SECONDS = Histogram(
+    'password_hash_seconds', 'Time to hash or check a password', ['operation'],
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5)
+)
+
+def record_cache_lookup(cache, hit):
+    CACHE_LOOKUPS.labels(cache, 'hit' if hit else 'miss').inc()
+
+@contextmanager
+def track_password_hash(operation):
+    """Count a password hash or check while it runs, and time it.
+    
+    Hashing is deliberately slow, so concurrent hashes are what saturate a
+    worker's threads during a login burst.
+    """
+    gauge = PASSWORD_HASHES_IN_PROGRESS.labels(operation)
+    gauge.inc()
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        PASSWORD_HASH_SECONDS.labels(operation).observe(time.perf_counter() - started)
+        gauge.dec()
+
+def task_queued():
+    TASK_QUEUE_DEPTH.inc()
+
+def task_started():
+    TASK_QUEUE_DEPTH.dec()
+
+def socket_connected():
+    SOCKETIO_CLIENTS.inc()
+
+def socket_disconnected():
+    SOCKETIO_CLIENTS.dec()
+
+def instrument_engine(engine):
+    """Time connection checkouts and count connections in use for an engine's pool"""
+    from sqlalchemy import event
+    
+    pool = engine.pool
+    if getattr(pool, '_metrics_instrumented', False):
+        return
+    
+    # Pools have no "checkout requested" event, so time the pool's own getter
+    get_connection = pool._do_get
+    
+    def timed_get():
+        started = time.perf_counter()
+        try:
+            return get_connection()
+        finally:
+            DB_POOL_CHECKOUT.observe(time.perf_counter() - started)
+    
+    pool._do_get = timed_get
+    pool._metrics_instrumented = True
+    event.listen(pool, 'checkout', lambda *args: DB_POOL_CHECKED_OUT.inc())
+    event.listen(pool, 'checkin', lambda *args: DB_POOL_CHECKED_OUT.dec())
+
+def render_metrics():
+    """(body, content type) in the Prometheus text format, summed over workers in multiprocess mode"""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+def is_authorized(app):
+    """Whether the request may read metrics; open unless METRICS_TOKEN is set"""
+    token = app.config.get('METRICS_TOKEN')
+    if not token:
+        return True
+    return hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+
+def init_metrics(app):
+    """Time every request by route and count those in flight"""
+    with app.app_context():
+        from app import db
+        for engine in db.engines.values():
+            instrument_engine(engine)
+    
+    @app.before_request
+    def start_request_metrics():
+        REQUESTS_IN_PROGRESS.labels(request.method).inc()
+        request.environ['metrics.started'] = time.perf_counter()
+    
+    @app.after_request
+    def record_request_metrics(response):
+        started = request.environ.get('metrics.started')
+        if started is not None:
+            endpoint = request.endpoint or 'unmatched'
+            REQUEST_LATENCY.labels(
+                request.blueprint or '', endpoint, request.method, str(response.status_code)
+            ).observe(time.perf_counter() - started)
+        return response
+    
+    @app.teardown_request
+    def finish_request_metrics(exc=None):
+        if request.environ.pop('metrics.started', None) is not None:
+            REQUESTS_IN_PROGRESS.labels(request.method).dec()
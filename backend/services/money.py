@@ -0,0 +1,15 @@
+from decimal import Decimal, ROUND_HALF_UP
+
+def to_cents(amount):
+    """Convert a money amount (float, Decimal, str or None) to integer cents"""
+    if amount is None:
+        return 0
+    return int((Decimal(str(amount)) * 100).quantize(Decimal('1'), rounding=ROUND_HALF_UP))
+
+def from_cents(cents):
+    """Convert integer cents to a float amount for JSON responses"""
+    return (cents or 0) / 100
+
+def cents_to_decimal(cents):
+    """Convert integer cents to an exact two-place Decimal"""
+    return Decimal(cents or 0).scaleb(-2)
@@ -0,0 +1,100 @@
+from sqlalchemy import inspect, text
+
+# (table, Numeric column, BigInteger cents column replacing it)
+MONEY_COLUMNS = (
+    ('expenses', 'amount', 'amount_cents'),
+    ('budgets', 'amount', 'amount_cents'),
+    ('budget_period_snapshots', 'budget_amount', 'budget_amount_cents')
+)
+
+# (table, column, SQL type) added since databases were first created
+ADDED_COLUMNS = (
+    ('expenses', 'currency', 'VARCHAR(3)'),
+    ('users', 'unread_notification_count', 'INTEGER NOT NULL DEFAULT 0'),
+    ('budgets', 'spent_cents', 'BIGINT NOT NULL DEFAULT 0'),
+    ('notifications', 'email_attempts', 'INTEGER NOT NULL DEFAULT 0'),
+)
+
+# (table, index name, columns) unique constraints added since databases were first created
+ADDED_UNIQUE_INDEXES = (
+    ('budgets', 'uq_budget_period_start', ('user_id', 'category', 'period', 'start_date')),
+)
+
+def migrate_money_to_cents(engine):
+    """Convert an existing database's Numeric money columns to integer cents.
+    
+    Each cents column is added, backfilled with ROUND(amount * 100) and the
+    old column dropped, all in one transaction. Tables already converted are
+    skipped, so running it again is harmless. Returns the converted columns.
+    """
+    inspector = inspect(engine)
+    integer_type = 'SIGNED' if engine.dialect.name == 'mysql' else 'BIGINT'
+    converted = []
+    
+    with engine.begin() as connection:
+        for table, old_column, new_column in MONEY_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            
+            columns = {column['name'] for column in inspector.get_columns(table)}
+            if old_column not in columns:
+                continue
+            
+            if new_column not in columns:
+                connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {new_column} BIGINT NOT NULL DEFAULT 0'))
+            connection.execute(text(
+                f'UPDATE {table} SET {new_column} = CAST(ROUND({old_column} * 100) AS {integer_type})'
+            ))
+            connection.execute(text(f'ALTER TABLE {table} DROP COLUMN {old_column}'))
+            converted.append(f'{table}.{old_column}')
+    
+    return converted
+
+def add_missing_columns(engine):
+    """Add columns missing from an existing database; returns those added as 'table.column'"""
+    inspector = inspect(engine)
+    added = []
+    
+    with engine.begin() as connection:
+        for table, column, column_type in ADDED_COLUMNS:
+            if not inspector.has_table(table):
+                continue
+            if column in {existing['name'] for existing in inspector.get_columns(table)}:
+                continue
+            
+            connection.execute(text(f'ALTER TABLE {table} ADD COLUMN {column} {column_type}'))
+            added.append(f'{table}.{column}')
+    
+    return added
+
+def add_missing_unique_indexes(engine):
+    """Add unique indexes missing from an existing database.
+    
+    Returns (added, blocked): blocked maps an index to the number of duplicate
+    groups that stop it being created; those rows are left for a person to
+    resolve rather than deleted.
+    """
+    inspector = inspect(engine)
+    added, blocked = [], {}
+    
+    with engine.begin() as connection:
+        for table, name, columns in ADDED_UNIQUE_INDEXES:
+            if not inspector.has_table(table):
+                continue
+            existing = [constraint['column_names'] for constraint in inspector.get_unique_constraints(table)]
+            existing += [index['column_names'] for index in inspector.get_indexes(table) if index['unique']]
+            if any(set(names) == set(columns) for names in existing):
+                continue
+            
+            column_list = ', '.join(columns)
+            duplicates = connection.execute(text(
+                f'SELECT COUNT(*) FROM (SELECT 1 FROM {table} GROUP BY {column_list} HAVING COUNT(*) > 1) duplicates'
+            )).scalar()
+            if duplicates:
+                blocked[f'{table}.{name}'] = duplicates
+                continue
+            
+            connection.execute(text(f'CREATE UNIQUE INDEX {name} ON {table} ({column_list})'))
+            added.append(f'{table}.{name}')
+    
+    return added, blocked
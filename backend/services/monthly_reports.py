@@ -0,0 +1,281 @@
+from datetime import date, timedelta
+import calendar
+from sqlalchemy import delete, event, func, or_
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from models.budget import Budget
+from models.expense import Expense
+from models.monthly_report import MonthlyReportSnapshot
+from models.user import User
+from services.fx import convert_amounts
+from services.metrics import record_cache_lookup
+from services.money import from_cents, to_cents
+
+def month_range(year, month):
+    """First and last day of a month"""
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+def previous_month(year, month):
+    return (year, month - 1) if month > 1 else (year - 1, 12)
+
+def next_month(year, month):
+    return (year, month + 1) if month < 12 else (year + 1, 1)
+
+def _budget_entry(budget):
+    spent_cents = budget.spent_cents or 0
+    return {
+        'category': budget.category,
+        'display_name': budget.get_category_display_name(),
+        'budget_amount': from_cents(budget.amount_cents),
+        'spent_amount': from_cents(spent_cents),
+        'remaining': from_cents(budget.amount_cents - spent_cents),
+        'percentage_used': (spent_cents / budget.amount_cents * 100) if budget.amount_cents > 0 else 0,
+        'is_over_budget': spent_cents > budget.amount_cents
+    }
+
+def _set_budgets(report, budgets):
+    """Append budgets to a report and recompute its budget summary"""
+    report['budget_performance'].extend(_budget_entry(budget) for budget in budgets)
+    
+    total_cents = to_cents(report['report']['total_spent'])
+    total_budget_cents = sum(to_cents(entry['budget_amount']) for entry in report['budget_performance'])
+    total_spent = from_cents(total_cents)
+    total_budget = from_cents(total_budget_cents)
+    report['budget_summary'] = {
+        'total_budget': total_budget,
+        'total_spent': total_spent,
+        'total_remaining': from_cents(total_budget_cents - total_cents),
+        'overall_percentage_used': (total_spent / total_budget * 100) if total_budget > 0 else 0
+    }
+    return report
+
+def _spans_month(budget, start_date, end_date):
+    # Its spent counter also moves with expenses outside the month
+    return budget.start_date < start_date or budget.end_date > end_date
+
+def _spanning_budgets(user_id, start_date, end_date):
+    return Budget.query.filter(
+        Budget.user_id == user_id,
+        Budget.start_date <= end_date,
+        Budget.end_date >= start_date,
+        or_(Budget.start_date < start_date, Budget.end_date > end_date)
+    ).all()
+
+def build_monthly_report(user_id, year, month):
+    """Build a monthly report from one grouped expense query and one budget query"""
+    report, budgets = _build_report(user_id, year, month)
+    return _set_budgets(report, budgets)
+
+def _build_report(user_id, year, month):
+    """A monthly report without its budgets, and the budgets overlapping the month"""
+    start_date, end_date = month_range(year, month)
+    prev_start_date, _ = month_range(*previous_month(year, month))
+    
+    # Per (day, category, currency) totals for this month and the one before it
+    rows = db.session.query(
+        Expense.date,
+        Expense.category,
+        func.sum(Expense.amount_cents),
+        func.count(Expense.id),
+        Expense.currency
+    ).filter(
+        Expense.user_id == user_id,
+        Expense.date >= prev_start_date,
+        Expense.date <= end_date
+    ).group_by(Expense.date, Expense.category, Expense.currency).all()
+    
+    # Expenses recorded in other currencies are converted into the user's
+    amounts = [int(row[2] or 0) for row in rows]
+    if any(row[4] for row in rows):
+        amounts = convert_amounts(
+            amounts, [row[0].toordinal() for row in rows], [row[4] for row in rows],
+            db.session.get(User, user_id).currency
+        )
+    rows = [(row[0], row[1], amount, row[3]) for row, amount in zip(rows, amounts) if amount is not None]
+    
+    category_cents = {}
+    daily_cents = {}
+    total_cents = 0
+    prev_total_cents = 0
+    total_transactions = 0
+    
+    for expense_date, category, cents, count in rows:
+        if expense_date < start_date:
+            prev_total_cents += cents
+            continue
+        
+        total_cents += cents
+        total_transactions += int(count)
+        category_cents[category] = category_cents.get(category, 0) + cents
+        daily_cents[expense_date.day] = daily_cents.get(expense_date.day, 0) + cents
+    
+    total_spent = from_cents(total_cents)
+    prev_total_spent = from_cents(prev_total_cents)
+    
+    # Spent amounts come from each budget's maintained counter
+    budgets = Budget.query.filter(
+        Budget.user_id == user_id,
+        Budget.start_date <= end_date,
+        Budget.end_date >= start_date
+    ).all()
+    
+    month_over_month_change = 0
+    if prev_total_spent > 0:
+        month_over_month_change = ((total_spent - prev_total_spent) / prev_total_spent) * 100
+    
+    return {
+        'report': {
+            'year': year,
+            'month': month,
+            'month_name': calendar.month_name[month],
+            'total_spent': total_spent,
+            'total_transactions': total_transactions,
+            'average_per_day': total_spent / end_date.day if end_date.day > 0 else 0,
+            'average_per_transaction': total_spent / total_transactions if total_transactions > 0 else 0,
+            'month_over_month_change': round(month_over_month_change, 2)
+        },
+        'category_breakdown': [
+            {
+                'category': category,
+                'display_name': Expense.get_category_display_name(category),
+                'total': from_cents(cents),
+                'percentage': (cents / total_cents * 100) if total_cents > 0 else 0
+            }
+            for category, cents in sorted(category_cents.items(), key=lambda x: x[1], reverse=True)
+        ],
+        'daily_breakdown': [
+            {
+                'day': day,
+                'total': from_cents(cents),
+                'date': date(year, month, day).isoformat()
+            }
+            for day, cents in sorted(daily_cents.items())
+        ],
+        'budget_performance': []
+    }, budgets
+
+def get_monthly_report(user_id, year, month, today=None):
+    """Get a monthly report, served from its snapshot once the month has ended.
+    
+    Budgets reaching outside the month are not frozen with it; their live
+    spend is added on every read.
+    """
+    today = today or date.today()
+    start_date, end_date = month_range(year, month)
+    
+    if end_date >= today:
+        return build_monthly_report(user_id, year, month)
+    
+    report = MonthlyReportSnapshot.get_report(user_id, year, month)
+    record_cache_lookup('monthly_report', report is not None)
+    if report is not None:
+        return _set_budgets(report, _spanning_budgets(user_id, start_date, end_date))
+    
+    report, budgets = _build_report(user_id, year, month)
+    within = [budget for budget in budgets if not _spans_month(budget, start_date, end_date)]
+    spanning = [budget for budget in budgets if _spans_month(budget, start_date, end_date)]
+    
+    # Built before storing: the commit expires the budgets loaded above
+    snapshot = _set_budgets(report, within)
+    response = _set_budgets(dict(snapshot, budget_performance=list(snapshot['budget_performance'])), spanning)
+    MonthlyReportSnapshot.store(user_id, year, month, snapshot)
+    return response
+
+def _stale_months(user_id, first_day, last_day):
+    """(user_id, year, month) of the closed months whose reports a change over these days affects"""
+    # Only months that have ended can have a snapshot
+    current_month = date.today().replace(day=1)
+    if first_day is None or first_day >= current_month:
+        return set()
+    
+    stale = set()
+    day = first_day.replace(day=1)
+    last_day = min(last_day, current_month - timedelta(days=1))
+    while day <= last_day:
+        stale.add((user_id, day.year, day.month))
+        # The next month's report compares against this one
+        stale.add((user_id,) + next_month(day.year, day.month))
+        day = date(*next_month(day.year, day.month), 1)
+    return stale
+
+def _mark_stale(target, user_id, first_day, last_day):
+    session = Session.object_session(target)
+    stale = _stale_months(user_id, first_day, last_day)
+    if session is not None and stale:
+        session.info.setdefault('monthly_report_stale', set()).update(stale)
+
+def _delete_reports(connection, stale=(), stale_users=()):
+    snapshots = MonthlyReportSnapshot.__table__
+    
+    # Grouped by month so a large catch-up deletes with a few user_id IN lists
+    users_by_month = {}
+    for user_id, year, month in stale:
+        users_by_month.setdefault((year, month), []).append(user_id)
+    
+    for (year, month), user_ids in users_by_month.items():
+        for i in range(0, len(user_ids), 500):
+            connection.execute(
+                delete(snapshots).where(
+                    snapshots.c.year == year,
+                    snapshots.c.month == month,
+                    snapshots.c.user_id.in_(user_ids[i:i + 500])
+                )
+            )
+    
+    stale_users = list(stale_users)
+    for i in range(0, len(stale_users), 500):
+        connection.execute(delete(snapshots).where(snapshots.c.user_id.in_(stale_users[i:i + 500])))
+
+def drop_reports_for_budgets(connection, budgets):
+    """Delete closed-month reports overlapped by (user_id, start_date, end_date) budgets written outside the ORM"""
+    stale = set()
+    for user_id, start_date, end_date in budgets:
+        stale |= _stale_months(user_id, start_date, end_date)
+    if stale:
+        _delete_reports(connection, stale)
+
+def _old_value(target, field):
+    history = get_history(target, field)
+    return history.deleted[0] if history.deleted else getattr(target, field)
+
+@event.listens_for(Expense, 'after_insert')
+@event.listens_for(Expense, 'after_delete')
+def _expense_written(mapper, connection, target):
+    expense_date = _old_value(target, 'date')
+    _mark_stale(target, target.user_id, expense_date, expense_date)
+
+@event.listens_for(Expense, 'after_update')
+def _expense_updated(mapper, connection, target):
+    if not any(get_history(target, field).has_changes() for field in ('amount_cents', 'category', 'date', 'currency')):
+        return
+    
+    old_date = _old_value(target, 'date')
+    _mark_stale(target, target.user_id, old_date, old_date)
+    _mark_stale(target, target.user_id, target.date, target.date)
+
+@event.listens_for(Budget, 'after_insert')
+@event.listens_for(Budget, 'after_delete')
+@event.listens_for(Budget, 'after_update')
+def _budget_written(mapper, connection, target):
+    _mark_stale(target, target.user_id, _old_value(target, 'start_date'), _old_value(target, 'end_date'))
+    _mark_stale(target, target.user_id, target.start_date, target.end_date)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    # Reports are in the owner's currency
+    session = Session.object_session(target)
+    if session is not None and get_history(target, 'currency').has_changes():
+        session.info.setdefault('monthly_report_stale_users', set()).add(target.id)
+
+@event.listens_for(Session, 'after_flush')
+def _drop_stale_reports(session, flush_context):
+    stale = session.info.pop('monthly_report_stale', None)
+    stale_users = session.info.pop('monthly_report_stale_users', None)
+    if stale or stale_users:
+        _delete_reports(session.connection(), stale or (), stale_users or ())
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_stale_reports(session):
+    session.info.pop('monthly_report_stale', None)
+    session.info.pop('monthly_report_stale_users', None)
@@ -0,0 +1,148 @@
+from app import db, socketio
+from models.notification import Notification
+from models.user import User
+from services.notification_waiters import waiters
+from services.presence import is_listening
+from sqlalchemy import event, func, select, update
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.attributes import get_history
+
+def _unread_subquery(users):
+    """Correlated COUNT of a user row's unread notifications"""
+    return select(func.count(Notification.id)).where(
+        Notification.user_id == users.c.id,
+        Notification.is_read == False
+    ).scalar_subquery()
+
+def _add_delta(target, delta):
+    session = Session.object_session(target)
+    if session is None or not delta:
+        return
+    
+    deltas = session.info.setdefault('unread_count_deltas', {})
+    deltas[target.user_id] = deltas.get(target.user_id, 0) + delta
+
+@event.listens_for(Notification, 'after_insert')
+def _notification_inserted(mapper, connection, target):
+    if not target.is_read:
+        _add_delta(target, 1)
+
+@event.listens_for(Notification, 'after_update')
+def _notification_updated(mapper, connection, target):
+    history = get_history(target, 'is_read')
+    if not history.has_changes():
+        return
+    
+    was_read = bool(history.deleted[0]) if history.deleted else False
+    if was_read != bool(target.is_read):
+        _add_delta(target, -1 if target.is_read else 1)
+
+@event.listens_for(Notification, 'after_delete')
+def _notification_deleted(mapper, connection, target):
+    if not target.is_read:
+        _add_delta(target, -1)
+
+@event.listens_for(Session, 'after_flush')
+def _apply_unread_deltas(session, flush_context):
+    deltas = session.info.pop('unread_count_deltas', None)
+    if not deltas:
+        return
+    
+    users = User.__table__
+    connection = session.connection()
+    
+    for user_id, delta in deltas.items():
+        if not delta:
+            continue
+        connection.execute(
+            update(users).where(
+                users.c.id == user_id
+            ).values(unread_notification_count=users.c.unread_notification_count + delta)
+        )
+        
+        # The identity map still holds the pre-flush value
+        user = session.identity_map.get(session.identity_key(User, user_id))
+        if user is not None:
+            session.expire(user, ['unread_notification_count'])
+    
+    session.info.setdefault('unread_count_changed', set()).update(deltas)
+
+@event.listens_for(Session, 'after_commit')
+def _push_unread_counts(session):
+    changed = session.info.pop('unread_count_changed', None)
+    if changed:
+        push_unread_counts(changed)
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_unread_deltas(session):
+    session.info.pop('unread_count_deltas', None)
+    session.info.pop('unread_count_changed', None)
+
+def get_unread_count(user_id):
+    """Get a user's unread notification count with a primary-key read"""
+    return db.session.execute(
+        select(User.unread_notification_count).where(User.id == user_id)
+    ).scalar() or 0
+
+def push_unread_counts(user_ids):
+    """Emit the current unread count to each user's notification room"""
+    users = User.__table__
+    
+    # Offline users get a fresh count when they reconnect
+    user_ids = [user_id for user_id in user_ids if is_listening(user_id)]
+    if not user_ids:
+        return
+    
+    try:
+        # The committing session cannot run SQL from inside after_commit
+        with db.engine.connect() as connection:
+            rows = connection.execute(
+                select(users.c.id, users.c.unread_notification_count).where(
+                    users.c.id.in_(user_ids)
+                )
+            ).all()
+        
+        for user_id, unread_count in rows:
+            socketio.emit('unread_count', {'unread_count': unread_count}, room=f'user_{user_id}')
+            waiters.publish(user_id, 'unread_count', {'unread_count': unread_count})
+    except Exception as e:
+        print(f"Unread count push error: {e}")
+
+def set_unread_count_from_source(user_id):
+    """Recompute one user's counter in the current transaction"""
+    users = User.__table__
+    db.session.execute(
+        update(users).where(
+            users.c.id == user_id
+        ).values(unread_notification_count=_unread_subquery(users))
+    )
+    db.session.info.setdefault('unread_count_changed', set()).add(int(user_id))
+
+def repair_unread_counts():
+    """Recompute every user's unread counter and report the ones that drifted"""
+    users = User.__table__
+    rows = db.session.execute(
+        select(users.c.id, users.c.unread_notification_count, _unread_subquery(users))
+    ).all()
+    
+    drift = [
+        {'user_id': user_id, 'stored': stored or 0, 'actual': actual}
+        for user_id, stored, actual in rows
+        if (stored or 0) != actual
+    ]
+    
+    if drift:
+        db.session.execute(
+            update(User),
+            [{'id': item['user_id'], 'unread_notification_count': item['actual']} for item in drift]
+        )
+        db.session.info.setdefault('unread_count_changed', set()).update(
+            item['user_id'] for item in drift
+        )
+    
+    db.session.commit()
+    
+    for item in drift:
+        print(f"User {item['user_id']} unread count drift: {item['stored'] - item['actual']}")
+    
+    return drift
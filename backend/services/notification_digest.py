@@ -0,0 +1,160 @@
+from app import db
+from models.notification import Notification
+from collections import OrderedDict
+from flask import current_app
+import atexit
+import threading
+import time
+
+def _spec(notification):
+    """Plain, session-free copy of a not-yet-saved notification"""
+    return {
+        'type': notification.type,
+        'title': notification.title,
+        'message': notification.message,
+        'data': dict(notification.data or {}),
+        'priority': notification.priority or 'medium'
+    }
+
+def _digest_key(spec):
+    """Alerts about the same budget merge; anything else by type and category"""
+    data = spec['data']
+    if 'budget_id' in data:
+        return (spec['type'], 'budget', data['budget_id'])
+    return (spec['type'], 'category', data.get('category'))
+
+def _merge(current, new):
+    """Keep the newest message, the highest priority and a running count"""
+    levels = Notification.PRIORITY_LEVELS
+    merged = dict(new)
+    merged['data'] = dict(new['data'])
+    merged['data']['digest_count'] = current['data'].get('digest_count', 1) + new['data'].get('digest_count', 1)
+    merged['priority'] = max(current['priority'], new['priority'], key=levels.index)
+    return merged
+
+def write_notifications(user_id, specs):
+    """Save notifications in one INSERT and push them to the user in one emit"""
+    if not specs:
+        return []
+    
+    notifications = [
+        Notification(
+            user_id=user_id,
+            notification_type=spec['type'],
+            title=spec['title'],
+            message=spec['message'],
+            data=spec['data'],
+            priority=spec['priority']
+        )
+        for spec in specs
+    ]
+    
+    db.session.add_all(notifications)
+    db.session.commit()
+    
+    from routes.notifications import send_real_time_notifications
+    send_real_time_notifications(user_id, notifications)
+    
+    return notifications
+
+class NotificationCoalescer:
+    """Buffers notifications per user and flushes them as merged digests"""
+    
+    def __init__(self, app, windows):
+        self.app = app
+        self.windows = windows
+        self._pending = {}  # user_id -> (deadline, OrderedDict of digest key -> spec)
+        self._condition = threading.Condition()
+        self._thread = None
+    
+    def window_for(self, priority):
+        return self.windows.get(priority, self.windows.get('medium', 0))
+    
+    def submit(self, user_id, specs):
+        """Buffer specs for a user; the earliest window among them wins"""
+        now = time.monotonic()
+        
+        with self._condition:
+            deadline, groups = self._pending.get(user_id, (None, OrderedDict()))
+            
+            for spec in specs:
+                key = _digest_key(spec)
+                groups[key] = _merge(groups[key], spec) if key in groups else spec
+                
+                spec_deadline = now + self.window_for(spec['priority'])
+                deadline = spec_deadline if deadline is None else min(deadline, spec_deadline)
+            
+            self._pending[user_id] = (deadline, groups)
+            self._ensure_thread()
+            self._condition.notify()
+    
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name='notification-digest', daemon=True)
+            self._thread.start()
+    
+    def _take_due(self, now):
+        due = [user_id for user_id, (deadline, _) in self._pending.items() if deadline <= now]
+        return [(user_id, list(self._pending.pop(user_id)[1].values())) for user_id in due]
+    
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    now = time.monotonic()
+                    due = self._take_due(now)
+                    if due:
+                        break
+                    
+                    next_deadline = min((deadline for deadline, _ in self._pending.values()), default=None)
+                    self._condition.wait(None if next_deadline is None else next_deadline - now)
+            
+            self._write(due)
+    
+    def _write(self, batches):
+        with self.app.app_context():
+            for user_id, specs in batches:
+                try:
+                    write_notifications(user_id, specs)
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Notification digest flush error for user {user_id}: {e}")
+    
+    def flush(self):
+        """Write everything buffered now, e.g. on shutdown"""
+        with self._condition:
+            batches = [(user_id, list(groups.values())) for user_id, (_, groups) in self._pending.items()]
+            self._pending.clear()
+        
+        self._write(batches)
+
+def init_notification_digest(app):
+    """Create the app's notification coalescer"""
+    coalescer = NotificationCoalescer(app, app.config.get('NOTIFICATION_DIGEST_WINDOWS', {}))
+    app.extensions['notification_digest'] = coalescer
+    atexit.register(coalescer.flush)
+    return coalescer
+
+def deliver_notifications(user_id, notifications):
+    """Deliver unsaved notifications, coalescing them unless they are urgent.
+    
+    Notifications whose priority has no window (urgent by default) are saved
+    and pushed straight away and returned. The rest are buffered and merged
+    per type/budget into digests.
+    """
+    app = current_app._get_current_object()
+    coalescer = app.extensions['notification_digest']
+    
+    immediate = []
+    buffered = []
+    for notification in notifications:
+        spec = _spec(notification)
+        if coalescer.window_for(spec['priority']) <= 0:
+            immediate.append(spec)
+        else:
+            buffered.append(spec)
+    
+    if buffered:
+        coalescer.submit(user_id, buffered)
+    
+    return write_notifications(user_id, immediate)
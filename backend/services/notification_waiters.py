@@ -0,0 +1,118 @@
+from collections import deque
+import queue
+import threading
+import time
+
+class _Channel:
+    """One user's recent events and currently parked subscribers"""
+    __slots__ = ('seq', 'recent', 'subscribers', 'last_active')
+    
+    def __init__(self, history):
+        self.seq = 0
+        self.recent = deque(maxlen=history)
+        self.subscribers = set()
+        self.last_active = time.monotonic()
+
+class NotificationWaiters:
+    """In-process per-user wait queues for SSE and long-poll clients.
+    
+    Publishing hands each event to the user's parked subscribers and keeps a
+    short numbered history, so a client reconnecting with the last event id
+    it saw gets what it missed. Parked clients never touch the database.
+    """
+    
+    def __init__(self, history=50, channel_ttl=600):
+        self.history = history
+        self.channel_ttl = channel_ttl
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._next_prune = time.monotonic() + channel_ttl
+    
+    def subscribe(self, user_id, last_event_id=None):
+        """Park a new subscriber; returns (subscriber, events missed since last_event_id)"""
+        subscriber = queue.SimpleQueue()
+        
+        with self._lock:
+            self._prune()
+            channel = self._channels.get(user_id)
+            if channel is None:
+                channel = self._channels[user_id] = _Channel(self.history)
+            
+            channel.subscribers.add(subscriber)
+            channel.last_active = time.monotonic()
+            
+            backlog = []
+            if last_event_id is not None:
+                backlog = [event for event in channel.recent if event['id'] > last_event_id]
+        
+        return subscriber, backlog
+    
+    def unsubscribe(self, user_id, subscriber):
+        with self._lock:
+            channel = self._channels.get(user_id)
+            if channel is not None:
+                channel.subscribers.discard(subscriber)
+                channel.last_active = time.monotonic()
+    
+    def publish(self, user_id, event_name, data):
+        """Wake the user's parked subscribers with an event"""
+        with self._lock:
+            channel = self._channels.get(user_id)
+            
+            # Nobody has listened recently; nothing to wake or replay
+            if channel is None:
+                return None
+            
+            channel.seq += 1
+            event = {'id': channel.seq, 'event': event_name, 'data': data}
+            channel.recent.append(event)
+            channel.last_active = time.monotonic()
+            subscribers = list(channel.subscribers)
+        
+        for subscriber in subscribers:
+            subscriber.put(event)
+        
+        return event
+    
+    def wait(self, subscriber, timeout):
+        """Block for the next event, returning None on timeout"""
+        try:
+            return subscriber.get(timeout=timeout)
+        except queue.Empty:
+            return None
+    
+    def drain(self, subscriber):
+        """Events already queued for a subscriber, without blocking"""
+        events = []
+        while True:
+            try:
+                events.append(subscriber.get_nowait())
+            except queue.Empty:
+                return events
+    
+    def has_subscribers(self, user_id):
+        with self._lock:
+            channel = self._channels.get(user_id)
+            return bool(channel and channel.subscribers)
+    
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(channel.subscribers) for channel in self._channels.values())
+    
+    def _prune(self):
+        # Called with the lock held; forgets channels nobody has used for a while
+        now = time.monotonic()
+        if now < self._next_prune:
+            return
+        self._next_prune = now + self.channel_ttl
+        
+        cutoff = now - self.channel_ttl
+        stale = [
+            user_id for user_id, channel in self._channels.items()
+            if not channel.subscribers and channel.last_active < cutoff
+        ]
+        for user_id in stale:
+            del self._channels[user_id]
+
+# Shared by every request handler in this worker process
+waiters = NotificationWaiters()
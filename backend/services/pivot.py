@@ -0,0 +1,204 @@
+from datetime import date, datetime
+import calendar
+from sqlalchemy import Integer, case, cast, extract, func
+from app import db
+from models.expense import Expense
+from models.user import User
+from services.fx import convert_amounts
+from services.money import from_cents
+
+PIVOT_DIMENSIONS = ('category', 'payment_method', 'day', 'week', 'month', 'year', 'weekday', 'tag')
+PIVOT_MEASURES = ('sum', 'count', 'avg', 'min', 'max')
+
+class PivotResultTooLarge(Exception):
+    """The pivot would return more rows than PIVOT_MAX_ROWS"""
+
+def weekday_expression(dialect):
+    """Expense weekday in SQL, 0 = Monday as in date.weekday()"""
+    if dialect == 'sqlite':
+        return (cast(func.strftime('%w', Expense.date), Integer) + 6) % 7
+    if dialect == 'mysql':
+        return func.weekday(Expense.date)
+    return (cast(extract('dow', Expense.date), Integer) + 6) % 7
+
+def week_start_expression(dialect):
+    """Monday that starts the expense's week, in SQL"""
+    if dialect == 'sqlite':
+        return func.date(func.julianday(Expense.date) - weekday_expression(dialect))
+    if dialect == 'mysql':
+        return func.subdate(Expense.date, func.weekday(Expense.date))
+    return cast(func.date_trunc('week', Expense.date), db.Date)
+
+def _dimension_columns(dimension, dialect):
+    """SQL expressions grouped on for a dimension"""
+    if dimension == 'category':
+        return [Expense.category]
+    if dimension == 'payment_method':
+        return [Expense.payment_method]
+    if dimension == 'day':
+        return [Expense.date]
+    if dimension == 'week':
+        return [week_start_expression(dialect)]
+    if dimension == 'month':
+        return [extract('year', Expense.date), extract('month', Expense.date)]
+    if dimension == 'year':
+        return [extract('year', Expense.date)]
+    if dimension == 'weekday':
+        return [weekday_expression(dialect)]
+    if dimension == 'tag':
+        return [Expense.tags]
+    raise ValueError(f"Invalid dimension '{dimension}'. Must be one of: {', '.join(PIVOT_DIMENSIONS)}")
+
+def _dimension_keys(dimension, values):
+    """Sortable key(s) for one dimension of a result row; tag can yield several"""
+    if dimension == 'month':
+        return [(int(values[0]), int(values[1]))]
+    if dimension in ('year', 'weekday'):
+        return [int(values[0])]
+    if dimension in ('day', 'week'):
+        value = values[0]
+        if isinstance(value, datetime):
+            value = value.date()
+        return [value if isinstance(value, date) else date.fromisoformat(str(value)[:10])]
+    if dimension == 'tag':
+        tags = sorted({tag.strip().lower() for tag in (values[0] or '').split(',') if tag.strip()})
+        return tags or ['']
+    return [values[0] or '']
+
+def _dimension_label(dimension, key):
+    if dimension == 'month':
+        return f"{key[0]}-{key[1]:02d}"
+    if dimension in ('day', 'week'):
+        return key.isoformat()
+    if dimension == 'weekday':
+        return calendar.day_name[key]
+    if dimension == 'tag':
+        return key or None
+    return key
+
+def _expand(dimensions, values):
+    """All key tuples a result row contributes to (more than one only for tag)"""
+    keys = [()]
+    for dimension, width in dimensions:
+        options = _dimension_keys(dimension, values[:width])
+        values = values[width:]
+        keys = [key + (option,) for key in keys for option in options]
+    return keys
+
+def run_pivot(user_id, dimensions, measures, start_date=None, end_date=None,
+              category=None, payment_method=None, max_rows=5000):
+    """Aggregate a user's expenses by any mix of dimensions in one query.
+    
+    Sum, count, min and max are computed in SQL and avg is derived from sum and
+    count, so rows can be merged exactly. That lets the tag dimension group on
+    the raw tags column and split comma-separated tags afterwards; an expense
+    with two tags counts towards both. Expenses recorded in another currency
+    are also grouped by currency and day, converted into the user's currency
+    and then merged the same way.
+    """
+    for measure in measures:
+        if measure not in PIVOT_MEASURES:
+            raise ValueError(f"Invalid measure '{measure}'. Must be one of: {', '.join(PIVOT_MEASURES)}")
+    if len(set(dimensions)) != len(dimensions):
+        raise ValueError('Each dimension may be used only once')
+    
+    dialect = db.session.get_bind().dialect.name
+    plan = [(dimension, _dimension_columns(dimension, dialect)) for dimension in dimensions]
+    group_columns = [column for _, columns in plan for column in columns]
+    
+    # Rows in the user's currency group as before; others also by currency and day
+    currency_columns = [Expense.currency, case((Expense.currency.is_(None), None), else_=Expense.date)]
+    
+    query = db.session.query(
+        *group_columns,
+        *currency_columns,
+        func.sum(Expense.amount_cents),
+        func.count(Expense.id),
+        func.min(Expense.amount_cents),
+        func.max(Expense.amount_cents)
+    ).filter(Expense.user_id == user_id)
+    
+    if start_date:
+        query = query.filter(Expense.date >= start_date)
+    if end_date:
+        query = query.filter(Expense.date <= end_date)
+    if category:
+        query = query.filter(Expense.category == category)
+    if payment_method:
+        query = query.filter(Expense.payment_method == payment_method)
+    query = query.group_by(*group_columns, *currency_columns)
+    
+    # Fetch one row past the limit to detect oversized results without counting
+    rows = query.limit(max_rows + 1).all()
+    if len(rows) > max_rows:
+        raise PivotResultTooLarge(f'Pivot has more than {max_rows} rows; narrow the dates or use coarser dimensions')
+    
+    width = len(group_columns)
+    stats_by_row = [
+        (int(total or 0), int(count or 0), int(minimum or 0), int(maximum or 0))
+        for total, count, minimum, maximum in (row[width + 2:] for row in rows)
+    ]
+    foreign = [i for i, row in enumerate(rows) if row[width]]
+    if foreign:
+        stats_by_row = _convert_stats(rows, stats_by_row, foreign, width, db.session.get(User, user_id).currency)
+    
+    widths = [(dimension, len(columns)) for dimension, columns in plan]
+    cells = {}
+    grand = None
+    for row, stats in zip(rows, stats_by_row):
+        if stats is None:
+            continue
+        values = list(row[:width])
+        grand = _merge(grand, stats)
+        
+        for key in _expand(widths, values):
+            cells[key] = _merge(cells.get(key), stats)
+    
+    if len(cells) > max_rows:
+        raise PivotResultTooLarge(f'Pivot has more than {max_rows} rows; narrow the dates or use coarser dimensions')
+    
+    return {
+        'rows': [
+            dict(
+                {dimension: _dimension_label(dimension, part) for dimension, part in zip(dimensions, key)},
+                **_measures(stats, measures)
+            )
+            for key, stats in sorted(cells.items())
+        ],
+        'totals': _measures(grand or (0, 0, 0, 0), measures)
+    }
+
+def _convert_stats(rows, stats_by_row, foreign, width, target):
+    """Convert the sum, min and max of rows in other currencies; None for rows without a rate"""
+    amounts, days, currencies = [], [], []
+    for i in foreign:
+        currency, day = rows[i][width], rows[i][width + 1]
+        if isinstance(day, str):
+            day = date.fromisoformat(day[:10])
+        total, _, minimum, maximum = stats_by_row[i]
+        amounts += [total, minimum, maximum]
+        days += [day.toordinal()] * 3
+        currencies += [currency] * 3
+    
+    converted = convert_amounts(amounts, days, currencies, target)
+    stats_by_row = list(stats_by_row)
+    for n, i in enumerate(foreign):
+        total, minimum, maximum = converted[3 * n:3 * n + 3]
+        stats_by_row[i] = None if total is None else (total, stats_by_row[i][1], minimum, maximum)
+    return stats_by_row
+
+def _merge(stats, other):
+    if stats is None:
+        return other
+    return (stats[0] + other[0], stats[1] + other[1], min(stats[2], other[2]), max(stats[3], other[3]))
+
+def _measures(stats, measures):
+    total, count, minimum, maximum = stats
+    values = {
+        'sum': from_cents(total),
+        'count': count,
+        'avg': round(total / count / 100, 2) if count else 0,
+        'min': from_cents(minimum),
+        'max': from_cents(maximum)
+    }
+    return {measure: values[measure] for measure in measures}
@@ -0,0 +1,218 @@
+from collections import deque
+import json
+import threading
+import time
+from services.notification_waiters import waiters
+
+class MemoryPresenceBackend:
+    """Presence shared only by the connections of this worker process"""
+    
+    def __init__(self, queue_size=100, queue_ttl=86400):
+        self.queue_size = queue_size
+        self.queue_ttl = queue_ttl
+        self._online = {}
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._next_sweep = time.time() + queue_ttl
+    
+    def mark_online(self, user_id, sid, expires_at):
+        with self._lock:
+            self._online.setdefault(user_id, {})[sid] = expires_at
+    
+    def mark_offline(self, user_id, sid):
+        with self._lock:
+            sids = self._online.get(user_id)
+            if sids is not None:
+                sids.pop(sid, None)
+                if not sids:
+                    del self._online[user_id]
+    
+    def is_online(self, user_id):
+        now = time.time()
+        with self._lock:
+            return any(expires_at > now for expires_at in self._online.get(user_id, {}).values())
+    
+    def queue(self, user_id, item):
+        now = time.time()
+        with self._lock:
+            # Users who never come back would otherwise keep their queue forever
+            if now >= self._next_sweep:
+                self._sweep(now)
+            entry = self._queues.get(user_id)
+            if entry is None:
+                entry = self._queues[user_id] = [deque(maxlen=self.queue_size), 0]
+            entry[0].append(item)
+            entry[1] = now + self.queue_ttl
+    
+    def take(self, user_id):
+        with self._lock:
+            entry = self._queues.pop(user_id, None)
+        
+        if entry is None or entry[1] < time.time():
+            return []
+        return list(entry[0])
+    
+    def _sweep(self, now):
+        # Called with the lock held
+        self._next_sweep = now + min(self.queue_ttl, 3600)
+        for user_id in [user_id for user_id, entry in self._queues.items() if entry[1] < now]:
+            del self._queues[user_id]
+
+class RedisPresenceBackend:
+    """Presence shared by every worker through Redis"""
+    
+    def __init__(self, url, queue_size=100, queue_ttl=86400):
+        import redis
+        
+        self.client = redis.Redis.from_url(url)
+        self.queue_size = queue_size
+        self.queue_ttl = queue_ttl
+    
+    def mark_online(self, user_id, sid, expires_at):
+        key = f'presence:user:{user_id}'
+        pipe = self.client.pipeline()
+        pipe.zadd(key, {sid: expires_at})
+        pipe.expireat(key, int(expires_at) + 1)
+        pipe.execute()
+    
+    def mark_offline(self, user_id, sid):
+        self.client.zrem(f'presence:user:{user_id}', sid)
+    
+    def is_online(self, user_id):
+        # Any connection whose last heartbeat has not yet expired
+        return self.client.zcount(f'presence:user:{user_id}', time.time(), '+inf') > 0
+    
+    def queue(self, user_id, item):
+        key = f'presence:queue:{user_id}'
+        pipe = self.client.pipeline()
+        pipe.rpush(key, json.dumps(item))
+        pipe.ltrim(key, -self.queue_size, -1)
+        pipe.expire(key, self.queue_ttl)
+        pipe.execute()
+    
+    def take(self, user_id):
+        key = f'presence:queue:{user_id}'
+        pipe = self.client.pipeline()
+        pipe.lrange(key, 0, -1)
+        pipe.delete(key)
+        items, _ = pipe.execute()
+        return [json.loads(item) for item in items]
+
+class PresenceRegistry:
+    """Which users have a live Socket.IO connection, kept alive by heartbeats.
+    
+    Connections are tracked locally by sid; the backend answers whether a user
+    is online anywhere and holds updates queued while they were not.
+    """
+    
+    def __init__(self, backend=None, ttl=60):
+        self.backend = backend or MemoryPresenceBackend()
+        self.ttl = ttl
+        self._connections = {}
+        self._identities = {}
+        self._lock = threading.Lock()
+        self._next_expire = time.time() + ttl
+    
+    def configure(self, backend, ttl):
+        with self._lock:
+            self.backend = backend
+            self.ttl = ttl
+    
+    def bind(self, sid, user_id):
+        """Record the user a socket authenticated as; it lasts until the socket closes"""
+        with self._lock:
+            self._identities[sid] = user_id
+    
+    def unbind(self, sid):
+        with self._lock:
+            return self._identities.pop(sid, None)
+    
+    def identity_for(self, sid):
+        with self._lock:
+            return self._identities.get(sid)
+    
+    def connect(self, sid, user_id):
+        # Sweeping here keeps the table bounded without a background thread
+        if time.time() >= self._next_expire:
+            self.expire()
+        
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            self._connections[sid] = (user_id, expires_at)
+        self.backend.mark_online(user_id, sid, expires_at)
+    
+    def heartbeat(self, sid):
+        """Extend a connection's lease; returns its user id, or None if unknown"""
+        with self._lock:
+            connection = self._connections.get(sid)
+            if connection is None:
+                return None
+            user_id = connection[0]
+            expires_at = time.time() + self.ttl
+            self._connections[sid] = (user_id, expires_at)
+        
+        self.backend.mark_online(user_id, sid, expires_at)
+        return user_id
+    
+    def disconnect(self, sid):
+        with self._lock:
+            connection = self._connections.pop(sid, None)
+        
+        if connection is None:
+            return None
+        self.backend.mark_offline(connection[0], sid)
+        return connection[0]
+    
+    def user_for(self, sid):
+        with self._lock:
+            connection = self._connections.get(sid)
+        return connection[0] if connection else None
+    
+    def is_online(self, user_id):
+        return self.backend.is_online(user_id)
+    
+    def online_count(self):
+        """Distinct users with a live connection to this worker"""
+        now = time.time()
+        with self._lock:
+            return len({user_id for user_id, expires_at in self._connections.values() if expires_at > now})
+    
+    def expire(self):
+        """Drop connections that stopped sending heartbeats"""
+        now = time.time()
+        with self._lock:
+            self._next_expire = now + self.ttl
+            expired = [(sid, user_id) for sid, (user_id, expires_at) in self._connections.items() if expires_at <= now]
+            for sid, _ in expired:
+                del self._connections[sid]
+        
+        for sid, user_id in expired:
+            self.backend.mark_offline(user_id, sid)
+        return len(expired)
+    
+    def queue_offline(self, user_id, event_name, data):
+        self.backend.queue(user_id, {'event': event_name, 'data': data})
+    
+    def take_offline(self, user_id):
+        return self.backend.take(user_id)
+
+def init_presence(app):
+    """Configure the shared registry from PRESENCE_BACKEND"""
+    queue_size = app.config['PRESENCE_OFFLINE_QUEUE_SIZE']
+    queue_ttl = app.config['PRESENCE_OFFLINE_QUEUE_TTL']
+    
+    if app.config['PRESENCE_BACKEND'] == 'redis':
+        backend = RedisPresenceBackend(app.config['REDIS_URL'], queue_size, queue_ttl)
+    else:
+        backend = MemoryPresenceBackend(queue_size, queue_ttl)
+    
+    presence.configure(backend, app.config['PRESENCE_TTL'])
+    app.extensions['presence'] = presence
+    return presence
+
+def is_listening(user_id):
+    """Whether anything would receive a push for this user right now"""
+    return waiters.has_subscribers(user_id) or presence.is_online(user_id)
+
+# Shared by the socket handlers and emit helpers in this worker process
+presence = PresenceRegistry()
@@ -0,0 +1,174 @@
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+import logging
+import re
+import threading
+import time
+from flask import current_app, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger('query_stats')
+
+# IN (?, ?, ?) lists vary in length per call; fold them so repeats still match
+_PARAM_LIST = re.compile(r'\((?:\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*,)+\s*(?:\?|%s|%\(\w+\)s|:\w+)\s*\)')
+
+class QueryBudgetExceeded(AssertionError):
+    """An endpoint ran more queries than its declared budget"""
+
+class QueryStats:
+    """Queries, rows fetched and database time for one request"""
+    
+    def __init__(self):
+        self.queries = 0
+        self.rows = 0
+        self.seconds = 0.0
+        self.selects = Counter()
+        self._lock = threading.Lock()
+    
+    def add_query(self, statement, seconds):
+        # Worker threads of the dashboard and batch pools report into the same stats
+        with self._lock:
+            self.queries += 1
+            self.seconds += seconds
+            if statement.lstrip()[:6].upper() == 'SELECT':
+                self.selects[_PARAM_LIST.sub('(...)', statement)] += 1
+    
+    def merge(self, other):
+        with self._lock:
+            self.queries += other.queries
+            self.rows += other.rows
+            self.seconds += other.seconds
+            self.selects.update(other.selects)
+    
+    def add_rows(self, rows):
+        with self._lock:
+            self.rows += rows
+    
+    def repeated(self, threshold):
+        """(statement, count) for SELECTs run at least `threshold` times, most repeated first"""
+        with self._lock:
+            return [(statement, count) for statement, count in self.selects.most_common() if count >= threshold]
+    
+    @property
+    def milliseconds(self):
+        return round(self.seconds * 1000, 2)
+
+_current = ContextVar('query_stats', default=None)
+
+def current_query_stats():
+    """Stats being collected in this context, or None"""
+    return _current.get()
+
+@contextmanager
+def track_queries():
+    """Collect query stats for the duration of the block; they also count toward any enclosing block"""
+    outer = _current.get()
+    stats = QueryStats()
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+        if outer is not None:
+            outer.merge(stats)
+
+def query_budget(max_queries):
+    """Declare the most queries an endpoint may run.
+    
+    Going over raises QueryBudgetExceeded when QUERY_BUDGET_STRICT is set (as
+    under TestingConfig) and logs a warning otherwise.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            # Counted apart from the request, so parallel /api/batch items don't mix
+            with track_queries() as stats:
+                response = view(*args, **kwargs)
+            
+            if stats.queries > max_queries:
+                message = f"{request.endpoint} ran {stats.queries} queries, over its budget of {max_queries}"
+                if current_app.config.get('QUERY_BUDGET_STRICT'):
+                    raise QueryBudgetExceeded(message)
+                logger.warning(message)
+            return response
+        return wrapper
+    return decorator
+
+def init_query_stats(app):
+    """Collect query stats per request, reported as headers and/or log lines"""
+    if app.config.get('QUERY_STATS_LOG', True) and not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+    
+    @app.before_request
+    def start_query_stats():
+        request.environ['query_stats.token'] = _current.set(QueryStats())
+    
+    @app.after_request
+    def report_query_stats(response):
+        stats = current_query_stats()
+        if stats is None:
+            return response
+        
+        repeated = stats.repeated(app.config.get('QUERY_STATS_REPEAT_THRESHOLD', 5))
+        if app.config.get('QUERY_STATS_HEADERS'):
+            response.headers['X-DB-Queries'] = str(stats.queries)
+            response.headers['X-DB-Rows'] = str(stats.rows)
+            response.headers['X-DB-Time-Ms'] = str(stats.milliseconds)
+            response.headers['Server-Timing'] = f'db;dur={stats.milliseconds};desc="{stats.queries} queries"'
+            if repeated:
+                response.headers['X-DB-Repeated-Queries'] = str(sum(count for _, count in repeated))
+        
+        if app.config.get('QUERY_STATS_LOG', True):
+            if stats.queries:
+                logger.info(
+                    '%s %s %s: %d queries, %d rows, %.2f ms in database',
+                    request.method, request.path, response.status_code, stats.queries, stats.rows, stats.milliseconds
+                )
+            for statement, count in repeated:
+                logger.warning('Possible N+1 in %s: ran %d times: %s', request.endpoint, count, ' '.join(statement.split())[:200])
+        return response
+    
+    @app.teardown_request
+    def stop_query_stats(exc=None):
+        token = request.environ.pop('query_stats.token', None)
+        if token is not None:
+            _current.reset(token)
+
+# Every engine reports into whatever stats the current context is collecting
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault('query_stats.started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = _current.get()
+    started = conn.info.get('query_stats.started')
+    if stats is not None and started:
+        stats.add_query(statement, time.perf_counter() - started.pop())
+
+@event.listens_for(Session, 'do_orm_execute')
+def _count_rows(state):
+    stats = _current.get()
+    options = state.execution_options
+    if stats is None or not state.is_select or options.get('yield_per') or options.get('stream_results'):
+        return None
+    
+    # psycopg2 and MySQL drivers report how many rows a SELECT returned
+    result = state.invoke_statement()
+    rowcount = getattr(getattr(result, 'raw', result), 'rowcount', -1)
+    if rowcount >= 0:
+        stats.add_rows(rowcount)
+        return result
+    
+    # SQLite doesn't, so buffer the result once and count it; streamed results are left alone
+    frozen = result.freeze()
+    stats.add_rows(len(frozen.data))
+    return frozen()
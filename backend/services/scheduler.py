@@ -0,0 +1,79 @@
+# Periodic maintenance jobs. Enable on one process only (ENABLE_SCHEDULER),
+# otherwise every gunicorn worker would run each job.
+
+def _run_in_app_context(app, func):
+    def run():
+        with app.app_context():
+            try:
+                func()
+            except Exception as e:
+                print(f"Scheduled job {func.__name__} error: {e}")
+    run.__name__ = func.__name__
+    return run
+
+def init_scheduler(app):
+    """Start the background scheduler with the maintenance jobs"""
+    if not app.config.get('ENABLE_SCHEDULER'):
+        return None
+    
+    from apscheduler.schedulers.background import BackgroundScheduler
+    from services.budget_rollover import rollover_recurring_budgets
+    from services.budget_spend import reconcile_budget_spend
+    from services.notification_counts import repair_unread_counts
+    from services.email_outbox import run_email_outbox
+    from models.budget_snapshot import BudgetPeriodSnapshot
+    
+    scheduler = BackgroundScheduler(daemon=True)
+    
+    # Start the next period of recurring budgets shortly after midnight
+    scheduler.add_job(
+        _run_in_app_context(app, rollover_recurring_budgets),
+        'cron',
+        hour=0,
+        minute=5,
+        id='rollover_recurring_budgets',
+        replace_existing=True
+    )
+    
+    # Nightly budget counter reconciliation
+    scheduler.add_job(
+        _run_in_app_context(app, reconcile_budget_spend),
+        'cron',
+        hour=app.config.get('BUDGET_RECONCILE_HOUR', 3),
+        id='reconcile_budget_spend',
+        replace_existing=True
+    )
+    
+    # Freeze budgets whose period ended, after their counters are reconciled
+    scheduler.add_job(
+        _run_in_app_context(app, BudgetPeriodSnapshot.capture_closed_budgets),
+        'cron',
+        hour=app.config.get('BUDGET_RECONCILE_HOUR', 3),
+        minute=30,
+        id='capture_closed_budgets',
+        replace_existing=True
+    )
+    
+    # Repair unread notification counters
+    scheduler.add_job(
+        _run_in_app_context(app, repair_unread_counts),
+        'interval',
+        seconds=app.config.get('UNREAD_COUNT_REPAIR_INTERVAL', 3600),
+        id='repair_unread_counts',
+        replace_existing=True
+    )
+    
+    # Email unsent notifications
+    if app.config.get('ENABLE_EMAIL_NOTIFICATIONS'):
+        scheduler.add_job(
+            _run_in_app_context(app, run_email_outbox),
+            'interval',
+            seconds=app.config.get('EMAIL_OUTBOX_INTERVAL', 30),
+            id='run_email_outbox',
+            max_instances=1,
+            replace_existing=True
+        )
+    
+    scheduler.start()
+    app.extensions['scheduler'] = scheduler
+    return scheduler
@@ -0,0 +1,318 @@
+from array import array
+from collections import OrderedDict
+from datetime import date, timedelta
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session, object_session
+from sqlalchemy.orm.attributes import get_history
+from app import db
+from models.expense import Expense
+from models.user import User
+from services.fx import convert_amounts
+from services.metrics import record_cache_lookup
+
+# Days past today covered up front, so new expenses land inside the index
+_HEADROOM_DAYS = 366
+
+class FenwickTree:
+    """Prefix sums of integer cents over day offsets, with O(log n) updates"""
+    __slots__ = ('size', 'tree')
+    
+    def __init__(self, values):
+        self.size = len(values)
+        
+        # 1-based tree built in linear time from the per-day values
+        tree = array('q', [0])
+        tree.extend(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                tree[parent] += tree[i]
+        self.tree = tree
+    
+    def add(self, position, delta):
+        i = position + 1
+        tree = self.tree
+        while i <= self.size:
+            tree[i] += delta
+            i += i & -i
+    
+    def prefix(self, count):
+        """Sum of the first `count` positions"""
+        total = 0
+        tree = self.tree
+        while count > 0:
+            total += tree[count]
+            count &= count - 1
+        return total
+    
+    def range_sum(self, first, last):
+        """Sum of positions first..last inclusive"""
+        return self.prefix(last + 1) - self.prefix(first)
+    
+    @property
+    def nbytes(self):
+        return self.tree.itemsize * len(self.tree)
+
+class UserSpendIndex:
+    """One user's spending as per-category prefix sums over days"""
+    
+    def __init__(self, origin, days, rows):
+        self.origin = origin
+        self.days = days
+        
+        per_category = {}
+        for expense_date, category, cents in rows:
+            values = per_category.get(category)
+            if values is None:
+                values = per_category[category] = [0] * days
+            values[(expense_date - origin).days] += cents
+        
+        totals = [sum(day_values) for day_values in zip(*per_category.values())] if per_category else [0] * days
+        self.categories = {category: FenwickTree(values) for category, values in per_category.items()}
+        self.total = FenwickTree(totals)
+    
+    @classmethod
+    def load(cls, user_id, today=None):
+        """Build a user's index from one grouped query, in the user's currency"""
+        rows = db.session.query(
+            Expense.date,
+            Expense.category,
+            Expense.currency,
+            func.sum(Expense.amount_cents)
+        ).filter(
+            Expense.user_id == user_id
+        ).group_by(Expense.date, Expense.category, Expense.currency).all()
+        
+        cents = [int(total) for _, _, _, total in rows]
+        if any(currency for _, _, currency, _ in rows):
+            cents = convert_amounts(
+                cents, [row[0].toordinal() for row in rows], [row[2] for row in rows],
+                db.session.get(User, user_id).currency
+            )
+        rows = [(row[0], row[1], amount) for row, amount in zip(rows, cents) if amount is not None]
+        
+        today = today or date.today()
+        origin = min([today] + [row[0] for row in rows])
+        last = max([today] + [row[0] for row in rows]) + timedelta(days=_HEADROOM_DAYS)
+        
+        return cls(origin, (last - origin).days + 1, rows)
+    
+    def add(self, day, category, cents):
+        """Apply a committed change; False if the day is outside the index"""
+        position = (day - self.origin).days
+        if not 0 <= position < self.days:
+            return False
+        
+        tree = self.categories.get(category)
+        if tree is None:
+            tree = self.categories[category] = FenwickTree([0] * self.days)
+        tree.add(position, cents)
+        self.total.add(position, cents)
+        return True
+    
+    def range_sum(self, start_date=None, end_date=None, category=None):
+        """Cents spent between two dates inclusive, optionally in one category"""
+        tree = self.total if category is None else self.categories.get(category)
+        if tree is None:
+            return 0
+        
+        # Nothing exists before the origin; the index ends past the latest expense
+        first = 0 if start_date is None else max((start_date - self.origin).days, 0)
+        last = self.days - 1 if end_date is None else min((end_date - self.origin).days, self.days - 1)
+        if first > last:
+            return 0
+        return tree.range_sum(first, last)
+    
+    def category_totals(self, start_date=None, end_date=None):
+        """Cents per category between two dates, omitting empty categories"""
+        totals = {}
+        for category in self.categories:
+            cents = self.range_sum(start_date, end_date, category)
+            if cents:
+                totals[category] = cents
+        return totals
+    
+    @property
+    def nbytes(self):
+        return self.total.nbytes + sum(tree.nbytes for tree in self.categories.values())
+
+class SpendIndexCache:
+    """Per-user spend indexes, updated on commit and evicted LRU past a memory cap"""
+    
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._loading = {}
+        self._lock = threading.Lock()
+    
+    def get(self, user_id):
+        """Get the user's index, building it with one query on a miss"""
+        user_id = int(user_id)
+        now = time.monotonic()
+        
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry and now - entry[1] < self.ttl:
+                self._entries.move_to_end(user_id)
+                record_cache_lookup('spend_index', True)
+                return entry[0]
+            # [loaders in flight, generation]; commits bump the generation
+            loading = self._loading.setdefault(user_id, [0, 0])
+            loading[0] += 1
+            generation = loading[1]
+        
+        record_cache_lookup('spend_index', False)
+        try:
+            index = UserSpendIndex.load(user_id)
+        except Exception:
+            with self._lock:
+                self._finish_load(user_id, generation)
+            raise
+        
+        with self._lock:
+            # A commit landed while loading; serve this index once but don't keep it
+            if not self._finish_load(user_id, generation):
+                return index
+            
+            self._drop(user_id)
+            self._entries[user_id] = (index, now, index.nbytes, time.monotonic())
+            self._bytes += index.nbytes
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+        
+        return index
+    
+    def apply(self, changes, since=None):
+        """Apply committed (user_id, day, category, cents) changes; a None day drops the user's index.
+        
+        `since` is when the committing session first wrote. An index loaded
+        after that may already include the commit, so it is dropped rather
+        than having the change added twice.
+        """
+        with self._lock:
+            for user_id, day, category, cents in changes:
+                user_id = int(user_id)
+                if user_id in self._loading:
+                    self._loading[user_id][1] += 1
+                
+                entry = self._entries.get(user_id)
+                if entry is None:
+                    continue
+                if day is None or (since is not None and entry[3] >= since) or not entry[0].add(day, category, cents):
+                    # Outside the index's days or possibly counted already; rebuild on next use
+                    self._drop(user_id)
+    
+    def invalidate(self, user_id=None):
+        """Drop one user's index, or every index when no user is given"""
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._bytes = 0
+                for loading in self._loading.values():
+                    loading[1] += 1
+            else:
+                user_id = int(user_id)
+                self._drop(user_id)
+                if user_id in self._loading:
+                    self._loading[user_id][1] += 1
+    
+    def stats(self):
+        with self._lock:
+            return {'users': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes}
+    
+    def _finish_load(self, user_id, generation):
+        # Called with the lock held; False if a commit landed since the load began
+        loading = self._loading[user_id]
+        loading[0] -= 1
+        if not loading[0]:
+            del self._loading[user_id]
+        return loading[1] == generation
+    
+    def _drop(self, user_id):
+        # Called with the lock held
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def _get_cache():
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SpendIndexCache(
+                    max_bytes=current_app.config.get('SPEND_INDEX_MAX_MB', 64) * 1024 * 1024,
+                    ttl=current_app.config.get('SPEND_INDEX_TTL', 300)
+                )
+    return _cache
+
+def get_spend_index(user_id):
+    """Get the cached spend index for a user"""
+    return _get_cache().get(user_id)
+
+def invalidate_spend_index(user_id=None):
+    """Forget cached spend indexes after expenses change outside the ORM"""
+    if _cache is not None:
+        _cache.invalidate(user_id)
+
+def _old_value(target, field):
+    history = get_history(target, field)
+    return history.deleted[0] if history.deleted else getattr(target, field)
+
+def _queue_change(session, change):
+    session.info.setdefault('spend_index_since', time.monotonic())
+    session.info.setdefault('spend_index_changes', []).append(change)
+
+def _record(target, day, category, cents, currency):
+    session = object_session(target)
+    if session is not None and cents:
+        # Converting needs that day's rate; rebuild instead, as other currencies are rare
+        if currency is not None:
+            day = category = cents = None
+        _queue_change(session, (target.user_id, day, category, cents))
+
+@event.listens_for(Expense, 'after_insert')
+def _expense_inserted(mapper, connection, target):
+    _record(target, target.date, target.category, target.amount_cents, target.currency)
+
+@event.listens_for(Expense, 'after_delete')
+def _expense_deleted(mapper, connection, target):
+    _record(
+        target, _old_value(target, 'date'), _old_value(target, 'category'), -_old_value(target, 'amount_cents'),
+        _old_value(target, 'currency')
+    )
+
+@event.listens_for(Expense, 'after_update')
+def _expense_updated(mapper, connection, target):
+    if not any(get_history(target, field).has_changes() for field in ('amount_cents', 'category', 'date', 'currency')):
+        return
+    
+    _expense_deleted(mapper, connection, target)
+    _expense_inserted(mapper, connection, target)
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    # Indexes are in the owner's currency; rebuild after it changes
+    session = object_session(target)
+    if session is not None and get_history(target, 'currency').has_changes():
+        _queue_change(session, (target.id, None, None, None))
+
+# Changes reach the cache only once committed, so readers never see rolled-back spend
+@event.listens_for(Session, 'after_commit')
+def _session_committed(session):
+    changes = session.info.pop('spend_index_changes', None)
+    since = session.info.pop('spend_index_since', None)
+    if changes and _cache is not None:
+        _cache.apply(changes, since)
+
+@event.listens_for(Session, 'after_rollback')
+def _session_rolled_back(session):
+    session.info.pop('spend_index_changes', None)
+    session.info.pop('spend_index_since', None)
@@ -0,0 +1,81 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from services.metrics import task_queued, task_started
+
+# Registered background tasks, keyed by name
+_tasks = {}
+
+def task(func):
+    """Register a function as a background task"""
+    _tasks[func.__name__] = func
+    return func
+
+def init_tasks(app):
+    """Set up the task backend configured for the app"""
+    backend = app.config.get('TASK_BACKEND', 'thread')
+    
+    if backend == 'celery':
+        app.extensions['tasks'] = {'backend': 'celery', 'celery': make_celery(app)}
+    elif backend == 'thread':
+        executor = ThreadPoolExecutor(
+            max_workers=app.config.get('TASK_WORKERS', 4),
+            thread_name_prefix='tasks'
+        )
+        app.extensions['tasks'] = {'backend': 'thread', 'executor': executor}
+    else:
+        raise ValueError(f"Invalid task backend '{backend}'. Must be one of: thread, celery")
+
+def make_celery(app):
+    """Create a Celery app whose tasks run inside the Flask app context"""
+    from celery import Celery
+    
+    celery = Celery(
+        app.import_name,
+        broker=app.config.get('CELERY_BROKER_URL') or app.config['REDIS_URL'],
+        backend=app.config.get('CELERY_RESULT_BACKEND')
+    )
+    
+    for name, func in _tasks.items():
+        celery.task(name=f'tasks.{name}')(_bind_app_context(app, func))
+    
+    return celery
+
+def _bind_app_context(app, func):
+    def run(*args, **kwargs):
+        with app.app_context():
+            return func(*args, **kwargs)
+    run.__name__ = func.__name__
+    return run
+
+def _run_in_app_context(app, func, args, kwargs):
+    task_started()
+    try:
+        with app.app_context():
+            return func(*args, **kwargs)
+    except Exception as e:
+        print(f"Background task {func.__name__} error: {e}")
+
+def enqueue(func, *args, **kwargs):
+    """Run a registered task after the request has been answered.
+    
+    Call this only after the data the task reads has been committed. When
+    TASKS_ALWAYS_EAGER is set the task runs synchronously and its result is
+    returned, which keeps tests deterministic.
+    """
+    app = current_app._get_current_object()
+    name = func.__name__
+    
+    if name not in _tasks:
+        raise ValueError(f"Task {name} is not registered")
+    
+    if app.config.get('TASKS_ALWAYS_EAGER'):
+        return func(*args, **kwargs)
+    
+    tasks = app.extensions['tasks']
+    if tasks['backend'] == 'celery':
+        tasks['celery'].send_task(f'tasks.{name}', args=args, kwargs=kwargs)
+    else:
+        task_queued()
+        tasks['executor'].submit(_run_in_app_context, app, func, args, kwargs)
+    
+    return None
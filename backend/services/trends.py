@@ -0,0 +1,95 @@
+from datetime import date, timedelta
+import calendar
+import numpy as np
+from services.ledger import get_ledger_view
+from services.money import from_cents
+
+# Query parameter naming the number of buckets, and its default, per period
+TREND_PERIODS = {
+    'daily': ('days', 30),
+    'weekly': ('weeks', 12),
+    'monthly': ('months', 6),
+    'quarterly': ('quarters', 4),
+    'yearly': ('years', 3)
+}
+
+def bucket_starts(period, today, count):
+    """Start dates of the last `count` buckets up to and including today's, as datetime64[D]"""
+    day = np.datetime64(today, 'D')
+    
+    if period == 'daily':
+        return np.arange(day - (count - 1), day + 1, dtype='datetime64[D]')
+    
+    if period == 'weekly':
+        monday = day - today.weekday()
+        return np.arange(monday - 7 * (count - 1), monday + 1, 7, dtype='datetime64[D]')
+    
+    if period == 'yearly':
+        year = np.datetime64(today, 'Y')
+        return np.arange(year - (count - 1), year + 1, dtype='datetime64[Y]').astype('datetime64[D]')
+    
+    # Monthly and quarterly step through months
+    step = 3 if period == 'quarterly' else 1
+    month = np.datetime64(today, 'M')
+    if period == 'quarterly':
+        month -= (today.month - 1) % 3
+    return np.arange(month - step * (count - 1), month + 1, step, dtype='datetime64[M]').astype('datetime64[D]')
+
+def moving_average(values, window):
+    """Trailing mean over `window` buckets; None until a full window is available"""
+    values = np.asarray(values, dtype=np.float64)
+    if window < 1 or len(values) < window:
+        return [None] * len(values)
+    
+    sums = np.cumsum(np.insert(values, 0, 0.0))
+    means = (sums[window:] - sums[:-window]) / window
+    return [None] * (window - 1) + [round(float(mean), 2) for mean in means]
+
+def _label(period, start):
+    if period == 'daily':
+        return start.isoformat()
+    if period == 'weekly':
+        return f"Week of {start.isoformat()}"
+    if period == 'monthly':
+        return f"{calendar.month_name[start.month]} {start.year}"
+    if period == 'quarterly':
+        return f"Q{(start.month - 1) // 3 + 1} {start.year}"
+    return str(start.year)
+
+def get_trend_series(user_id, period, count, today=None):
+    """Totals for every bucket in the window, empty buckets included as zero.
+    
+    Expenses come from the user's ledger, already in the user's currency, and
+    are placed onto the full calendar with one searchsorted and bincount
+    instead of a per-bucket loop.
+    """
+    if period not in TREND_PERIODS:
+        raise ValueError(f"Invalid period. Must be one of: {', '.join(TREND_PERIODS)}")
+    
+    today = today or date.today()
+    starts = bucket_starts(period, today, count)
+    ledger = get_ledger_view(user_id, starts[0].item(), today)
+    
+    positions = np.searchsorted(starts, ledger.dates, side='right') - 1
+    totals = np.bincount(positions, weights=ledger.cents, minlength=len(starts)).round().astype(np.int64)
+    counts = np.bincount(positions, minlength=len(starts))
+    
+    series = []
+    for start, total, bucket_count in zip(starts.tolist(), totals.tolist(), counts.tolist()):
+        entry = {
+            'period': _label(period, start),
+            'date': start.isoformat(),
+            'total': from_cents(total),
+            'count': bucket_count
+        }
+        if period in ('monthly', 'quarterly', 'yearly'):
+            entry['year'] = start.year
+        if period == 'monthly':
+            entry['month'] = start.month
+        if period == 'quarterly':
+            entry['quarter'] = (start.month - 1) // 3 + 1
+        if period == 'weekly':
+            entry['end_date'] = (start + timedelta(days=6)).isoformat()
+        series.append(entry)
+    
+    return series
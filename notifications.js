@@ -23,8 +23,7 @@ class NotificationSystem {
         if (typeof io !== 'undefined') {
             this.socket = io('http://localhost:5001', {
                 auth: {
-                    token: this.authToken,
-                    user_id: this.getUserId()
+                    token: this.authToken
                 }
             });
             
@@ -34,25 +33,42 @@ class NotificationSystem {
                 this.updateConnectionStatus(true);
                 
                 // Join user-specific notification room
-                this.socket.emit('join_notifications', {
-                    user_id: this.getUserId()
-                });
+                this.socket.emit('join_notifications');
+                
+                // Keep presence alive so pushes are not queued as offline
+                clearInterval(this.heartbeatTimer);
+                this.heartbeatTimer = setInterval(() => this.socket.emit('heartbeat'), 25000);
             });
             
             this.socket.on('disconnect', () => {
                 console.log('Disconnected from notification server');
                 this.isConnected = false;
                 this.updateConnectionStatus(false);
+                clearInterval(this.heartbeatTimer);
+            });
+            
+            this.socket.on('rejoin', () => {
+                this.socket.emit('join_notifications');
             });
             
             this.socket.on('new_notification', (data) => {
                 this.handleNewNotification(data.notification);
             });
             
+            // Digests arrive as one batch
+            this.socket.on('new_notifications', (data) => {
+                (data.notifications || []).forEach(notification => this.handleNewNotification(notification));
+            });
+            
             this.socket.on('notification_update', (data) => {
                 this.handleNotificationUpdate(data);
             });
             
+            this.socket.on('unread_count', (data) => {
+                this.unreadCount = data.unread_count || 0;
+                this.updateBadge();
+            });
+            
             this.socket.on('error', (error) => {
                 console.error('WebSocket error:', error);
                 this.showToast('Connection error: ' + error.message, 'error');
@@ -1158,6 +1174,7 @@ class NotificationSystem {
     }
     
     destroy() {
+        clearInterval(this.heartbeatTimer);
         if (this.socket) {
             this.socket.disconnect();
         }